@@ -12,13 +12,36 @@ import mypl_token as token
 import mypl_parser as parser
 import mypl_ast as ast
 import mypl_type_checker as type_checker
+import mypl_optimizer as optimizer
+import mypl_resolver as resolver
 import mypl_interpreter as interpreter
+import mypl_compiler as compiler
+import mypl_vm as vm
+import mypl_closures as closures
+import mypl_transpiler as transpiler
+import mypl_cache as cache
+import mypl_profiler as profiler
+import mypl_memo as memo
+import mypl_footprint as footprint
+import mypl_output as output
+import mypl_input as reader
+import argparse
+import io
 import sys
 
-def main(filename):
+ENGINES = ['interpreter', 'vm', 'closure', 'python']
+
+def main(filename, engine='interpreter', gc_threshold=10000, gc_stats=False, use_cache=True, opt_stats=False,
+         profile=False, profile_stacks=None, mem_report=False, memoize=False, memo_size=1000, unbuffered=False,
+         buffer_size=output.BUFFER_SIZE):
     try:
         file_stream = open(filename, 'r')
-        script(file_stream)
+        fresh = opt_stats or mem_report     # stats need a fresh pass
+        the_cache = cache.Cache(filename) if use_cache and not fresh else None
+        the_output = output.Writer(None, 0 if unbuffered else buffer_size)
+        the_input = reader.Reader(None, reader.BLOCK_SIZE, the_output)
+        script(file_stream, engine, gc_threshold, gc_stats, the_cache, opt_stats, profile, profile_stacks,
+               mem_report, memoize, memo_size, the_output, the_input)
         file_stream.close()
     except FileNotFoundError:
         sys.exit('invalid filename %s' % filename)
@@ -26,17 +49,123 @@ def main(filename):
         file_stream.close()
         sys.exit(e)
 
-def script(file_stream):
+def front_end(file_stream, opt_stats=False, mem_report=False):
     the_lexer = lexer.Lexer(file_stream)
     the_parser = parser.Parser(the_lexer)
     stmt_list = the_parser.parse()
+    if mem_report:
+        sys.stderr.write(str(footprint.Footprint(stmt_list)))
     the_type_checker = type_checker.TypeChecker()
     stmt_list.accept(the_type_checker)
-    the_interpreter = interpreter.Interpreter()
-    the_interpreter.run(stmt_list)
+    the_optimizer = optimizer.Optimizer()
+    the_optimizer.optimize(stmt_list)
+    if opt_stats:
+        sys.stderr.write(str(the_optimizer))
+    the_resolver = resolver.Resolver()
+    the_resolver.resolve(stmt_list)
+    return stmt_list
+
+def load(source, the_cache=None, opt_stats=False, mem_report=False):
+    # the checked and resolved program, from the cache when it has a current entry
+    if the_cache is None:
+        return front_end(io.StringIO(source), opt_stats, mem_report)
+    stmt_list = the_cache.load(source)
+    if stmt_list is None:
+        stmt_list = front_end(io.StringIO(source))
+        the_cache.store(source, stmt_list)
+    return stmt_list
+
+def load_python(source, filename, the_cache=None, opt_stats=False, mem_report=False):
+    # the program translated to Python and compiled, from the cache when it has a current entry
+    if the_cache is not None:
+        code = the_cache.load_code(source)
+        if code is not None:
+            return code
+    stmt_list = front_end(io.StringIO(source), opt_stats, mem_report)
+    code = transpiler.compile_program(stmt_list, filename + '.py')
+    if the_cache is not None:
+        the_cache.store_code(source, code)
+    return code
+
+def script(file_stream, engine='interpreter', gc_threshold=10000, gc_stats=False, the_cache=None,
+           opt_stats=False, profile=False, profile_stacks=None, mem_report=False, memoize=False, memo_size=1000,
+           the_output=None, the_input=None):
+    source = file_stream.read()     # the lexer reads it all at once anyway
+    if engine == 'python':  # doesn't need the checked program when its translation is cached
+        code = load_python(source, getattr(file_stream, 'name', '<mypl>'), the_cache, opt_stats, mem_report)
+        transpiler.run(code, the_output, the_input)
+        return
+    stmt_list = load(source, the_cache, opt_stats, mem_report)
+    if engine == 'vm':
+        the_compiler = compiler.Compiler()
+        main_code = the_compiler.compile(stmt_list)
+        the_vm = vm.VM(the_output, the_input)
+        the_vm.run(main_code)
+        return
+    if engine == 'closure':
+        the_compiler = closures.ClosureCompiler(the_output, the_input)
+        program = the_compiler.compile(stmt_list)
+        program.run()
+        return
+    the_memo = memo.Memo(stmt_list, memo_size) if memoize else None
+    if profile or profile_stacks is not None:
+        the_interpreter = profiler.ProfilingInterpreter(gc_threshold, the_memo=the_memo, the_output=the_output,
+                                                        the_input=the_input)
+        try:
+            the_interpreter.run(stmt_list)
+        finally:
+            if gc_stats:
+                sys.stderr.write(str(the_interpreter.heap))
+            if the_memo is not None:
+                sys.stderr.write(str(the_memo))
+            if profile:
+                sys.stderr.write(the_interpreter.report(source.splitlines()))
+            if profile_stacks is not None:
+                with open(profile_stacks, 'w') as stacks_file:
+                    stacks_file.write(the_interpreter.collapsed_stacks())
+    else:
+        the_interpreter = interpreter.Interpreter(gc_threshold, the_memo=the_memo, the_output=the_output,
+                                                  the_input=the_input)
+        try:
+            the_interpreter.run(stmt_list)
+        finally:
+            if gc_stats:
+                sys.stderr.write(str(the_interpreter.heap))
+            if the_memo is not None:
+                sys.stderr.write(str(the_memo))
     #stmt_list.accept(the_interpreter)
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        sys.exit('Usage: %s file' % sys.argv[0])
-    main(sys.argv[1])
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description='Run a MyPL program.')
+    arg_parser.add_argument('file', help='MyPL source file')
+    arg_parser.add_argument('--engine', choices=ENGINES, default='interpreter',
+                            help='execution backend (default: interpreter)')
+    arg_parser.add_argument('--gc-threshold', type=int, default=10000, metavar='N',
+                            help='heap size that triggers the first garbage collection, 0 disables it '
+                                 '(interpreter only, default: 10000)')
+    arg_parser.add_argument('--gc-stats', action='store_true',
+                            help='report garbage collector statistics on exit (interpreter only)')
+    arg_parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                            help='always re-check the program instead of using or writing %s' % cache.CACHE_DIR)
+    arg_parser.add_argument('--opt-stats', action='store_true',
+                            help='report how many expressions the optimizer folded (implies --no-cache)')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='report time per function and the most executed lines on exit (interpreter only)')
+    arg_parser.add_argument('--profile-stacks', metavar='FILE',
+                            help='write collapsed call stacks with their self time in microseconds to FILE, '
+                                 'for flame graph tools (interpreter only)')
+    arg_parser.add_argument('--mem-report', action='store_true',
+                            help='report the memory used by the parsed program per object type (implies --no-cache)')
+    arg_parser.add_argument('--memoize', action='store_true',
+                            help='cache the results of pure functions and report cache statistics on exit '
+                                 '(interpreter only)')
+    arg_parser.add_argument('--memo-size', type=int, default=1000, metavar='N',
+                            help='results kept per memoized function (default: 1000)')
+    arg_parser.add_argument('--unbuffered', action='store_true',
+                            help='write every print straight to stdout instead of buffering program output')
+    arg_parser.add_argument('--buffer-size', type=int, default=output.BUFFER_SIZE, metavar='N',
+                            help='characters of program output buffered before they are written '
+                                 '(default: %i)' % output.BUFFER_SIZE)
+    args = arg_parser.parse_args()
+    main(args.file, args.engine, args.gc_threshold, args.gc_stats, args.use_cache, args.opt_stats, args.profile,
+         args.profile_stacks, args.mem_report, args.memoize, args.memo_size, args.unbuffered, args.buffer_size)
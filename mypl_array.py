@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Storage for MyPL arrays. Arrays of ints and floats are Python array buffers holding 64-bit machine values, 8
+#   bytes an element instead of a pointer to a boxed number, and the bulk built ins (fill, copy, sum, sort, search)
+#   work on them natively. Arrays of bools, strings, structs and arrays are Python lists. Every engine stores arrays
+#   this way, so the built ins in mypl_builtins work for all of them.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import array
+
+TYPECODES = {token.INTTYPE: 'q', token.FLOATTYPE: 'd'}  # element types stored in array buffers
+LIMIT = 2 ** 63     # ints stored in arrays are between -LIMIT and LIMIT - 1
+
+
+def allocate(elem_type, size):
+    """a new array of size elements of elem_type (the token type of the
+    element type), which start out as 0, 0.0, false or nil
+    """
+    typecode = TYPECODES.get(elem_type)
+    if typecode is not None:
+        return array.array(typecode, bytes(8 * size))
+    if elem_type == token.BOOLTYPE:
+        return [False] * size
+    return [None] * size
+
+
+def store_error(value):
+    """the message for a value an array buffer refused to store"""
+    if value is None:
+        return 'nil value error'
+    if value.__class__ is int:
+        return 'int value out of range error'
+    return 'mismatch type in array'   # e.g. a float passed to fill an int array, built in arguments aren't checked
@@ -2,7 +2,8 @@
 #
 # Author: Joshua Go
 # Description:
-#   Contains the objects used for generating the AST tree in the parser file.
+#   Contains the objects used for generating the AST tree in the parser file. Nodes declare their fields in
+#   __slots__ so they don't each carry an attribute dict.
 # ----------------------------------------------------------------------
 
 import mypl_token as token
@@ -10,26 +11,32 @@ import mypl_token as token
 # don't really have to use, just an "organizational" class to separate out statements from other node types
 class ASTNode(object):
     """The base class for the abstract syntax tree."""
+    __slots__ = ()
     def accept(self, visitor): pass
 
 class Stmt(ASTNode):
     """The base class for all statement nodes."""
+    __slots__ = ()
     def accept(self, visitor): pass
 
 class StmtList(ASTNode):
     """A statement list consists of a list of statements."""
+    __slots__ = ('stmts', 'frame_size')
     def __init__(self):
         self.stmts = [] # list of Stmt
+        self.frame_size = 0 # slots in the global frame (set by the resolver)
 
     def accept(self, visitor):
         visitor.visit_stmt_list(self)
 
 class Expr(ASTNode):
     """The base class for all expression nodes."""
+    __slots__ = ()
     def accept(self, visitor): pass
 
 class ExprStmt(Stmt):
     """A simple statement that is just an expression."""
+    __slots__ = ('expr',)
     def __init__(self):
         self.expr = None # Expr node
     def accept(self, visitor):
@@ -39,16 +46,19 @@ class VarDeclStmt(Stmt):
     """A variable declaration statement consists of a variable identifier,
     an (optional) type, and an initial value.
     """
+    __slots__ = ('var_id', 'var_type', 'var_expr', 'address')
     def __init__(self):
         self.var_id = None # Token (ID)
-        self.var_type = None # Token (STRINGTYPE, ..., ID)
+        self.var_type = None # Token (STRINGTYPE, ..., ID), ArrayType or MapType
         self.var_expr = None # Expr node
+        self.address = None # (depth, slot) (set by the resolver)
     def accept(self, visitor):
         visitor.visit_var_decl_stmt(self)
 
 class AssignStmt(Stmt):
     """An assignment statement consists of an identifier and an expression.
     """
+    __slots__ = ('lhs', 'rhs')
     def __init__(self):
         self.lhs = None # LValue node
         self.rhs = None # Expr node
@@ -59,9 +69,13 @@ class StructDeclStmt(Stmt):
     """A struct declaration statement consists of an identifier, and a
     list of variable declarations.
     """
+    __slots__ = ('struct_id', 'var_decls', 'frame_size', 'field_index', 'field_types')
     def __init__(self):
         self.struct_id = None # Token (id)
         self.var_decls = [] # [VarDeclStmt]
+        self.frame_size = 0 # slots in the initializer frame (set by the resolver)
+        self.field_index = {} # {field name: slot in the record} (set by the resolver)
+        self.field_types = {} # {field name: struct name or None} (set by the resolver)
     def accept(self, visitor):
         visitor.visit_struct_decl_stmt(self)
 
@@ -70,11 +84,13 @@ class FunDeclStmt(Stmt):
     of parameters (identifiers with types), a return type, and a list
     of function body statements.
     """
+    __slots__ = ('fun_name', 'params', 'return_type', 'stmt_list', 'frame_size')
     def __init__(self):
         self.fun_name = None # Token (id)
         self.params = [] # List of FunParam
-        self.return_type = None # Token
+        self.return_type = None # Token, ArrayType or MapType
         self.stmt_list = StmtList() # StmtList
+        self.frame_size = 0 # slots in a call frame (set by the resolver)
     def accept(self, visitor):
         visitor.visit_fun_decl_stmt(self)
 
@@ -82,6 +98,7 @@ class ReturnStmt(Stmt):
     """A return statement consist of a return expression and the
     corresponding return token (for printing line and column numbers).
     """
+    __slots__ = ('return_expr', 'return_token')
     def __init__(self):
         self.return_expr = None # Expr
         self.return_token = None # to keep track of location (e.g., return;)
@@ -92,8 +109,9 @@ class WhileStmt(Stmt):
     """A while statement consists of a condition (Boolean expression) and
     a statement list (the body of the while).
     """
+    __slots__ = ('bool_expr', 'stmt_list')
     def __init__(self):
-        self.bool_expr = None # a BoolExpr node
+        self.bool_expr = None # Expr node (a condition)
         self.stmt_list = StmtList()
     def accept(self, visitor):
         visitor.visit_while_stmt(self)
@@ -103,17 +121,19 @@ class IfStmt(Stmt):
     else ifs, and an optional else part (represented as a statement
     list).
     """
+    __slots__ = ('if_part', 'elseifs', 'has_else', 'else_stmts')
     def __init__(self):
         self.if_part = BasicIf()
         self.elseifs = [] # list of BasicIf
         self.has_else = False
-        self.else_stmts = StmtList()
+        self.else_stmts = None # StmtList, only if has_else
     def accept(self, visitor):
         visitor.visit_if_stmt(self)
 
 class SimpleExpr(Expr):
     """A simple expression consists of an RValue.
     """
+    __slots__ = ('term',)
     def __init__(self):
         self.term = None # RValue
     def accept(self, visitor):
@@ -124,94 +144,247 @@ class ComplexExpr(Expr):
     mathematical operator (+, -, *, etc.), followed by another
     (possibly complex) expression.
     """
+    __slots__ = ('first_operand', 'math_rel', 'rest', 'expr_type')
     def __init__(self):
         self.first_operand = None # Expr node
         self.math_rel = None # Token (+, -, *, etc.)
         self.rest = None # Expr node
+        self.expr_type = None # type of the result, e.g. STRINGTYPE (set by the type checker)
     def accept(self, visitor):
         visitor.visit_complex_expr(self)
 
-class BoolExpr(ASTNode):
-    """A boolean expression consists of an expression, a Boolean relation
-    (==, <=, !=, etc.), another expression, and possibly an 'and' or
-    'or' followed by additional boolean expressions. An entire boolean
-    expression can also be negated. Note that only the first_expr is
-    required.
+class CompareExpr(Expr):
+    """A comparison consists of an expression, a Boolean relation (==,
+    <=, !=, etc.) and another expression.
     """
+    __slots__ = ('first_expr', 'bool_rel', 'second_expr')
     def __init__(self):
         self.first_expr = None # Expr node
         self.bool_rel = None # Token (==, <=, !=, etc.)
         self.second_expr = None # Expr node
-        self.bool_connector = None # Token (AND or OR)
-        self.rest = None # BoolExpr node
-        self.negated = False # Bool
     def accept(self, visitor):
-        visitor.visit_bool_expr(self)
+        visitor.visit_compare_expr(self)
+
+class LogicExpr(Expr):
+    """A logical expression joins two or more Boolean expressions with the
+    same connector ('and' or 'or'). Operands are evaluated left to right
+    until the result is known.
+    """
+    __slots__ = ('connector', 'operands')
+    def __init__(self):
+        self.connector = None # Token (AND or OR)
+        self.operands = [] # list of Expr nodes
+    def accept(self, visitor):
+        visitor.visit_logic_expr(self)
+
+class NotExpr(Expr):
+    """A negated Boolean expression.
+    """
+    __slots__ = ('operand',)
+    def __init__(self):
+        self.operand = None # Expr node
+    def accept(self, visitor):
+        visitor.visit_not_expr(self)
 
 class LValue(ASTNode):
-    """A lvalue consist of a simple id or a path expression.
+    """A lvalue consist of a simple id or a path expression, optionally
+    followed by an index into the array it names.
     """
+    __slots__ = ('path', 'index_expr', 'address', 'field_slots')
     def __init__(self):
-        self.path = [] # [Token (ID)] ... one implies simple var
+        self.path = () # (Token (ID), ...) ... one implies simple var
+        self.index_expr = None # Expr node, for an array element
+        self.address = None # (depth, slot) of path[0] (set by the resolver)
+        self.field_slots = None # record slots of path[1:], None if unknown (set by the resolver)
     def accept(self, visitor):
         visitor.visit_lvalue(self)
 
 class FunParam(Stmt):
     """A function declaration parameter consists of a variable name (id)
     and a type."""
+    __slots__ = ('param_name', 'param_type', 'address')
     def __init__(self):
         self.param_name = None # Token (id)
-        self.param_type = None # Token (id)
+        self.param_type = None # Token (id), ArrayType or MapType
+        self.address = None # (depth, slot) (set by the resolver)
     def accept(self, visitor):
         visitor.visit_fun_param(self)
 
+class ArrayType(object):
+    """The type of an array, written 'array' followed by the type of its
+    elements. Stands in for a type token, so it has the same attributes.
+    """
+    __slots__ = ('array_token', 'elem_type')
+    tokentype = token.ARRAYTYPE
+    def __init__(self):
+        self.array_token = None # Token (array)
+        self.elem_type = None # Token (INTTYPE, ..., ID), ArrayType or MapType
+    @property
+    def lexeme(self):
+        return 'array ' + self.elem_type.lexeme
+    @property
+    def line(self):
+        return self.array_token.line
+    @property
+    def column(self):
+        return self.array_token.column
+
+class MapType(object):
+    """The type of a map, written 'map' followed by the type of its keys
+    and the type of its values. Stands in for a type token, so it has the
+    same attributes.
+    """
+    __slots__ = ('map_token', 'key_type', 'value_type')
+    tokentype = token.MAPTYPE
+    def __init__(self):
+        self.map_token = None # Token (map)
+        self.key_type = None # Token (STRINGTYPE or INTTYPE)
+        self.value_type = None # Token (INTTYPE, ..., ID), ArrayType or MapType
+    @property
+    def lexeme(self):
+        return 'map ' + self.key_type.lexeme + ' ' + self.value_type.lexeme
+    @property
+    def line(self):
+        return self.map_token.line
+    @property
+    def column(self):
+        return self.map_token.column
+
 class BasicIf(object):
     """A basic if holds a condition (Boolean expression) and a list of
     statements (the body of the if).
     7
     """
+    __slots__ = ('bool_expr', 'stmt_list')
     def __init__(self):
-        self.bool_expr = None # BoolExpr node
+        self.bool_expr = None # Expr node (a condition)
         self.stmt_list = StmtList()
 
 class RValue(ASTNode):
     """The base class for rvalue nodes."""
+    __slots__ = ()
     def accept(self, visitor): pass
 
 class SimpleRValue(RValue):
     """A simple rvalue consists of a single primitive value.
     """
+    __slots__ = ('val', 'value')
     def __init__(self):
         self.val = None # Token
+        self.value = None # Python value of val (set by the optimizer)
     def accept(self, visitor):
         visitor.visit_simple_rvalue(self)
 
 class NewRValue(RValue):
     """A new rvalue consists of a struct name (id)
     """
+    __slots__ = ('struct_type', 'struct_decl')
     def __init__(self):
         self.struct_type = None # Token (id)
+        self.struct_decl = None # StructDeclStmt (set by the resolver)
     def accept(self, visitor):
         visitor.visit_new_rvalue(self)
 
+class NewArrayRValue(RValue):
+    """A new array rvalue consists of the type of the elements and an
+    expression giving their number.
+    """
+    __slots__ = ('elem_type', 'size_expr')
+    def __init__(self):
+        self.elem_type = None # Token (INTTYPE, ..., ID) or ArrayType
+        self.size_expr = None # Expr node
+    def accept(self, visitor):
+        visitor.visit_new_array_rvalue(self)
+
+class NewMapRValue(RValue):
+    """A new map rvalue consists of the type of the (empty) map."""
+    __slots__ = ('map_type',)
+    def __init__(self):
+        self.map_type = None # MapType
+    def accept(self, visitor):
+        visitor.visit_new_map_rvalue(self)
+
 class CallRValue(RValue):
     """A function call rvalue consists of a function name (id) and a list
     of arguments (expressions)
     """
+    __slots__ = ('fun', 'args', 'fun_decl', 'tail_call')
     def __init__(self):
         self.fun = None # Token (id)
         self.args = [] # list of Expr
+        self.fun_decl = None # FunDeclStmt, None for built-ins (set by the resolver)
+        self.tail_call = False # the calling function ends with this call (set by the resolver)
     def accept(self, visitor):
         visitor.visit_call_rvalue(self)
 
 class IDRvalue(RValue):
     """An identifier rvalue consists of a path of one or more identifiers.
     """
+    __slots__ = ('path', 'address', 'field_slots')
     def __init__(self):
-        self.path = [] # List of Token (id)
+        self.path = () # tuple of Token (id)
+        self.address = None # (depth, slot) of path[0] (set by the resolver)
+        self.field_slots = None # record slots of path[1:], None if unknown (set by the resolver)
     def accept(self, visitor):
         visitor.visit_id_rvalue(self)
 
+class IndexRValue(RValue):
+    """An index rvalue consists of an array (an identifier or path) and an
+    expression for the index of the element.
+    """
+    __slots__ = ('array', 'index_expr')
+    def __init__(self):
+        self.array = None # IDRvalue
+        self.index_expr = None # Expr node
+    def accept(self, visitor):
+        visitor.visit_index_rvalue(self)
+
+def first_token(node):
+    """The first token of a statement or expression, for reporting where
+    it is in the source.
+    """
+    while True:
+        if isinstance(node, ExprStmt):
+            node = node.expr
+        elif isinstance(node, SimpleExpr):
+            node = node.term
+        elif isinstance(node, ComplexExpr):
+            node = node.first_operand
+        elif isinstance(node, CompareExpr):
+            node = node.first_expr
+        elif isinstance(node, LogicExpr):
+            node = node.operands[0]
+        elif isinstance(node, NotExpr):
+            node = node.operand
+        elif isinstance(node, WhileStmt):
+            node = node.bool_expr
+        elif isinstance(node, IfStmt):
+            node = node.if_part.bool_expr
+        elif isinstance(node, VarDeclStmt):
+            return node.var_id
+        elif isinstance(node, AssignStmt):
+            return node.lhs.path[0]
+        elif isinstance(node, StructDeclStmt):
+            return node.struct_id
+        elif isinstance(node, FunDeclStmt):
+            return node.fun_name
+        elif isinstance(node, ReturnStmt):
+            return node.return_token
+        elif isinstance(node, SimpleRValue):
+            return node.val
+        elif isinstance(node, NewRValue):
+            return node.struct_type
+        elif isinstance(node, NewArrayRValue):
+            return node.elem_type
+        elif isinstance(node, NewMapRValue):
+            return node.map_type
+        elif isinstance(node, IndexRValue):
+            node = node.array
+        elif isinstance(node, CallRValue):
+            return node.fun
+        else:   # IDRvalue
+            return node.path[0]
+
 class Visitor(object):
     """The base class for AST visitors.
     """
@@ -226,10 +399,15 @@ class Visitor(object):
     def visit_if_stmt(self, if_stmt): pass
     def visit_simple_expr(self, simple_expr): pass
     def visit_complex_expr(self, complex_expr): pass
-    def visit_bool_expr(self, bool_expr): pass
+    def visit_compare_expr(self, compare_expr): pass
+    def visit_logic_expr(self, logic_expr): pass
+    def visit_not_expr(self, not_expr): pass
     def visit_lvalue(self, lval): pass
     def visit_fun_param(self, fun_param): pass
     def visit_simple_rvalue(self, simple_rvalue): pass
     def visit_new_rvalue(self, new_rvalue): pass
+    def visit_new_array_rvalue(self, new_array_rvalue): pass
+    def visit_new_map_rvalue(self, new_map_rvalue): pass
+    def visit_index_rvalue(self, index_rvalue): pass
     def visit_call_rvalue(self, call_rvalue): pass
     def visit_id_rvalue(self, id_rvalue): pass
\ No newline at end of file
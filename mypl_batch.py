@@ -0,0 +1,219 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Batch mode for MyPL: runs one program over many inputs. The program is lexed, parsed, checked and resolved once
+#   (or loaded from the cache), then handed to a pool of worker processes, each of which runs it for every job it is
+#   given. A job reads its own input file as stdin and writes its output to its own file, or returns it to the
+#   caller. Jobs that fail, with a MyPL error or a Python one (e.g. an unreadable input file), are reported in their
+#   results without affecting the other jobs.
+#
+#       python3 mypl_batch.py script.mypl data/*.txt --output-dir out --jobs 8
+# ----------------------------------------------------------------------
+
+import mypl_error as error
+import mypl_interpreter as interpreter
+import mypl_compiler as compiler
+import mypl_vm as vm
+import mypl_closures as closures
+import mypl_transpiler as transpiler
+import mypl_cache as cache
+import mypl_output as output
+import mypl_input as reader
+import main
+import argparse
+import io
+import marshal
+import multiprocessing
+import os
+import sys
+import time
+
+
+class Program(object):
+    """A checked MyPL program, ready to run any number of times on one
+    engine
+    """
+
+    def __init__(self, source, engine='interpreter', filename='<mypl>', the_cache=None, gc_threshold=10000):
+        self.engine = engine
+        self.gc_threshold = gc_threshold
+        self.stmt_list = None  # the resolved program, for the interpreter, vm and closure engines
+        self.code = None  # the program translated to Python, for the python engine
+        self.main_code = None  # the program's bytecode, for the vm engine (compiled again after unpickling)
+        if engine == 'python':
+            self.code = main.load_python(source, filename, the_cache)
+        else:
+            self.stmt_list = main.load(source, the_cache)
+        if engine == 'vm':
+            self.main_code = compiler.Compiler().compile(self.stmt_list)
+
+    def __getstate__(self):
+        # for workers that are spawned rather than forked: code objects only go through marshal
+        state = dict(self.__dict__)
+        if self.code is not None:
+            state['code'] = marshal.dumps(self.code)
+        state['main_code'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.code is not None:
+            self.code = marshal.loads(self.code)
+
+    def run(self, the_output, the_input):
+        """runs the program once, printing to the_output (a mypl_output.Writer)
+        and reading from the_input (a mypl_input.Reader)
+        """
+        if self.engine == 'python':
+            transpiler.run(self.code, the_output, the_input)
+        elif self.engine == 'vm':
+            if self.main_code is None:
+                self.main_code = compiler.Compiler().compile(self.stmt_list)
+            vm.VM(the_output, the_input).run(self.main_code)
+        elif self.engine == 'closure':  # the closures are bound to the output and input they are built for
+            closures.ClosureCompiler(the_output, the_input).compile(self.stmt_list).run()
+        else:
+            the_interpreter = interpreter.Interpreter(self.gc_threshold, the_output=the_output, the_input=the_input)
+            the_interpreter.run(self.stmt_list)
+
+
+class Result(object):
+    """The outcome of one job of a batch"""
+
+    def __init__(self, index, input_path, output_text, error_msg, seconds):
+        self.index = index  # position of the job in the batch
+        self.input = input_path
+        self.output = output_text  # what the job printed, None when it went to an output file
+        self.error = error_msg  # None if the job ran to completion
+        self.seconds = seconds
+
+
+worker_program = None   # the Program a worker process runs, set by start_worker()
+worker_buffer_size = output.BUFFER_SIZE
+
+
+def start_worker(program, buffer_size):
+    global worker_program, worker_buffer_size
+    worker_program = program
+    worker_buffer_size = buffer_size
+
+
+def run_job(job):
+    """runs the worker's program for a job (index, input path or None for no
+    input, output path or None to return the output), returning its Result
+    """
+    index, input_path, output_path = job
+    start = time.perf_counter()
+    sink = io.StringIO()
+    error_msg = None
+    try:
+        if output_path is not None:
+            sink = open(output_path, 'w')
+        source = io.StringIO() if input_path is None else open(input_path, 'r')
+        with source:
+            the_output = output.Writer(sink, worker_buffer_size)
+            worker_program.run(the_output, reader.Reader(source, reader.BLOCK_SIZE, the_output))
+    except error.MyPLError as e:
+        error_msg = str(e)
+    except Exception as e:  # reported with the job rather than taking down the worker
+        error_msg = 'error: %s' % e
+    finally:
+        if output_path is not None:
+            sink.close()
+    output_text = sink.getvalue() if output_path is None else None
+    return Result(index, input_path, output_text, error_msg, time.perf_counter() - start)
+
+
+def run_batch(program, inputs, outputs=None, processes=None, ordered=True, buffer_size=output.BUFFER_SIZE,
+              chunksize=None):
+    """runs program on every input file (a path, or None for no input) in a
+    pool of processes (one per core by default), writing the output of each
+    to the path at the same position of outputs, or into its Result if
+    outputs is None. Yields the Results in the order of inputs if ordered,
+    else as soon as each job finishes.
+    """
+    jobs = [(i, path, None if outputs is None else outputs[i]) for i, path in enumerate(inputs)]
+    processes = processes or os.cpu_count() or 1
+    if chunksize is None:   # as Pool.map does: about four chunks per process
+        chunksize = max(1, len(jobs) // (processes * 4))
+    with multiprocessing.Pool(processes, start_worker, (program, buffer_size)) as pool:
+        results = pool.imap(run_job, jobs, chunksize) if ordered else pool.imap_unordered(run_job, jobs, chunksize)
+        for result in results:
+            yield result
+
+
+def output_paths(inputs, output_dir):
+    """the output file in output_dir of every input, named after it"""
+    names = [os.path.basename(path) + '.out' for path in inputs]
+    if len(set(names)) != len(names):
+        raise ValueError('inputs with the same file name would write the same output file')
+    return [os.path.join(output_dir, name) for name in names]
+
+
+def batch(filename, inputs, engine='interpreter', processes=None, output_dir=None, ordered=True, use_cache=True,
+          gc_threshold=10000, buffer_size=output.BUFFER_SIZE):
+    """runs the program in filename over the inputs, writing each job's
+    output to output_dir or else to stdout, and reporting failed jobs to
+    stderr. Returns the number of failed jobs.
+    """
+    try:
+        with open(filename, 'r') as file_stream:
+            source = file_stream.read()
+        the_cache = cache.Cache(filename) if use_cache else None
+        program = Program(source, engine, filename, the_cache, gc_threshold)
+    except FileNotFoundError:
+        sys.exit('invalid filename %s' % filename)
+    except error.MyPLError as e:
+        sys.exit(e)
+    outputs = None
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            outputs = output_paths(inputs, output_dir)
+        except ValueError as e:
+            sys.exit(e)
+    failed = 0
+    start = time.perf_counter()
+    for result in run_batch(program, inputs, outputs, processes, ordered, buffer_size):
+        if result.output:
+            sys.stdout.write(result.output)
+        if result.error is not None:
+            failed += 1
+            sys.stdout.flush()  # so the report follows the job's output
+            sys.stderr.write('%s: %s\n' % (result.input, result.error))
+    sys.stdout.flush()
+    sys.stderr.write('batch: %i jobs, %i failed, %.3f s\n' % (len(inputs), failed, time.perf_counter() - start))
+    return failed
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Run a MyPL program over many inputs in parallel.')
+    arg_parser.add_argument('file', help='MyPL source file')
+    arg_parser.add_argument('inputs', nargs='*', metavar='input', help='input file read as stdin by one job')
+    arg_parser.add_argument('--inputs-from', metavar='FILE',
+                            help='also read input file names from FILE, one per line (- for stdin)')
+    arg_parser.add_argument('--engine', choices=main.ENGINES, default='interpreter',
+                            help='execution backend (default: interpreter)')
+    arg_parser.add_argument('--jobs', type=int, default=None, metavar='N',
+                            help='worker processes (default: one per core)')
+    arg_parser.add_argument('--output-dir', metavar='DIR',
+                            help='write the output of each input to DIR/<input name>.out instead of to stdout')
+    arg_parser.add_argument('--unordered', dest='ordered', action='store_false',
+                            help='handle outputs as jobs finish rather than in the order of the inputs')
+    arg_parser.add_argument('--no-cache', dest='use_cache', action='store_false',
+                            help='always re-check the program instead of using or writing %s' % cache.CACHE_DIR)
+    arg_parser.add_argument('--gc-threshold', type=int, default=10000, metavar='N',
+                            help='heap size that triggers the first garbage collection, 0 disables it '
+                                 '(interpreter only, default: 10000)')
+    arg_parser.add_argument('--buffer-size', type=int, default=output.BUFFER_SIZE, metavar='N',
+                            help='characters of program output buffered before they are written '
+                                 '(default: %i)' % output.BUFFER_SIZE)
+    args = arg_parser.parse_args()
+    inputs = args.inputs
+    if args.inputs_from is not None:
+        with (sys.stdin if args.inputs_from == '-' else open(args.inputs_from, 'r')) as names:
+            inputs += [line.rstrip('\n') for line in names if line.strip()]
+    failed = batch(args.file, inputs, args.engine, args.jobs, args.output_dir, args.ordered, args.use_cache,
+                   args.gc_threshold, args.buffer_size)
+    sys.exit(1 if failed else 0)
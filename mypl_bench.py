@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Benchmark runner for MyPL. Runs the workloads in the bench directory through every phase of the pipeline, timing
+#   each phase separately, measures the peak memory of a run, and saves the results as JSON so later runs can be
+#   compared against them to catch performance regressions.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_type_checker as type_checker
+import mypl_optimizer as optimizer
+import mypl_resolver as resolver
+import mypl_interpreter as interpreter
+import mypl_compiler as compiler
+import mypl_vm as vm
+import mypl_closures as closures
+import mypl_transpiler as transpiler
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench')
+NOISE_FLOOR = 0.001  # seconds; smaller slowdowns are never reported as regressions
+
+
+class TokenReplay(object):
+    """Feeds an already lexed token list to the parser, so lexing and
+    parsing can be timed separately.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def next_token(self):
+        the_token = self.tokens[self.pos]
+        if self.pos < len(self.tokens) - 1:    # keep returning EOS at the end
+            self.pos += 1
+        return the_token
+
+
+def run_once(source, engine):
+    """runs source through the pipeline, returning ({phase: seconds},
+    number of tokens, program output)
+    """
+    phases = {}
+    start = time.perf_counter()
+
+    def phase(name):
+        nonlocal start
+        now = time.perf_counter()
+        phases[name] = now - start
+        start = now
+
+    the_lexer = lexer.Lexer(io.StringIO(source))
+    tokens = [the_lexer.next_token()]
+    while tokens[-1].tokentype != token.EOS:
+        tokens.append(the_lexer.next_token())
+    phase('Lexer')
+    stmt_list = parser.Parser(TokenReplay(tokens)).parse()
+    phase('Parser')
+    stmt_list.accept(type_checker.TypeChecker())
+    phase('TypeChecker')
+    optimizer.Optimizer().optimize(stmt_list)
+    phase('Optimizer')
+    resolver.Resolver().resolve(stmt_list)
+    phase('Resolver')
+    output = io.StringIO()
+    if engine == 'vm':
+        main_code = compiler.Compiler().compile(stmt_list)
+        phase('Compiler')
+        with contextlib.redirect_stdout(output):
+            vm.VM().run(main_code)
+        phase('VM')
+    elif engine == 'closure':
+        program = closures.ClosureCompiler().compile(stmt_list)
+        phase('ClosureCompiler')
+        with contextlib.redirect_stdout(output):
+            program.run()
+        phase('Closures')
+    elif engine == 'python':
+        code = transpiler.compile_program(stmt_list)
+        phase('Transpiler')
+        with contextlib.redirect_stdout(output):
+            transpiler.run(code)
+        phase('Python')
+    else:
+        with contextlib.redirect_stdout(output):
+            interpreter.Interpreter().run(stmt_list)
+        phase('Interpreter')
+    return phases, len(tokens), output.getvalue()
+
+
+def bench(filename, engine, repeat, memory=True):
+    """benchmarks one workload, keeping the fastest time of each phase"""
+    with open(filename, 'r') as source_file:
+        source = source_file.read()
+    best = None
+    for i in range(repeat):
+        phases, tokens, output = run_once(source, engine)
+        if best is None:
+            best = phases
+        else:
+            best = {name: min(best[name], phases[name]) for name in best}
+    peak_memory = None
+    if memory:
+        tracemalloc.start()     # measured on a separate run, tracing slows everything down
+        run_once(source, engine)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    front_end = best['Lexer'] + best['Parser'] + best['TypeChecker']
+    return {
+        'phases': best,
+        'total': sum(best.values()),
+        'peak_memory': peak_memory,
+        'tokens': tokens,
+        'tokens_per_sec': tokens / front_end if front_end else 0.0,
+        'output': hashlib.sha256(output.encode()).hexdigest(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """returns a list of regression messages, comparing results to baseline"""
+    regressions = []
+    if baseline.get('engine') != results['engine']:
+        regressions.append('baseline engine %s differs from %s' % (baseline.get('engine'), results['engine']))
+        return regressions
+    for name, workload in results['workloads'].items():
+        old = baseline['workloads'].get(name)
+        if old is None:
+            continue
+        if old['output'] != workload['output']:
+            regressions.append('%s: output changed' % name)
+        measures = [('total', old['total'], workload['total'])]
+        for phase, seconds in workload['phases'].items():
+            if phase in old['phases']:
+                measures.append((phase, old['phases'][phase], seconds))
+        for measure, old_seconds, seconds in measures:
+            if seconds > old_seconds * (1 + threshold) and seconds - old_seconds > NOISE_FLOOR:
+                regressions.append('%s: %s %.4fs vs %.4fs (%+.1f%%)' %
+                                   (name, measure, seconds, old_seconds, 100 * (seconds / old_seconds - 1)))
+        if workload['peak_memory'] is None or old['peak_memory'] is None:
+            continue
+        if workload['peak_memory'] > old['peak_memory'] * (1 + threshold):
+            regressions.append('%s: peak memory %i bytes vs %i bytes (%+.1f%%)' %
+                               (name, workload['peak_memory'], old['peak_memory'],
+                                100 * (workload['peak_memory'] / old['peak_memory'] - 1)))
+    return regressions
+
+
+def report(results):
+    s = 'engine: %s, best of %i\n' % (results['engine'], results['repeat'])
+    for name, workload in results['workloads'].items():
+        peak = '%10.1f KiB peak' % (workload['peak_memory'] / 1024) if workload['peak_memory'] is not None else ''
+        s += '%-12s %8.4fs total %s %10.0f tokens/s\n' % (name, workload['total'], peak, workload['tokens_per_sec'])
+        s += '    ' + '  '.join('%s %.4fs' % item for item in workload['phases'].items()) + '\n'
+    return s
+
+
+def main(names, engine='interpreter', repeat=5, output=None, baseline=None, threshold=0.1, memory=True):
+    workloads = sorted(glob.glob(os.path.join(BENCH_DIR, '*.mypl')))
+    if names:
+        workloads = [filename for filename in workloads if os.path.basename(filename)[:-5] in names]
+    results = {
+        'engine': engine,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'workloads': {},
+    }
+    for filename in workloads:
+        results['workloads'][os.path.basename(filename)[:-5]] = bench(filename, engine, repeat, memory)
+    sys.stdout.write(report(results))
+    if output is not None:
+        with open(output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if baseline is not None:
+        with open(baseline, 'r') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), threshold)
+        for regression in regressions:
+            sys.stdout.write('REGRESSION %s\n' % regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Benchmark MyPL on the workloads in %s.' % BENCH_DIR)
+    arg_parser.add_argument('workloads', nargs='*', metavar='workload',
+                            help='names of the workloads to run (default: all)')
+    arg_parser.add_argument('--engine', choices=['interpreter', 'vm', 'closure', 'python'], default='interpreter',
+                            help='execution backend (default: interpreter)')
+    arg_parser.add_argument('--repeat', type=int, default=5, metavar='N',
+                            help='runs per workload, the fastest time of each phase is kept (default: 5)')
+    arg_parser.add_argument('--output', metavar='FILE', help='save the results as JSON')
+    arg_parser.add_argument('--baseline', metavar='FILE',
+                            help='compare against saved results, exiting with status 1 on regressions')
+    arg_parser.add_argument('--threshold', type=float, default=0.1, metavar='FRACTION',
+                            help='slowdown or memory growth that counts as a regression (default: 0.1)')
+    arg_parser.add_argument('--no-memory', dest='memory', action='store_false',
+                            help='skip the (slow) traced run that measures peak memory')
+    args = arg_parser.parse_args()
+    main(args.workloads, args.engine, args.repeat, args.output, args.baseline, args.threshold, args.memory)
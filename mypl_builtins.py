@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   The built in functions of MyPL. BUILT_INS maps each name to a BuiltIn holding its signature, which the type
+#   checker declares, and the Python function that runs it, which every engine calls. Host code can make its own
+#   Python functions (e.g. hashing or math kernels) callable from MyPL programs with register(), before the programs
+#   are checked:
+#
+#       builtins.register('hash', [token.STRINGTYPE], token.INTTYPE, lambda s: zlib.crc32(s.encode()), pure=True)
+#
+#   Engines check the arguments for nil values before calling a built in, and report a BuiltInError it raises as a
+#   MyPL error at the call.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_input as reader
+import mypl_array as arrays
+import mypl_map as maps
+import mypl_rope as rope
+import array
+import bisect
+import functools
+
+ELEMENT = 'ELEMENT'     # return type of a built in returning an element of the array (a value of the map) it is given
+KEY = 'KEY'     # parameter type of a key of the map a built in is given
+KEYS = 'KEYS'   # return type of a built in returning an array of the keys of the map it is given
+
+
+class BuiltInError(Exception):
+    """An error in the arguments of a built in function call, e.g. an index
+    out of range
+    """
+
+
+class BuiltIn(object):
+    """A function that MyPL programs can call without declaring it"""
+    __slots__ = ('name', 'param_types', 'return_type', 'function', 'pure', 'io')
+
+    def __init__(self, name, param_types, return_type, function, pure=False, io=False):
+        self.name = name
+        self.param_types = param_types  # list of token types, ELEMENT or KEY
+        self.return_type = return_type  # token type, token.NIL for none, ELEMENT or KEYS
+        self.function = function  # Python callable taking the argument values
+        self.pure = pure  # its result depends on its arguments alone (see mypl_memo)
+        self.io = io  # function also takes the program's Writer and Reader, before the arguments
+
+    def bind(self, the_output, the_input):
+        """the function called with the argument values alone, for a program
+        writing to the_output and reading from the_input
+        """
+        if not self.io:
+            return self.function
+        return functools.partial(self.function, the_output, the_input)
+
+    def arguments(self, args):
+        """the arguments a call with the wrong number of them (which the type
+        checker allows) passes on, as the interpreter always did: one
+        parameter functions take the last argument, the others the first ones
+        """
+        if len(self.param_types) == 1:
+            return args[-1:]
+        return args[:len(self.param_types)]
+
+
+BUILT_INS = {}  # {name: BuiltIn}
+
+
+def register(name, param_types, return_type, function, pure=False, io=False):
+    """makes function callable from MyPL programs as name, with parameters of
+    the given token types, e.g. [token.STRINGTYPE], returning a value of the
+    return_type token type (token.NIL for none)
+    """
+    BUILT_INS[name] = BuiltIn(name, param_types, return_type, function, pure, io)
+
+
+def print_(the_output, the_input, value):
+    the_output.write(str(value))
+
+
+def get(index, string):
+    if 0 <= index < len(string):
+        return string[index]
+    raise BuiltInError('index out of range error')
+
+
+def readline(the_input):
+    line = the_input.readline()
+    if line is None:
+        raise BuiltInError('end of input error')
+    return line
+
+
+def reads(the_output, the_input):
+    return readline(the_input)
+
+
+def readi(the_output, the_input):
+    try:
+        return int(readline(the_input))
+    except ValueError:
+        raise BuiltInError('bad int value')
+
+
+def readf(the_output, the_input):
+    try:
+        return float(readline(the_input))
+    except ValueError:
+        raise BuiltInError('bad float value')
+
+
+def eof(the_output, the_input):
+    return the_input.eof()
+
+
+def nfields(line):
+    return len(reader.fields(str(line)))
+
+
+def field(index, line):
+    fields = reader.fields(str(line))
+    if 0 <= index < len(fields):
+        return fields[index]
+    raise BuiltInError('index out of range error')
+
+
+def fill(values, value):
+    if isinstance(values, array.array):
+        try:
+            values[:] = array.array(values.typecode, [value]) * len(values)
+        except (TypeError, OverflowError):
+            raise BuiltInError(arrays.store_error(value))
+    else:
+        values[:] = [value] * len(values)
+
+
+def copy(source, start, target, at, count):
+    if count < 0 or not (0 <= start <= len(source) - count and 0 <= at <= len(target) - count):
+        raise BuiltInError('index out of range error')
+    try:
+        target[at:at + count] = source[start:start + count]
+    except TypeError:   # e.g. from an int array to a float array
+        raise BuiltInError('mismatch type in copy')
+
+
+def sum_(values):
+    if not isinstance(values, array.array):
+        raise BuiltInError('sum of a non-numeric array')
+    return sum(values)
+
+
+def sortable(values):
+    # values as a list that sorts like the values of the array, strings as plain strings
+    if isinstance(values, array.array):
+        return values
+    values = [rope.flatten(value) for value in values]
+    for value in values:
+        if value is None:
+            raise BuiltInError('nil value error')
+        if value.__class__ is not str and value.__class__ is not bool:
+            raise BuiltInError('array elements cannot be compared')
+    return values
+
+
+def sort(values):
+    if isinstance(values, array.array):
+        values[:] = array.array(values.typecode, sorted(values))
+    else:
+        values[:] = sorted(sortable(values))
+
+
+def search(values, value):
+    values = sortable(values)
+    value = rope.flatten(value)
+    try:
+        i = bisect.bisect_left(values, value)
+    except TypeError:
+        raise BuiltInError('array elements cannot be compared')
+    if i < len(values) and values[i] == value:
+        return i
+    return -1
+
+
+def map_key(table, value):
+    # value as a key of table, strings as plain strings
+    value = rope.flatten(value)
+    if value.__class__ is not maps.KEY_CLASSES[table.key_type]:
+        raise BuiltInError('mismatch type in map key')
+    return value
+
+
+def put(table, key, value):
+    table[map_key(table, key)] = value
+
+
+def lookup(table, key):
+    try:
+        return table[map_key(table, key)]
+    except KeyError:
+        raise BuiltInError('missing key error')
+
+
+def has(table, key):
+    return map_key(table, key) in table
+
+
+def remove(table, key):
+    table.pop(map_key(table, key), None)
+
+
+def keys(table):
+    typecode = arrays.TYPECODES.get(table.key_type)
+    if typecode is None:
+        return list(table)
+    try:
+        return array.array(typecode, table)
+    except OverflowError:
+        raise BuiltInError('int value out of range error')
+
+
+register('print', [token.STRINGTYPE], token.NIL, print_, io=True)
+register('length', [token.STRINGTYPE], token.INTTYPE, len, pure=True)
+register('get', [token.INTTYPE, token.STRINGTYPE], token.STRINGTYPE, get, pure=True)
+register('reads', [], token.STRINGTYPE, reads, io=True)
+register('readi', [], token.INTTYPE, readi, io=True)
+register('readf', [], token.FLOATTYPE, readf, io=True)
+register('eof', [], token.BOOLTYPE, eof, io=True)
+# conversions
+register('itos', [token.INTTYPE], token.STRINGTYPE, str, pure=True)
+register('ftos', [token.FLOATTYPE], token.STRINGTYPE, str, pure=True)
+register('itof', [token.INTTYPE], token.FLOATTYPE, float, pure=True)
+register('stoi', [token.STRINGTYPE], token.INTTYPE, int, pure=True)
+register('stof', [token.STRINGTYPE], token.FLOATTYPE, float, pure=True)
+# input parsing
+register('nfields', [token.STRINGTYPE], token.INTTYPE, nfields, pure=True)
+register('field', [token.INTTYPE, token.STRINGTYPE], token.STRINGTYPE, field, pure=True)
+# arrays: length() gives their size too
+register('fill', [token.ARRAYTYPE, ELEMENT], token.NIL, fill)
+register('copy', [token.ARRAYTYPE, token.INTTYPE, token.ARRAYTYPE, token.INTTYPE, token.INTTYPE], token.NIL, copy)
+register('sum', [token.ARRAYTYPE], ELEMENT, sum_, pure=True)
+register('sort', [token.ARRAYTYPE], token.NIL, sort)
+register('search', [token.ARRAYTYPE, ELEMENT], token.INTTYPE, search, pure=True)
+# maps: keys() gives their keys in the order they were first put
+register('put', [token.MAPTYPE, KEY, ELEMENT], token.NIL, put)
+register('lookup', [token.MAPTYPE, KEY], ELEMENT, lookup, pure=True)
+register('has', [token.MAPTYPE, KEY], token.BOOLTYPE, has, pure=True)
+register('remove', [token.MAPTYPE, KEY], token.NIL, remove)
+register('size', [token.MAPTYPE], token.INTTYPE, len, pure=True)
+register('keys', [token.MAPTYPE], KEYS, keys, pure=True)
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Instruction set for the MyPL virtual machine. Every instruction is two words long (an opcode followed by a
+#   single integer argument) and is stored in a flat list of ints inside a Code object, together with the constant
+#   pool the arguments index into.
+# ----------------------------------------------------------------------
+
+# stack and variable instructions
+LOAD_CONST = 0      # push consts[arg]
+LOAD_LOCAL = 1      # push locals[arg]
+STORE_LOCAL = 2     # pop into locals[arg]
+LOAD_GLOBAL = 3     # push globals[arg]
+STORE_GLOBAL = 4    # pop into globals[arg]
+LOAD_FIELD = 5      # pop a struct, push its field consts[arg] = (slot or None, name, token)
+STORE_FIELD = 6     # pop a struct and a value, set field consts[arg] = (slot or None, name, token)
+POP = 7             # discard the top of the stack
+# math instructions
+ADD = 8
+SUB = 9
+MUL = 10
+DIV = 11
+MOD = 12
+# boolean instructions
+EQ = 13
+NE = 14
+LT = 15
+LE = 16
+GT = 17
+GE = 18
+AND_JUMP = 19       # if the top is not True, replace it with False and continue at arg, else pop it
+OR_JUMP = 20        # if the top is True, continue at arg, else pop it
+NOT = 21
+# control flow instructions
+JUMP = 22           # continue at instruction index arg
+JUMP_IF_FALSE = 23  # pop a value, continue at arg if it is false
+CALL = 24           # call consts[arg] = (Code, number of args)
+CALL_BUILTIN = 25   # call consts[arg] = (name, number of args, token)
+NEW = 26            # run the initializer consts[arg] (a Code) and push the new struct
+MAKE_STRUCT = 27    # push a record of the current locals with layout consts[arg]
+RETURN = 28         # pop the return value and leave the current code
+IS_TRUE = 29        # replace the top with whether it is True
+# array instructions
+NEW_ARRAY = 30      # pop a size, push a new array of consts[arg] = (element token type, token)
+LOAD_INDEX = 31     # pop an array and an index, push the element, consts[arg] is the array's token
+STORE_INDEX = 32    # pop an array, a value and an index, set the element, consts[arg] is the array's token
+NEW_MAP = 33        # push a new empty map with keys of the token type consts[arg]
+
+OPNAMES = ['LOAD_CONST', 'LOAD_LOCAL', 'STORE_LOCAL', 'LOAD_GLOBAL', 'STORE_GLOBAL', 'LOAD_FIELD', 'STORE_FIELD',
+           'POP', 'ADD', 'SUB', 'MUL', 'DIV', 'MOD', 'EQ', 'NE', 'LT', 'LE', 'GT', 'GE', 'AND_JUMP', 'OR_JUMP', 'NOT',
+           'JUMP', 'JUMP_IF_FALSE', 'CALL', 'CALL_BUILTIN', 'NEW', 'MAKE_STRUCT', 'RETURN', 'IS_TRUE',
+           'NEW_ARRAY', 'LOAD_INDEX', 'STORE_INDEX', 'NEW_MAP']
+
+
+class Code(object):
+    """A compiled unit (the main program, a function or a struct
+    initializer): a flat instruction list, a constant pool, and the
+    number of local variable slots the unit needs.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.instrs = []  # [opcode, arg, opcode, arg, ...]
+        self.consts = []  # constant pool
+        self.nlocals = 0  # number of local slots (parameters first)
+        self.nparams = 0  # number of parameters
+        self.nglobals = 0  # number of global slots (main program only)
+
+    def __str__(self):
+        s = '%s (%i params, %i locals)\n' % (self.name, self.nparams, self.nlocals)
+        for pc in range(0, len(self.instrs), 2):
+            s += '%6i %-14s %i\n' % (pc, OPNAMES[self.instrs[pc]], self.instrs[pc + 1])
+        return s
+
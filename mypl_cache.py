@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   On-disk cache of checked, optimized and resolved MyPL programs, in the spirit of __pycache__. Each entry is a pickled AST
+#   stored in a __myplcache__ directory next to the source file and keyed by a hash of the source text together with
+#   the interpreter version, so a warm run can skip lexing, parsing, type checking and resolving entirely. Programs
+#   translated to Python are cached the same way, as .pyc files holding the compiled code.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_ast as ast
+import mypl_lexer as lexer
+import mypl_parser as parser
+import mypl_type_checker as type_checker
+import mypl_optimizer as optimizer
+import mypl_resolver as resolver
+import mypl_transpiler as transpiler
+import mypl_builtins as builtins
+import gc
+import hashlib
+import importlib.util
+import marshal
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+CACHE_DIR = '__myplcache__'
+CACHE_FORMAT = 1  # bump when the layout of a cache entry changes
+
+# modules whose code determines the cached form of a program, and of its Python translation
+FRONT_END = [token, ast, lexer, parser, type_checker, optimizer, resolver, builtins]
+PYTHON_BACK_END = FRONT_END + [transpiler]
+
+DIGEST_LENGTH = 32  # hex digits of an entry's key in its file name
+
+PYC_FLAGS = 0b01  # hash based .pyc (PEP 552), its hash is checked against the MyPL source here rather than by Python
+
+
+def interpreter_version(modules=FRONT_END):
+    """digest identifying this interpreter: the cache format, the Python
+    implementation, and the source of every module the cached form
+    depends on
+    """
+    digest = hashlib.sha256()
+    digest.update(('%i %s\n' % (CACHE_FORMAT, sys.implementation.cache_tag)).encode())
+    for module in modules:
+        with open(module.__file__, 'rb') as module_file:
+            digest.update(module_file.read())
+    return digest.hexdigest()
+
+
+class Cache(object):
+    """The cache entries of one MyPL source file"""
+
+    def __init__(self, filename):
+        directory, basename = os.path.split(os.path.abspath(filename))
+        self.directory = os.path.join(directory, CACHE_DIR)
+        self.prefix = basename + '.'
+        self.entry_pattern = re.compile(re.escape(self.prefix) + '[0-9a-f]{%i}' % DIGEST_LENGTH + r'(\.\w+)$')
+        self.version = interpreter_version()
+        self.code_version = interpreter_version(PYTHON_BACK_END)
+
+    def __path(self, source, version, suffix):
+        digest = hashlib.sha256(version.encode())
+        digest.update(source.encode())
+        return os.path.join(self.directory, self.prefix + digest.hexdigest()[:DIGEST_LENGTH] + suffix)
+
+    def __untraced(self, function, *args):
+        # (un)pickling an AST allocates a lot and creates no cyclic garbage, so don't let the collector trace it
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return function(*args)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def load(self, source):
+        """returns the cached program for source, None on a miss"""
+        try:
+            with open(self.__path(source, self.version, '.pickle'), 'rb') as cache_file:
+                stmt_list = self.__untraced(pickle.load, cache_file)
+        except Exception:  # missing, unreadable, truncated or stale entries are all misses
+            return None
+        if not isinstance(stmt_list, ast.StmtList):
+            return None
+        return stmt_list
+
+    def store(self, source, stmt_list):
+        """writes the program for source, replacing older entries of the
+        same file; failures only mean the next run is a miss
+        """
+        try:
+            data = self.__untraced(pickle.dumps, stmt_list, pickle.HIGHEST_PROTOCOL)
+        except RecursionError:  # too deeply nested to pickle, just don't cache it
+            return
+        self.__write(self.__path(source, self.version, '.pickle'), data, '.pickle')
+
+    def load_code(self, source):
+        """returns the cached Python code of source, None on a miss"""
+        try:
+            with open(self.__path(source, self.code_version, '.pyc'), 'rb') as cache_file:
+                data = cache_file.read()
+            if data[:16] != self.__pyc_header(source):
+                return None
+            return marshal.loads(data[16:])
+        except Exception:  # missing, unreadable, truncated or stale entries are all misses
+            return None
+
+    def store_code(self, source, code):
+        """writes the Python code of source as a .pyc file, replacing older
+        ones of the same file
+        """
+        data = self.__pyc_header(source) + marshal.dumps(code)
+        self.__write(self.__path(source, self.code_version, '.pyc'), data, '.pyc')
+
+    def __pyc_header(self, source):
+        return importlib.util.MAGIC_NUMBER + PYC_FLAGS.to_bytes(4, 'little') + \
+            importlib.util.source_hash(source.encode())
+
+    def __write(self, path, data, suffix):
+        # atomically replaces the entry at path, then removes the other entries of this file with the same suffix
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=self.prefix, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)  # readers see the old entry or the complete new one
+            for entry in os.listdir(self.directory):  # only this file's, not those of e.g. <basename>.x.mypl
+                match = self.entry_pattern.match(entry)
+                if match and match.group(1) == suffix and os.path.join(self.directory, entry) != path:
+                    os.remove(os.path.join(self.directory, entry))
+        except OSError:
+            pass
+
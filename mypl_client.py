@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Thin client for the MyPL daemon (see mypl_daemon.py). It sends the program's source over the daemon's Unix socket
+#   together with its own stdin, stdout and stderr, so the job the daemon forks reads and writes them directly, then
+#   waits for the job's exit status and exits with it. It imports nothing from MyPL, and not even argparse or
+#   tempfile (which take longer to import than the daemon takes to run a small job), so starting it costs little more
+#   than starting Python.
+#
+#       python3 mypl_client.py script.mypl < input.txt
+# ----------------------------------------------------------------------
+
+import json
+import os
+import socket
+import sys
+
+ENGINES = ['interpreter', 'vm', 'closure', 'python']
+USAGE = '''usage: mypl_client.py [--engine {%s}] [--socket PATH] [--gc-threshold N] [--unbuffered] file
+
+Run a MyPL program on the MyPL daemon.
+
+  --engine ENGINE   execution backend (default: interpreter)
+  --socket PATH     the daemon's socket (default: $MYPL_SOCKET, else mypl-<uid>.sock in $TMPDIR or /tmp)
+  --gc-threshold N  heap size that triggers the first garbage collection, 0 disables it
+                    (interpreter only, default: 10000)
+  --unbuffered      write every print straight to stdout instead of buffering program output
+''' % ','.join(ENGINES)
+
+
+def default_socket():
+    """the daemon's socket: $MYPL_SOCKET, or one per user in $TMPDIR (or /tmp)"""
+    temp_dir = os.environ.get('TMPDIR') or '/tmp'
+    return os.environ.get('MYPL_SOCKET') or os.path.join(temp_dir, 'mypl-%i.sock' % os.getuid())
+
+
+def run(filename, engine='interpreter', socket_path=None, gc_threshold=10000, buffer_size=None):
+    """runs the program in filename on the daemon with this process's stdin,
+    stdout and stderr, returning its exit status. Raises ConnectionError if
+    no daemon is listening on socket_path.
+    """
+    with open(filename, 'rb') as file_stream:
+        source = file_stream.read()
+    header = {'filename': os.path.abspath(filename), 'engine': engine, 'size': len(source),
+              'gc_threshold': gc_threshold, 'buffer_size': buffer_size}
+    socket_path = socket_path or default_socket()
+    sys.stdout.flush()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            raise ConnectionError('no MyPL daemon at %s, start one with python3 mypl_daemon.py' % socket_path)
+        socket.send_fds(sock, [json.dumps(header).encode() + b'\n'], [0, 1, 2])
+        sock.sendall(source)
+        status = b''
+        while True:
+            data = sock.recv(64)
+            if not data:
+                break
+            status += data
+    if not status:  # the daemon went away
+        sys.stderr.write('error: the MyPL daemon ended the job without an exit status\n')
+        return 1
+    return int(status)
+
+
+def parse_args(argv):
+    """the options in argv as a dict, exiting with the usage message if they
+    are not valid
+    """
+    args = {'file': None, 'engine': 'interpreter', 'socket': None, 'gc_threshold': 10000, 'unbuffered': False}
+    argv = list(argv)
+    while argv:
+        arg = argv.pop(0)
+        name, has_value, value = arg.partition('=')
+        if arg in ('-h', '--help'):
+            sys.stdout.write(USAGE)
+            sys.exit(0)
+        elif arg == '--unbuffered':
+            args['unbuffered'] = True
+        elif name in ('--engine', '--socket', '--gc-threshold'):
+            if not has_value:
+                if not argv:
+                    usage_error('%s expects a value' % name)
+                value = argv.pop(0)
+            args[name[2:].replace('-', '_')] = value
+        elif arg.startswith('-') or args['file'] is not None:
+            usage_error('unrecognized argument %s' % arg)
+        else:
+            args['file'] = arg
+    if args['file'] is None:
+        usage_error('the file argument is required')
+    if args['engine'] not in ENGINES:
+        usage_error('invalid engine %s (choose from %s)' % (args['engine'], ', '.join(ENGINES)))
+    try:
+        args['gc_threshold'] = int(args['gc_threshold'])
+    except ValueError:
+        usage_error('invalid --gc-threshold %s' % args['gc_threshold'])
+    return args
+
+
+def usage_error(msg):
+    sys.stderr.write(USAGE.split('\n\n')[0] + '\n')
+    sys.exit('mypl_client.py: error: %s' % msg)
+
+
+if __name__ == '__main__':
+    # parsed by hand: importing argparse would double the time the client takes to start
+    args = parse_args(sys.argv[1:])
+    try:
+        sys.exit(run(args['file'], args['engine'], args['socket'], args['gc_threshold'],
+                     0 if args['unbuffered'] else None))
+    except FileNotFoundError:
+        sys.exit('invalid filename %s' % args['file'])
+    except ConnectionError as e:
+        sys.exit(e)
+    except KeyboardInterrupt:   # the daemon stops the job when the connection closes
+        sys.exit(130)
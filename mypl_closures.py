@@ -0,0 +1,555 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Closure compiling engine for MyPL. A resolved program is walked once and every node becomes a Python closure
+#   specialized for it: literals, operators and variable slots are fixed when the closure is built, so running the
+#   program is just closures calling closures. Expression closures take the current frame and return their value.
+#   Statement closures return None to continue, or a (value,) tuple when a return statement runs, or a TailCall
+#   when it returns the result of a call, which the enclosing call then runs in place of the one returning it.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_ast as ast
+import mypl_error as error
+import mypl_heap as heap
+import mypl_array as arrays
+import mypl_map as maps
+import mypl_interpreter as interpreter
+import mypl_output as output
+import mypl_input as reader
+import mypl_builtins as builtins
+import mypl_rope as rope
+import sys
+
+NIL_RESULT = (None,)  # result of a return statement without an expression
+
+
+class Function(object):
+    """A compiled MyPL function. Its body is filled in once it is built,
+    so calls inside the body (recursion) can refer to it first.
+    """
+    __slots__ = ('name', 'nparams', 'frame_size', 'body')
+
+    def __init__(self, fun_decl):
+        self.name = fun_decl.fun_name.lexeme
+        self.nparams = len(fun_decl.params)
+        self.frame_size = fun_decl.frame_size
+        self.body = None
+
+
+class TailCall(object):
+    """A call a function returns the result of, to be run by its caller"""
+    __slots__ = ('function', 'frame')
+
+    def __init__(self, function, frame):
+        self.function = function
+        self.frame = frame
+
+
+class Program(object):
+    """A compiled MyPL program"""
+
+    def __init__(self, body, global_frame, the_output):
+        self.body = body
+        self.global_frame = global_frame  # shared with the closures that read and write globals
+        self.output = the_output  # the Writer the print closures write to
+
+    def run(self):
+        """runs the program, starting from fresh globals"""
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), interpreter.RECURSION_LIMIT))
+        self.global_frame[:] = [None] * len(self.global_frame)
+        try:
+            self.body(self.global_frame)
+        finally:
+            self.output.flush()
+
+
+class ClosureCompiler(ast.Visitor):
+    """A MyPL closure compiling visitor implementation"""
+
+    def __init__(self, the_output=None, the_input=None):
+        self.global_frame = []
+        self.output = output.Writer() if the_output is None else the_output
+        self.input = reader.Reader(None, reader.BLOCK_SIZE, self.output) if the_input is None else the_input
+        self.current_closure = None  # closure built for the last visited node
+        self.returns = False  # the statements built so far contain a return statement
+        self.functions = {}  # {FunDeclStmt: Function}
+        self.structs = {}  # {StructDeclStmt: closure initializing a new struct's fields}
+
+    def compile(self, stmt_list):
+        """builds the closures of a resolved program"""
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), interpreter.RECURSION_LIMIT))  # as deep as the parser allows
+        self.global_frame = [None] * stmt_list.frame_size
+        return Program(self.__build(stmt_list), self.global_frame, self.output)
+
+    def __error(self, msg, the_token):
+        raise error.MyPLError(msg, the_token.line, the_token.column)
+
+    def __build(self, node):
+        node.accept(self)
+        return self.current_closure
+
+    def __constant(self, expr):
+        # returns (True, value) if expr is a literal, (False, None) otherwise
+        if isinstance(expr, ast.SimpleExpr) and isinstance(expr.term, ast.SimpleRValue):
+            return True, expr.term.value
+        return False, None
+
+    def __get_var(self, address):
+        # closure reading a variable from the current (depth 0) or global (depth 1) frame
+        slot = address[1]
+        if address[0] == 0:
+            return lambda frame: frame[slot]
+        global_frame = self.global_frame
+        return lambda frame: global_frame[slot]
+
+    def __walk(self, get_var, path, field_slots):
+        # closure following the fields in path[1:-1] from a variable, returning the record holding path[-1]
+        steps = []  # (slot or None if unknown until run time, field name, token of the struct value)
+        for i in range(1, len(path) - 1):
+            steps.append((None if field_slots is None else field_slots[i - 1], path[i].lexeme, path[i - 1]))
+        last_token = path[-2]
+
+        def walk(frame):
+            record = get_var(frame)
+            for slot, name, the_token in steps:
+                if record is None:
+                    self.__error('nil value error', the_token)
+                record = record[record.layout[name] if slot is None else slot]
+            if record is None:
+                self.__error('nil value error', last_token)
+            return record
+        return walk
+
+    def __math(self, mathrel, first, rest):
+        if mathrel == token.PLUS:
+            def add(frame):
+                first_value = first(frame)
+                rest_value = rest(frame)
+                if first_value.__class__ is str or first_value.__class__ is rope.Rope:
+                    return rope.concat(first_value, rest_value)
+                return first_value + rest_value
+            return add
+        elif mathrel == token.MINUS:
+            return lambda frame: first(frame) - rest(frame)
+        elif mathrel == token.MULTIPLY:
+            return lambda frame: first(frame) * rest(frame)
+        elif mathrel == token.DIVIDE:
+            def divide(frame):
+                first_value = first(frame)
+                rest_value = rest(frame)
+                if type(first_value) == int and type(rest_value) == int:    # both values are int, result is an int
+                    return int(first_value / rest_value)
+                return first_value / rest_value
+            return divide
+        return lambda frame: first(frame) % rest(frame)
+
+    def __math_constant(self, mathrel, first, value):
+        # math closure for a literal second operand, None if there is no specialized form
+        if mathrel == token.PLUS:
+            if type(value) == str:
+                return lambda frame: rope.concat(first(frame), value)
+            return lambda frame: first(frame) + value
+        elif mathrel == token.MINUS:
+            return lambda frame: first(frame) - value
+        elif mathrel == token.MULTIPLY:
+            return lambda frame: first(frame) * value
+        return None
+
+    def __compare(self, boolrel, first, second):
+        if boolrel == token.EQUAL:
+            return lambda frame: first(frame) == second(frame)
+        elif boolrel == token.NOT_EQUAL:
+            return lambda frame: first(frame) != second(frame)
+        elif boolrel == token.LESS_THAN:
+            return lambda frame: first(frame) < second(frame)
+        elif boolrel == token.LESS_THAN_EQUAL:
+            return lambda frame: first(frame) <= second(frame)
+        elif boolrel == token.GREATER_THAN:
+            return lambda frame: first(frame) > second(frame)
+        return lambda frame: first(frame) >= second(frame)
+
+    def __compare_constant(self, boolrel, first, value):
+        if boolrel == token.EQUAL:
+            return lambda frame: first(frame) == value
+        elif boolrel == token.NOT_EQUAL:
+            return lambda frame: first(frame) != value
+        elif boolrel == token.LESS_THAN:
+            return lambda frame: first(frame) < value
+        elif boolrel == token.LESS_THAN_EQUAL:
+            return lambda frame: first(frame) <= value
+        elif boolrel == token.GREATER_THAN:
+            return lambda frame: first(frame) > value
+        return lambda frame: first(frame) >= value
+
+    def __built_in(self, fun_name, args, the_token):
+        # closure for a call to a built in function, args are the closures of its arguments
+        built_in = builtins.BUILT_INS.get(fun_name)
+        if built_in is None:
+            self.__error('unknown function call', the_token)
+        function = built_in.bind(self.output, self.input)
+        nparams = len(built_in.param_types)
+        if len(args) == nparams == 0:
+            def call0(frame):
+                try:
+                    return function()
+                except builtins.BuiltInError as e:
+                    self.__error(str(e), the_token)
+            return call0
+        elif len(args) == nparams == 1:
+            arg = args[0]
+
+            def call1(frame):
+                value = arg(frame)
+                if value is None:
+                    self.__error('nil value error', the_token)
+                try:
+                    return function(value)
+                except builtins.BuiltInError as e:
+                    self.__error(str(e), the_token)
+            return call1
+
+        def call(frame):
+            values = [arg(frame) for arg in args]
+            for value in values:    # check for nil values
+                if value is None:
+                    self.__error('nil value error', the_token)
+            if len(values) != nparams:
+                values = built_in.arguments(values)
+            try:
+                return function(*values)
+            except builtins.BuiltInError as e:
+                self.__error(str(e), the_token)
+        return call
+
+    def visit_stmt_list(self, stmt_list):
+        outer_returns = self.returns
+        self.returns = False
+        stmts = [self.__build(stmt) for stmt in stmt_list.stmts]
+        returns = self.returns
+        self.returns = outer_returns or returns
+        if not stmts:
+            self.current_closure = lambda frame: None
+        elif len(stmts) == 1:
+            self.current_closure = stmts[0]
+        elif not returns:   # nothing to check after each statement
+            def block(frame):
+                for stmt in stmts:
+                    stmt(frame)
+            self.current_closure = block
+        else:
+            def returning_block(frame):
+                for stmt in stmts:
+                    result = stmt(frame)
+                    if result is not None:
+                        return result
+            self.current_closure = returning_block
+
+    def visit_expr_stmt(self, expr_stmt):
+        tail_call = self.__tail_call(expr_stmt.expr)
+        if tail_call is not None:
+            self.current_closure = tail_call
+            return
+        expr = self.__build(expr_stmt.expr)
+
+        def run(frame):
+            expr(frame)
+        self.current_closure = run
+
+    def visit_var_decl_stmt(self, var_decl):
+        expr = self.__build(var_decl.var_expr)
+        slot = var_decl.address[1]
+
+        def declare(frame):
+            frame[slot] = expr(frame)
+        self.current_closure = declare
+
+    def visit_assign_stmt(self, assign_stmt):
+        rhs = self.__build(assign_stmt.rhs)
+        lval = assign_stmt.lhs
+        if lval.index_expr is not None:
+            self.current_closure = self.__assign_element(lval, rhs)
+            return
+        if len(lval.path) == 1:
+            slot = lval.address[1]
+            if lval.address[0] == 0:
+                def assign(frame):
+                    frame[slot] = rhs(frame)
+            else:
+                global_frame = self.global_frame
+
+                def assign(frame):
+                    global_frame[slot] = rhs(frame)
+            self.current_closure = assign
+            return
+        walk = self.__walk(self.__get_var(lval.address), lval.path, lval.field_slots)
+        name = lval.path[-1].lexeme
+        field_slot = None if lval.field_slots is None else lval.field_slots[-1]
+
+        def assign_field(frame):
+            value = rhs(frame)
+            record = walk(frame)
+            record[record.layout[name] if field_slot is None else field_slot] = value
+        self.current_closure = assign_field
+
+    def __assign_element(self, lval, rhs):
+        # statement closure storing into an array element: the index, then the value, then the array
+        index_expr = self.__build(lval.index_expr)
+        get_array = self.__get_var(lval.address)
+        if len(lval.path) > 1:
+            walk = self.__walk(get_array, lval.path, lval.field_slots)
+            name = lval.path[-1].lexeme
+            field_slot = None if lval.field_slots is None else lval.field_slots[-1]
+
+            def get_array(frame):
+                record = walk(frame)
+                return record[record.layout[name] if field_slot is None else field_slot]
+        the_token = lval.path[-1]
+
+        def assign_element(frame):
+            index = index_expr(frame)
+            value = rhs(frame)
+            the_array = get_array(frame)
+            if the_array is None or index is None:
+                self.__error('nil value error', the_token)
+            if not 0 <= index < len(the_array):
+                self.__error('index out of range error', the_token)
+            try:
+                the_array[index] = value
+            except (TypeError, OverflowError):  # an array buffer only holds ints or floats
+                self.__error(arrays.store_error(value), the_token)
+        return assign_element
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        fields = [self.__build(var_decl) for var_decl in struct_decl.var_decls]
+        frame_size = struct_decl.frame_size
+
+        def initialize(frame):
+            struct_frame = [None] * frame_size
+            for field in fields:
+                field(struct_frame)
+            return struct_frame
+        self.structs[struct_decl] = initialize
+        self.current_closure = lambda frame: None
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        function = self.__function(fun_decl)
+        outer_returns = self.returns
+        function.body = self.__build(fun_decl.stmt_list)
+        self.returns = outer_returns
+        self.current_closure = lambda frame: None
+
+    def __function(self, fun_decl):
+        if fun_decl not in self.functions:
+            self.functions[fun_decl] = Function(fun_decl)
+        return self.functions[fun_decl]
+
+    def visit_return_stmt(self, return_stmt):
+        self.returns = True
+        if return_stmt.return_expr is None:
+            self.current_closure = lambda frame: NIL_RESULT
+            return
+        tail_call = self.__tail_call(return_stmt.return_expr)
+        if tail_call is not None:
+            self.current_closure = tail_call
+            return
+        expr = self.__build(return_stmt.return_expr)
+        self.current_closure = lambda frame: (expr(frame),)
+
+    def visit_while_stmt(self, while_stmt):
+        condition = self.__build(while_stmt.bool_expr)
+        outer_returns = self.returns
+        self.returns = False
+        body = self.__build(while_stmt.stmt_list)
+        if not self.returns:
+            def loop(frame):
+                while condition(frame):
+                    body(frame)
+        else:
+            def loop(frame):
+                while condition(frame):
+                    result = body(frame)
+                    if result is not None:
+                        return result
+        self.returns = outer_returns or self.returns
+        self.current_closure = loop
+
+    def visit_if_stmt(self, if_stmt):
+        branches = [(self.__build(basic_if.bool_expr), self.__build(basic_if.stmt_list))
+                    for basic_if in [if_stmt.if_part] + if_stmt.elseifs]
+        else_body = self.__build(if_stmt.else_stmts) if if_stmt.has_else else None
+        if len(branches) == 1:
+            condition, body = branches[0]
+            if else_body is None:
+                def branch(frame):
+                    if condition(frame):
+                        return body(frame)
+            else:
+                def branch(frame):
+                    if condition(frame):
+                        return body(frame)
+                    return else_body(frame)
+        else:
+            def branch(frame):
+                for condition, body in branches:
+                    if condition(frame):
+                        return body(frame)
+                if else_body is not None:
+                    return else_body(frame)
+        self.current_closure = branch
+
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term.accept(self)
+
+    def visit_complex_expr(self, complex_expr):
+        first = self.__build(complex_expr.first_operand)
+        mathrel = complex_expr.math_rel.tokentype
+        is_constant, value = self.__constant(complex_expr.rest)
+        if is_constant:
+            closure = self.__math_constant(mathrel, first, value)
+            if closure is not None:
+                self.current_closure = closure
+                return
+        self.current_closure = self.__math(mathrel, first, self.__build(complex_expr.rest))
+
+    def visit_compare_expr(self, compare_expr):
+        boolrel = compare_expr.bool_rel.tokentype
+        first = self.__build(compare_expr.first_expr)
+        is_constant, constant = self.__constant(compare_expr.second_expr)
+        if is_constant:
+            self.current_closure = self.__compare_constant(boolrel, first, constant)
+        else:
+            self.current_closure = self.__compare(boolrel, first, self.__build(compare_expr.second_expr))
+
+    def visit_logic_expr(self, logic_expr):
+        # only True counts as true, and the operands after the one deciding the result are not evaluated
+        operands = [self.__build(operand) for operand in logic_expr.operands]
+        if logic_expr.connector.tokentype == token.AND:
+            if len(operands) == 2:
+                first, second = operands
+                self.current_closure = lambda frame: first(frame) is True and second(frame) is True
+            else:
+                self.current_closure = lambda frame: all(operand(frame) is True for operand in operands)
+        else:
+            if len(operands) == 2:
+                first, second = operands
+                self.current_closure = lambda frame: first(frame) is True or second(frame) is True
+            else:
+                self.current_closure = lambda frame: any(operand(frame) is True for operand in operands)
+
+    def visit_not_expr(self, not_expr):
+        operand = self.__build(not_expr.operand)
+        self.current_closure = lambda frame: operand(frame) is not True
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        value = simple_rvalue.value     # converted once by the optimizer
+        self.current_closure = lambda frame: value
+
+    def visit_new_rvalue(self, new_rvalue):
+        initialize = self.structs[new_rvalue.struct_decl]
+        layout = new_rvalue.struct_decl.field_index
+        self.current_closure = lambda frame: heap.Record(initialize(frame), layout)
+
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        size_expr = self.__build(new_array_rvalue.size_expr)
+        elem_type = new_array_rvalue.elem_type.tokentype
+        the_token = ast.first_token(new_array_rvalue)
+
+        def new_array(frame):
+            size = size_expr(frame)
+            if size is None:
+                self.__error('nil value error', the_token)
+            if size < 0:
+                self.__error('negative array size error', the_token)
+            return arrays.allocate(elem_type, size)
+        self.current_closure = new_array
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        key_type = new_map_rvalue.map_type.key_type.tokentype
+        self.current_closure = lambda frame: maps.Map(key_type)
+
+    def visit_index_rvalue(self, index_rvalue):
+        index_expr = self.__build(index_rvalue.index_expr)
+        get_array = self.__build(index_rvalue.array)
+        the_token = index_rvalue.array.path[-1]
+
+        def element(frame):
+            index = index_expr(frame)
+            the_array = get_array(frame)
+            if the_array is None or index is None:
+                self.__error('nil value error', the_token)
+            if not 0 <= index < len(the_array):
+                self.__error('index out of range error', the_token)
+            return the_array[index]
+        self.current_closure = element
+
+    def visit_call_rvalue(self, call_rvalue):
+        if call_rvalue.fun_decl is None:
+            args = [self.__build(arg) for arg in call_rvalue.args]
+            self.current_closure = self.__built_in(call_rvalue.fun.lexeme, args, call_rvalue.fun)
+            return
+        function = self.__function(call_rvalue.fun_decl)
+        arguments = self.__arguments(call_rvalue, function)
+
+        def call(frame):
+            result = function.body(arguments(frame))
+            while result.__class__ is TailCall:     # run the call the function ended with
+                result = result.function.body(result.frame)
+            if result is not None:
+                return result[0]
+            return None     # the body ran off its end: nil, as on every engine
+        self.current_closure = call
+
+    def __tail_call(self, expr):
+        # statement closure handing a call flagged by the resolver to the caller, None if expr is not one
+        while isinstance(expr, ast.SimpleExpr):
+            expr = expr.term
+        if not isinstance(expr, ast.CallRValue) or not expr.tail_call:
+            return None
+        function = self.__function(expr.fun_decl)
+        arguments = self.__arguments(expr, function)
+        self.returns = True
+        return lambda frame: TailCall(function, arguments(frame))
+
+    def __arguments(self, call_rvalue, function):
+        # closure evaluating the arguments of a call into the frame of the called function
+        args = [self.__build(arg) for arg in call_rvalue.args]
+        nparams = function.nparams
+        padding = [None] * max(0, function.frame_size - len(args))
+
+        def arguments(frame):
+            new_frame = [arg(frame) for arg in args]
+            if len(new_frame) > nparams:    # extra arguments are evaluated, then dropped
+                del new_frame[nparams:]
+                new_frame.extend([None] * (function.frame_size - nparams))
+            else:
+                new_frame.extend(padding)
+            return new_frame
+        return arguments
+
+    def visit_id_rvalue(self, id_rvalue):
+        get_var = self.__get_var(id_rvalue.address)
+        path = id_rvalue.path
+        if len(path) == 1:
+            self.current_closure = get_var
+            return
+        if len(path) == 2 and id_rvalue.field_slots is not None:    # the common case, one known field
+            field_slot = id_rvalue.field_slots[0]
+            first_token = path[0]
+
+            def field(frame):
+                record = get_var(frame)
+                if record is None:
+                    self.__error('nil value error', first_token)
+                return record[field_slot]
+            self.current_closure = field
+            return
+        walk = self.__walk(get_var, path, id_rvalue.field_slots)
+        name = path[-1].lexeme
+        field_slot = None if id_rvalue.field_slots is None else id_rvalue.field_slots[-1]
+
+        def fields(frame):
+            record = walk(frame)
+            return record[record.layout[name] if field_slot is None else field_slot]
+        self.current_closure = fields
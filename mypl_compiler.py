@@ -0,0 +1,265 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Lowers a type-checked MyPL AST into bytecode for the MyPL virtual machine. Variables are read and written through
+#   the local or global slots of the (depth, slot) addresses found by the resolver, which must run first, and frames
+#   are sized by it too. Literal values are converted once into the constant pool, and field accesses use the record
+#   slots the resolver found.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_ast as ast
+import mypl_error as error
+import mypl_bytecode as bc
+import mypl_builtins as builtins
+import mypl_interpreter as interpreter
+import sys
+
+
+MATH_OPS = {
+    token.PLUS: bc.ADD,
+    token.MINUS: bc.SUB,
+    token.MULTIPLY: bc.MUL,
+    token.DIVIDE: bc.DIV,
+    token.MODULO: bc.MOD,
+}
+
+BOOL_OPS = {
+    token.EQUAL: bc.EQ,
+    token.NOT_EQUAL: bc.NE,
+    token.LESS_THAN: bc.LT,
+    token.LESS_THAN_EQUAL: bc.LE,
+    token.GREATER_THAN: bc.GT,
+    token.GREATER_THAN_EQUAL: bc.GE,
+}
+
+
+class Compiler(ast.Visitor):
+    """A MyPL bytecode compiler visitor implementation"""
+
+    def __init__(self):
+        self.functions = {}  # {fun_name: Code}
+        self.structs = {}  # {struct_name: Code}
+        self.code = None  # Code currently being emitted
+        self.in_main = True  # emitting the main program, whose frame (depth 0) is the global one
+        self.const_index = {}  # {(type, value): const index} for the current Code
+
+    def compile(self, stmt_list):
+        """compiles the program and returns the Code of its main body"""
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), interpreter.RECURSION_LIMIT))  # as deep as the parser allows
+        main_code = bc.Code('<main>')
+        self.__begin(main_code, True)
+        stmt_list.accept(self)
+        self.__emit(bc.LOAD_CONST, self.__const(None))
+        self.__emit(bc.RETURN)
+        main_code.nglobals = stmt_list.frame_size
+        return main_code
+
+    def __error(self, msg, the_token):
+        raise error.MyPLError(msg, the_token.line, the_token.column)
+
+    def __begin(self, code, in_main):
+        # start emitting into code, returning the state to restore afterwards
+        saved = (self.code, self.in_main, self.const_index)
+        self.code = code
+        self.in_main = in_main
+        self.const_index = {}
+        return saved
+
+    def __end(self, saved):
+        self.code, self.in_main, self.const_index = saved
+
+    def __emit(self, opcode, arg=0):
+        self.code.instrs.append(opcode)
+        self.code.instrs.append(arg)
+        return len(self.code.instrs) - 1   # position of the argument, for patching jumps
+
+    def __patch(self, arg_pos):
+        # point a previously emitted jump at the next instruction
+        self.code.instrs[arg_pos] = len(self.code.instrs)
+
+    def __const(self, value):
+        if type(value) in (int, float, bool, str, type(None)):
+            key = (type(value), value)
+            if key not in self.const_index:
+                self.const_index[key] = len(self.code.consts)
+                self.code.consts.append(value)
+            return self.const_index[key]
+        self.code.consts.append(value)
+        return len(self.code.consts) - 1
+
+    def __is_global(self, address):
+        return address[0] == 1 or self.in_main
+
+    def __load(self, address):
+        self.__emit(bc.LOAD_GLOBAL if self.__is_global(address) else bc.LOAD_LOCAL, address[1])
+
+    def __store(self, address):
+        self.__emit(bc.STORE_GLOBAL if self.__is_global(address) else bc.STORE_LOCAL, address[1])
+
+    def visit_stmt_list(self, stmt_list):
+        for stmt in stmt_list.stmts:
+            stmt.accept(self)
+
+    def visit_expr_stmt(self, expr_stmt):
+        expr_stmt.expr.accept(self)
+        self.__emit(bc.POP)
+
+    def visit_var_decl_stmt(self, var_decl):
+        var_decl.var_expr.accept(self)
+        self.__store(var_decl.address)
+
+    def visit_assign_stmt(self, assign_stmt):
+        lval = assign_stmt.lhs
+        if lval.index_expr is None:
+            assign_stmt.rhs.accept(self)
+            lval.accept(self)
+            return
+        # an array element: the index, then the value, then the array
+        lval.index_expr.accept(self)
+        assign_stmt.rhs.accept(self)
+        self.__load(lval.address)
+        for i in range(1, len(lval.path)):
+            self.__emit(bc.LOAD_FIELD, self.__field(lval.path, lval.field_slots, i))
+        self.__emit(bc.STORE_INDEX, self.__const(lval.path[-1]))
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        # the initializer runs in the global environment, with earlier fields visible to later ones
+        struct_code = bc.Code(struct_decl.struct_id.lexeme)
+        self.structs[struct_decl.struct_id.lexeme] = struct_code
+        struct_code.nlocals = struct_decl.frame_size
+        saved = self.__begin(struct_code, False)
+        for var_decl in struct_decl.var_decls:  # field i is local i, as the resolver laid them out
+            var_decl.accept(self)
+        self.__emit(bc.MAKE_STRUCT, self.__const(struct_decl.field_index))
+        self.__emit(bc.RETURN)
+        self.__end(saved)
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        fun_code = bc.Code(fun_decl.fun_name.lexeme)
+        self.functions[fun_decl.fun_name.lexeme] = fun_code
+        fun_code.nparams = len(fun_decl.params)    # the first slots of the frame
+        fun_code.nlocals = fun_decl.frame_size
+        saved = self.__begin(fun_code, False)
+        fun_decl.stmt_list.accept(self)
+        self.__emit(bc.LOAD_CONST, self.__const(None))
+        self.__emit(bc.RETURN)
+        self.__end(saved)
+
+    def visit_return_stmt(self, return_stmt):
+        if return_stmt.return_expr is not None:
+            return_stmt.return_expr.accept(self)
+        else:
+            self.__emit(bc.LOAD_CONST, self.__const(None))
+        self.__emit(bc.RETURN)
+
+    def visit_while_stmt(self, while_stmt):
+        start = len(self.code.instrs)
+        while_stmt.bool_expr.accept(self)
+        exit_jump = self.__emit(bc.JUMP_IF_FALSE)
+        while_stmt.stmt_list.accept(self)
+        self.__emit(bc.JUMP, start)
+        self.__patch(exit_jump)
+
+    def visit_if_stmt(self, if_stmt):
+        end_jumps = []
+        for basic_if in [if_stmt.if_part] + if_stmt.elseifs:
+            basic_if.bool_expr.accept(self)
+            next_jump = self.__emit(bc.JUMP_IF_FALSE)
+            basic_if.stmt_list.accept(self)
+            end_jumps.append(self.__emit(bc.JUMP))
+            self.__patch(next_jump)
+        if if_stmt.has_else:
+            if_stmt.else_stmts.accept(self)
+        for end_jump in end_jumps:
+            self.__patch(end_jump)
+
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term.accept(self)
+
+    def visit_complex_expr(self, complex_expr):
+        complex_expr.first_operand.accept(self)
+        complex_expr.rest.accept(self)
+        self.__emit(MATH_OPS[complex_expr.math_rel.tokentype])
+
+    def visit_compare_expr(self, compare_expr):
+        compare_expr.first_expr.accept(self)
+        compare_expr.second_expr.accept(self)
+        self.__emit(BOOL_OPS[compare_expr.bool_rel.tokentype])
+
+    def __truth(self, expr):
+        # push whether expr is True, its value as a Boolean operand
+        expr.accept(self)
+        if not isinstance(expr, (ast.CompareExpr, ast.LogicExpr, ast.NotExpr)):     # not already a bool
+            self.__emit(bc.IS_TRUE)
+
+    def visit_logic_expr(self, logic_expr):
+        # every operand but the last jumps to the end if it decides the result, leaving it on the stack
+        opcode = bc.AND_JUMP if logic_expr.connector.tokentype == token.AND else bc.OR_JUMP
+        end_jumps = []
+        for operand in logic_expr.operands[:-1]:
+            operand.accept(self)
+            end_jumps.append(self.__emit(opcode))
+        self.__truth(logic_expr.operands[-1])
+        for end_jump in end_jumps:
+            self.__patch(end_jump)
+
+    def visit_not_expr(self, not_expr):
+        not_expr.operand.accept(self)
+        self.__emit(bc.NOT)
+
+    def __field(self, path, field_slots, i):
+        # constant for the field path[i]: (record slot or None if unknown, name, token of the struct value)
+        slot = None if field_slots is None else field_slots[i - 1]
+        return self.__const((slot, path[i].lexeme, path[i - 1]))
+
+    def visit_lvalue(self, lval):
+        # the value to store is already on the stack
+        if len(lval.path) == 1:
+            self.__store(lval.address)
+        else:
+            self.__load(lval.address)
+            for i in range(1, len(lval.path) - 1):
+                self.__emit(bc.LOAD_FIELD, self.__field(lval.path, lval.field_slots, i))
+            self.__emit(bc.STORE_FIELD, self.__field(lval.path, lval.field_slots, len(lval.path) - 1))
+
+    def visit_fun_param(self, fun_param):
+        pass    # the arguments of a call are its first slots
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        self.__emit(bc.LOAD_CONST, self.__const(simple_rvalue.value))
+
+    def visit_new_rvalue(self, new_rvalue):
+        if new_rvalue.struct_type.lexeme not in self.structs:
+            self.__error('value has not been declared', new_rvalue.struct_type)
+        self.__emit(bc.NEW, self.__const(self.structs[new_rvalue.struct_type.lexeme]))
+
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        new_array_rvalue.size_expr.accept(self)
+        elem_type = new_array_rvalue.elem_type.tokentype
+        self.__emit(bc.NEW_ARRAY, self.__const((elem_type, ast.first_token(new_array_rvalue))))
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        self.__emit(bc.NEW_MAP, self.__const(new_map_rvalue.map_type.key_type.tokentype))
+
+    def visit_index_rvalue(self, index_rvalue):
+        index_rvalue.index_expr.accept(self)
+        index_rvalue.array.accept(self)
+        self.__emit(bc.LOAD_INDEX, self.__const(index_rvalue.array.path[-1]))
+
+    def visit_call_rvalue(self, call_rvalue):
+        fun_name = call_rvalue.fun.lexeme
+        for arg in call_rvalue.args:
+            arg.accept(self)
+        if fun_name in self.functions:
+            self.__emit(bc.CALL, self.__const((self.functions[fun_name], len(call_rvalue.args))))
+        elif fun_name in builtins.BUILT_INS:
+            self.__emit(bc.CALL_BUILTIN, self.__const((fun_name, len(call_rvalue.args), call_rvalue.fun)))
+        else:
+            self.__error('function has not been declared', call_rvalue.fun)
+
+    def visit_id_rvalue(self, id_rvalue):
+        self.__load(id_rvalue.address)
+        for i in range(1, len(id_rvalue.path)):
+            self.__emit(bc.LOAD_FIELD, self.__field(id_rvalue.path, id_rvalue.field_slots, i))
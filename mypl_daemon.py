@@ -0,0 +1,290 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   A long running MyPL server, so running a small script doesn't pay for starting Python, importing every mypl_
+#   module and checking the program each time. The daemon imports everything once, keeps the last --cache-size
+#   programs it checked (a mypl_batch.Program each) in an LRU keyed by a hash of their source, and takes jobs from
+#   mypl_client.py over a Unix socket that only its user can open. Every job runs in a child forked from the daemon,
+#   which shares the checked program copy-on-write: gc.freeze() before the fork keeps the child's collector from
+#   writing to (and so copying) the pages of everything the daemon already holds. The child reads and writes the
+#   stdin, stdout and stderr the client passed along with the job, and the daemon reports its exit status back.
+#
+#       python3 mypl_daemon.py &
+#       python3 mypl_client.py script.mypl < input.txt
+# ----------------------------------------------------------------------
+
+import mypl_error as error
+import mypl_output as output
+import mypl_input as reader
+import mypl_batch as batch
+import mypl_client as client
+import main
+import argparse
+import collections
+import gc
+import hashlib
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+import traceback
+
+CACHE_SIZE = 64     # programs kept checked
+HEADER_LIMIT = 65536    # bytes, for the first line of a request
+REQUEST_TIMEOUT = 5.0   # seconds a client may take to send its request
+
+
+class Daemon(object):
+    """Serves MyPL jobs on a Unix socket, one forked child per job"""
+
+    def __init__(self, socket_path=None, cache_size=CACHE_SIZE):
+        self.socket_path = socket_path or client.default_socket()
+        self.cache_size = cache_size
+        self.programs = collections.OrderedDict()  # {(source hash, engine, gc threshold): Program}, oldest first
+        self.jobs = {}  # {pid of a running job: the client's connection, None once the client went away}
+        self.selector = selectors.DefaultSelector()
+        self.listener = None
+        self.wakeup = None  # (read end, write end) of the pipe SIGCHLD wakes the selector through
+
+    def serve(self):
+        """accepts and runs jobs until the process is interrupted or terminated"""
+        self.__listen()
+        self.wakeup = os.pipe()
+        os.set_blocking(self.wakeup[0], False)
+        os.set_blocking(self.wakeup[1], False)
+        signal.set_wakeup_fd(self.wakeup[1])
+        signal.signal(signal.SIGCHLD, lambda signum, frame: None)  # only to wake the selector
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.selector.register(self.wakeup[0], selectors.EVENT_READ)
+        try:
+            while True:
+                for key, events in self.selector.select():
+                    if key.fileobj is self.listener:
+                        self.__accept()
+                    elif key.fileobj == self.wakeup[0]:
+                        self.__reap()
+                    else:   # a client went away (e.g. it was interrupted) before its job ended
+                        self.__abandon(key.fileobj, key.data)
+        finally:
+            signal.set_wakeup_fd(-1)
+            self.listener.close()
+            os.unlink(self.socket_path)
+
+    def __listen(self):
+        # binds the socket, replacing a stale one left behind by a daemon that didn't exit cleanly
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if os.path.exists(self.socket_path):
+            try:
+                sock.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.unlink(self.socket_path)
+            else:
+                sys.exit('a MyPL daemon is already listening at %s' % self.socket_path)
+            sock.close()
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)     # only this user may connect
+        try:
+            sock.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        sock.listen(128)
+        self.listener = sock
+
+    def __accept(self):
+        # a job fails on its own, whatever goes wrong with it, rather than taking down the daemon for every client
+        conn, _ = self.listener.accept()
+        fds = []    # the client's stdin, stdout and stderr, once received
+        try:
+            conn.settimeout(REQUEST_TIMEOUT)
+            header, source = self.__request(conn, fds)
+            conn.settimeout(None)
+        except ValueError as e:
+            self.__fail(conn, fds, 'error: invalid request to the MyPL daemon: %s' % e)
+        except OSError:     # the client went away, or took too long to send its request
+            conn.close()
+        else:
+            try:
+                self.__fork(conn, self.__program(source, header), header, fds)
+            except error.MyPLError as e:
+                self.__fail(conn, fds, str(e))
+            except Exception as e:
+                self.__fail(conn, fds, 'error: %s' % e)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def __fail(self, conn, fds, msg):
+        # reports a job that failed in the daemon to its client
+        if len(fds) != 3:   # nowhere to report it
+            conn.close()
+            return
+        try:
+            os.write(fds[2], (msg + '\n').encode())
+        except OSError:
+            pass
+        self.__finish(conn, 1)
+
+    def __request(self, conn, fds):
+        # the header and the program's source from a new connection, adding the client's stdin, stdout and stderr to
+        # fds. Raises a ValueError if the request is malformed.
+        data, received, _, _ = socket.recv_fds(conn, HEADER_LIMIT, 3)
+        fds.extend(received)
+        if len(fds) != 3:
+            raise ValueError('expected stdin, stdout and stderr')
+        while b'\n' not in data:
+            more = conn.recv(HEADER_LIMIT)
+            if not more or len(data) > HEADER_LIMIT:
+                raise ValueError('no header line')
+            data += more
+        line, data = data.split(b'\n', 1)
+        header = json.loads(line)
+        self.__check(header)
+        size = header['size']
+        chunks = [data]
+        while size > len(data):
+            more = conn.recv(size - len(data))
+            if not more:
+                raise ValueError('truncated source')
+            chunks.append(more)
+            size -= len(more)
+        return header, b''.join(chunks).decode()
+
+    def __check(self, header):
+        # fills in the optional fields of a header, raising a ValueError for missing or invalid ones
+        if not isinstance(header, dict):
+            raise ValueError('the header is not an object')
+        size = header.get('size')
+        if type(size) != int or size < 0:
+            raise ValueError('invalid size %r' % (size,))
+        engine = header.setdefault('engine', 'interpreter')
+        if engine not in main.ENGINES:
+            raise ValueError('invalid engine %r' % (engine,))
+        gc_threshold = header.setdefault('gc_threshold', 10000)
+        if type(gc_threshold) != int:
+            raise ValueError('invalid gc_threshold %r' % (gc_threshold,))
+        buffer_size = header.setdefault('buffer_size', None)
+        if buffer_size is not None and (type(buffer_size) != int or buffer_size < 0):
+            raise ValueError('invalid buffer_size %r' % (buffer_size,))
+        filename = header.setdefault('filename', '<mypl>')
+        if type(filename) != str:
+            raise ValueError('invalid filename %r' % (filename,))
+
+    def __program(self, source, header):
+        # the checked program for a request, from the LRU if it was checked before
+        engine = header['engine']
+        gc_threshold = header['gc_threshold']
+        key = (hashlib.sha256(source.encode()).hexdigest(), engine, gc_threshold)
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+            return program
+        program = batch.Program(source, engine, header['filename'], None, gc_threshold)
+        self.programs[key] = program
+        if len(self.programs) > self.cache_size:
+            self.programs.popitem(last=False)
+        return program
+
+    def __fork(self, conn, program, header, fds):
+        gc.freeze()     # the child's collector leaves everything the daemon holds alone
+        try:
+            pid = os.fork()
+            if pid == 0:
+                self.__child(conn, program, header, fds)  # doesn't return
+        finally:
+            gc.unfreeze()
+        self.jobs[pid] = conn
+        self.selector.register(conn, selectors.EVENT_READ, pid)
+
+    def __child(self, job_conn, program, header, fds):
+        # runs a job in the forked child with the client's stdin, stdout and stderr, then exits with its status
+        status = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self.listener.close()
+            job_conn.close()
+            for fd in self.wakeup:
+                os.close(fd)
+            for conn in self.jobs.values():
+                if conn is not None:
+                    conn.close()
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            sys.stdin = open(0, 'r', closefd=False)
+            sys.stdout = open(1, 'w', closefd=False)
+            sys.stderr = open(2, 'w', closefd=False)
+            buffer_size = header['buffer_size']
+            the_output = output.Writer(None, output.BUFFER_SIZE if buffer_size is None else buffer_size)
+            the_input = reader.Reader(None, reader.BLOCK_SIZE, the_output)
+            program.run(the_output, the_input)
+            status = 0
+        except error.MyPLError as e:
+            sys.stderr.write('%s\n' % e)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(status)
+
+    def __reap(self):
+        # reports the exit status of every job that ended
+        try:
+            while os.read(self.wakeup[0], 512):
+                pass
+        except BlockingIOError:
+            pass
+        while self.jobs:
+            try:
+                pid, wait_status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            conn = self.jobs.pop(pid, None)
+            if conn is not None:
+                self.selector.unregister(conn)
+                self.__finish(conn, os.waitstatus_to_exitcode(wait_status))
+
+    def __finish(self, conn, status):
+        # sends a job's exit status to its client, signals as the shell reports them (128 + the signal number)
+        try:
+            conn.sendall(b'%i\n' % (status if status >= 0 else 128 - status))
+        except OSError:     # the client is gone
+            pass
+        conn.close()
+
+    def __abandon(self, conn, pid):
+        try:
+            if conn.recv(1):    # clients send nothing after their request
+                return
+        except OSError:
+            pass
+        self.selector.unregister(conn)
+        self.jobs[pid] = None   # still to be reaped
+        conn.close()
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Serve MyPL jobs from mypl_client.py over a Unix socket.')
+    arg_parser.add_argument('--socket', metavar='PATH', help='where to listen (default: %s)' % client.default_socket())
+    arg_parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, metavar='N',
+                            help='checked programs kept in memory (default: %i)' % CACHE_SIZE)
+    args = arg_parser.parse_args()
+    the_daemon = Daemon(args.socket, args.cache_size)
+    try:
+        the_daemon.serve()
+    except KeyboardInterrupt:
+        pass
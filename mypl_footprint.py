@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Measures the memory footprint of a MyPL syntax tree: every object reachable from the root (nodes, tokens, the
+#   lists holding them, lexeme strings, ...) is counted once and its size is charged to its type.
+# ----------------------------------------------------------------------
+
+import sys
+
+
+class Footprint(object):
+    """Bytes used per object type by everything reachable from a tree"""
+
+    def __init__(self, root):
+        self.counts = {}  # {type name: number of objects}
+        self.sizes = {}  # {type name: bytes}
+        self.__measure(root)
+
+    def __measure(self, root):
+        seen = set()
+        pending = [root]
+        while pending:
+            obj = pending.pop()
+            if id(obj) in seen or obj is None or type(obj) in (bool, type):
+                continue
+            seen.add(id(obj))
+            name = type(obj).__name__
+            size = sys.getsizeof(obj)
+            if hasattr(obj, '__dict__'):    # the attribute dict belongs to its object
+                size += sys.getsizeof(obj.__dict__)
+                pending.extend(obj.__dict__.values())
+            for cls in type(obj).__mro__:
+                for slot in cls.__dict__.get('__slots__', ()):
+                    pending.append(getattr(obj, slot, None))
+            if isinstance(obj, (list, tuple)):
+                pending.extend(obj)
+            elif isinstance(obj, dict):
+                pending.extend(obj.keys())
+                pending.extend(obj.values())
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.sizes[name] = self.sizes.get(name, 0) + size
+
+    def total(self):
+        return sum(self.sizes.values())
+
+    def __str__(self):
+        s = 'mem: %10s %12s %10s  %s\n' % ('objects', 'bytes', 'bytes/obj', 'type')
+        for name in sorted(self.sizes, key=lambda name: self.sizes[name], reverse=True):
+            s += 'mem: %10i %12i %10.1f  %s\n' % \
+                 (self.counts[name], self.sizes[name], self.sizes[name] / self.counts[name], name)
+        s += 'mem: %10i %12i %10s  total\n' % (sum(self.counts.values()), self.total(), '')
+        return s
@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Managed struct heap for the MyPL interpreter. Structs are stored under monotonically increasing oids (never
+#   reused) and reclaimed by a mark-and-sweep collector that traces from the roots the interpreter reports. Struct
+#   instances are compact records that hold their field values by slot. Arrays of structs (Python lists, see
+#   mypl_array) and maps (see mypl_map) live outside the heap, and the collector traces the oids in them.
+# ----------------------------------------------------------------------
+
+import mypl_map as maps
+import time
+
+
+class Oid(int):
+    """A reference to a struct on the heap. A distinct int type so the
+    collector can tell references apart from MyPL int values.
+    """
+    __slots__ = ()
+
+
+class Record(list):
+    """A struct instance: field values stored by slot, plus the layout
+    ({field name: slot}) shared by every instance of the struct.
+    Records compare by identity.
+    """
+    __slots__ = ('layout',)
+    __eq__ = object.__eq__
+    __ne__ = object.__ne__
+    __hash__ = object.__hash__
+
+    def __init__(self, values, layout):
+        list.__init__(self, values)
+        self.layout = layout
+
+
+def references(values, oids):
+    """adds the oids among values, and in the arrays and maps among them, to oids"""
+    for value in values:
+        if type(value) is Oid:
+            oids.append(value)
+        elif type(value) is list:   # an array of structs or arrays (Records are a list subclass)
+            references(value, oids)
+        elif type(value) is maps.Map:
+            references(value.values(), oids)
+
+
+class Heap(object):
+    """A mark-and-sweep collected heap of {oid: Record}."""
+
+    def __init__(self, roots, threshold=10000, growth=2.0):
+        self.roots = roots  # function returning an iterable of root values
+        self.objects = {}  # {oid: Record}
+        self.next_oid = 1
+        self.threshold = threshold  # heap size that triggers the first collection, 0 disables collection
+        self.growth = growth  # after a collection, the heap may grow by this factor before the next
+        self.next_collection = threshold
+        # statistics
+        self.allocations = 0
+        self.collections = 0
+        self.freed = 0
+        self.pause_time = 0.0
+        self.max_pause = 0.0
+
+    def __getitem__(self, oid):
+        return self.objects[oid]
+
+    def __len__(self):
+        return len(self.objects)
+
+    def allocate(self, struct_obj):
+        """stores a Record on the heap, collecting first if the threshold is reached"""
+        if self.threshold and len(self.objects) >= self.next_collection:
+            self.collect()
+        oid = Oid(self.next_oid)
+        self.next_oid += 1
+        self.objects[oid] = struct_obj
+        self.allocations += 1
+        return oid
+
+    def collect(self):
+        """frees every struct not reachable from the roots"""
+        start = time.perf_counter()
+        objects = self.objects
+        marked = set()
+        pending = []
+        references(self.roots(), pending)
+        while pending:  # mark
+            oid = pending.pop()
+            if oid in marked or oid not in objects:
+                continue
+            marked.add(oid)
+            for value in objects[oid]:
+                if type(value) is Oid:
+                    pending.append(value)
+                elif type(value) is list:
+                    references(value, pending)
+                elif type(value) is maps.Map:
+                    references(value.values(), pending)
+        garbage = [oid for oid in objects if oid not in marked]
+        for oid in garbage:  # sweep
+            del objects[oid]
+        self.next_collection = max(self.threshold, int(len(objects) * self.growth))
+        pause = time.perf_counter() - start
+        self.collections += 1
+        self.freed += len(garbage)
+        self.pause_time += pause
+        self.max_pause = max(self.max_pause, pause)
+
+    def __str__(self):
+        s = 'gc: %i allocations, %i collections, %i objects freed, %i live\n' % \
+            (self.allocations, self.collections, self.freed, len(self.objects))
+        s += 'gc: %.3f ms total pause, %.3f ms max pause\n' % (self.pause_time * 1000, self.max_pause * 1000)
+        return s
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Buffered program input for the MyPL engines. A Reader takes stdin in blocks of up to BLOCK_SIZE characters and
+#   serves reads, readi and readf one line at a time from the block, so scripts reading large inputs don't pay for a
+#   call into Python's input() per line. Only the unread part of the input is kept, bounding the memory used to a
+#   block plus the line being read. The eof built in asks the Reader whether any input is left, and fields() splits
+#   a line into its whitespace separated fields for the nfields and field built ins.
+# ----------------------------------------------------------------------
+
+import codecs
+import sys
+
+BLOCK_SIZE = 65536  # characters
+
+
+class Reader(object):
+    """Reads the program's input in blocks and hands it out line by line"""
+
+    def __init__(self, stream=None, size=BLOCK_SIZE, the_output=None):
+        self.stream = stream  # None for whatever sys.stdin is when input is first needed
+        self.size = size
+        self.output = the_output  # a mypl_output.Writer flushed before waiting for input, so prompts show
+        self.buffer = ''  # input read but not yet handed out, from pos on
+        self.pos = 0
+        self.at_end = False  # the stream has no more input
+        self.decoder = None  # for a binary stream, created on the first read
+
+    def __fill(self):
+        # adds the next block of the stream to the buffer, dropping what was already handed out
+        if self.output is not None:
+            self.output.flush()
+        stream = sys.stdin if self.stream is None else self.stream
+        binary = getattr(stream, 'buffer', None)
+        if binary is None:  # e.g. a StringIO
+            block = stream.read(self.size)
+        else:   # read1 returns what is available, so an interactive line is handed out as soon as it's typed
+            if self.decoder is None:
+                encoding = getattr(stream, 'encoding', None) or 'utf-8'
+                self.decoder = codecs.getincrementaldecoder(encoding)('replace')
+            data = binary.read1(self.size)
+            block = self.decoder.decode(data, not data)
+            if not data:
+                self.at_end = True
+        if not block and binary is None:
+            self.at_end = True
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+
+    def readline(self):
+        """the next line of input without its line break, None at the end of
+        the input
+        """
+        start = self.pos    # where the search for the line break starts
+        while True:
+            end = self.buffer.find('\n', start)
+            if end >= 0:
+                line = self.buffer[self.pos:end]
+                self.pos = end + 1
+                break
+            if self.at_end:
+                if self.pos == len(self.buffer):
+                    return None
+                line = self.buffer[self.pos:]   # the last line has no line break
+                self.pos = len(self.buffer)
+                break
+            start = len(self.buffer) - self.pos     # the unread part moves to the front of the buffer
+            self.__fill()
+        if line.endswith('\r'):
+            line = line[:-1]
+        return line
+
+    def eof(self):
+        """True when all of the input has been read"""
+        while self.pos == len(self.buffer) and not self.at_end:
+            self.__fill()
+        return self.pos == len(self.buffer)
+
+
+last_line = None    # the line fields() split last, parsing loops ask for the fields of one line many times
+last_fields = []
+
+
+def fields(line):
+    """the whitespace separated fields of a line (a str)"""
+    global last_line, last_fields
+    if line is not last_line:
+        last_fields = line.split()
+        last_line = line
+    return last_fields
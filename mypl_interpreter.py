@@ -8,33 +8,114 @@
 import mypl_token as token
 import mypl_ast as ast
 import mypl_error as error
-import mypl_symbol_table as sym_tbl
+import mypl_heap as heap
+import mypl_array as arrays
+import mypl_map as maps
+import mypl_memo as memo
+import mypl_output as output
+import mypl_input as reader
+import mypl_builtins as builtins
+import mypl_rope as rope
+import operator
+import sys
 
+RECURSION_LIMIT = 100000    # Python frames; every MyPL call nests a dozen or so visitor calls
 
-class ReturnException(Exception): pass
+COMPARISONS = {
+    token.EQUAL: operator.eq,
+    token.NOT_EQUAL: operator.ne,
+    token.LESS_THAN: operator.lt,
+    token.LESS_THAN_EQUAL: operator.le,
+    token.GREATER_THAN: operator.gt,
+    token.GREATER_THAN_EQUAL: operator.ge,
+}
+
+# how the last statement completed: statement lists stop running at anything but NORMAL
+NORMAL = 0
+RETURN = 1
 
 
 class Interpreter(ast.Visitor):
     """A MyPL interpreter visitor implementation"""
 
-    def __init__(self):
-        # initialize the symbol table (for ids -> values)
-        self.sym_table = sym_tbl.SymbolTable()
+    def __init__(self, gc_threshold=10000, gc_growth=2.0, the_memo=None, the_output=None, the_input=None):
+        # global frame (slots of the main program) and frame of the running function
+        self.global_frame = []
+        self.frame = self.global_frame
+        # frames of active calls and struct initializers, including ones whose args are being evaluated
+        self.call_stack = []
+        # (FunDeclStmt, frame) of a tail call waiting to replace the call that made it
+        self.tail_call = None
+        # completion of the last statement, RETURN until the running call has returned
+        self.completion = NORMAL
         # holds the type of last expression type
         self.current_value = None
-        # the heap {oid:struct_obj}
-        self.heap = {}
+        # the garbage collected heap {oid:record}
+        self.heap = heap.Heap(self.__roots, gc_threshold, gc_growth)
+        # result caches of pure functions (a mypl_memo.Memo), None to call every function
+        self.memo = the_memo
+        # where print writes (a mypl_output.Writer)
+        self.output = output.Writer() if the_output is None else the_output
+        # where reads, readi and readf read (a mypl_input.Reader)
+        self.input = reader.Reader(None, reader.BLOCK_SIZE, self.output) if the_input is None else the_input
+        # {name: (BuiltIn, its function bound to output and input)} of the built ins called so far
+        self.built_ins = {}
 
-    #   starts the interpreter
+    #   starts the interpreter on a resolved program
     def run(self, stmt_list):
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), RECURSION_LIMIT))
+        self.global_frame = [None] * stmt_list.frame_size
+        self.frame = self.global_frame
         try:
             stmt_list.accept(self)
-        except ReturnException:
-            pass
+        finally:
+            self.output.flush()
+
+    def __roots(self):
+        # every value the running program can still reach without going through the heap
+        yield self.current_value
+        for value in self.global_frame:
+            yield value
+        for frame in self.call_stack:
+            for value in frame:
+                yield value
+        if self.tail_call is not None:
+            for value in self.tail_call[1]:
+                yield value
 
     def __error(self, msg, the_token):
         raise error.MyPLError(msg, the_token.line, the_token.column)
 
+    def __get_var(self, address):
+        # read a variable from the current (depth 0) or global (depth 1) frame
+        if address[0] == 0:
+            return self.frame[address[1]]
+        return self.global_frame[address[1]]
+
+    def __set_var(self, address, value):
+        if address[0] == 0:
+            self.frame[address[1]] = value
+        else:
+            self.global_frame[address[1]] = value
+
+    def __walk(self, value, path, field_slots):
+        # follow the fields in path[1:-1] starting from value, returning the record holding path[-1] and its slot
+        record = self.__deref(value, path[0])
+        for i in range(1, len(path) - 1):
+            if field_slots is None:    # struct type unknown until run time
+                record = self.__deref(record[record.layout[path[i].lexeme]], path[i])
+            else:
+                record = self.__deref(record[field_slots[i - 1]], path[i])
+        if field_slots is None:
+            return record, record.layout[path[-1].lexeme]
+        return record, field_slots[-1]
+
+    def __deref(self, oid, the_token):
+        # look up a struct on the heap, reporting nil paths as MyPL errors
+        if oid is None:
+            self.__error('nil value error', the_token)
+        return self.heap[oid]
+
     def __built_in_fun_helper(self, call_rvalue):
         fun_name = call_rvalue.fun.lexeme
         arg_vals = []
@@ -46,120 +127,97 @@ class Interpreter(ast.Visitor):
         for i, arg in enumerate(arg_vals):
             if arg is None:
                 self.__error('nil value error', call_rvalue.fun)
-        # perform each function
-        if fun_name == 'print':
-            arg_vals[0] = arg_vals[0].replace(r'\n', '\n')
-            print(arg_vals[0], end='')
-        elif fun_name == 'length':
-            self.current_value = len(arg_vals[0])
-        elif fun_name == 'get':
-            if 0 <= arg_vals[0] < len(arg_vals[1]):
-                self.current_value = arg_vals[1][arg_vals[0]]
-            else:
-                self.__error('index out of range error', call_rvalue.fun)
-        elif fun_name == 'reads':
-            self.current_value = input()
-        elif fun_name == 'readi':
-            try:
-                self.current_value = int(input())
-            except ValueError:
-                self.__error('bad int value', call_rvalue.fun)
-        elif fun_name == 'readf':
-            try:
-                self.current_value = float(input())
-            except ValueError:
-                self.__error('bad float value', call_rvalue.fun)
-        elif fun_name == 'itof':
-            self.current_value = float(self.current_value)
-        elif fun_name == 'itos':
-            self.current_value = str(self.current_value)
-        elif fun_name == 'ftos':
-            self.current_value = str(self.current_value)
-        elif fun_name == 'stoi':
-            self.current_value = int(self.current_value)
-        elif fun_name == 'stof':
-            self.current_value = float(self.current_value)
-        else:
-            self.__error('unknown function call', call_rvalue.fun)
+        # look up the function, bound to the program's output and input the first time it's called
+        entry = self.built_ins.get(fun_name)
+        if entry is None:
+            built_in = builtins.BUILT_INS.get(fun_name)
+            if built_in is None:
+                self.__error('unknown function call', call_rvalue.fun)
+            entry = self.built_ins[fun_name] = (built_in, built_in.bind(self.output, self.input))
+        built_in, function = entry
+        if len(arg_vals) != len(built_in.param_types):
+            arg_vals = built_in.arguments(arg_vals)
+        try:
+            self.current_value = function(*arg_vals)
+        except builtins.BuiltInError as e:
+            self.__error(str(e), call_rvalue.fun)
 
     def visit_stmt_list(self, stmt_list):
-        self.sym_table.push_environment()
         for stmt in stmt_list.stmts:
             stmt.accept(self)
-        self.sym_table.pop_environment()
+            if self.completion:     # returning
+                return
 
     def visit_expr_stmt(self, expr_stmt):
         expr_stmt.expr.accept(self)
 
     def visit_var_decl_stmt(self, var_decl):
         var_decl.var_expr.accept(self)
-        exp_value = self.current_value
-        var_name = var_decl.var_id.lexeme
-        self.sym_table.add_id(var_name)
-        self.sym_table.set_info(var_name, exp_value)
+        self.frame[var_decl.address[1]] = self.current_value
 
     def visit_assign_stmt(self, assign_stmt):
+        lval = assign_stmt.lhs
+        if lval.index_expr is None:
+            assign_stmt.rhs.accept(self)
+            lval.accept(self)
+            return
+        # an array element: the index, then the value, then the array, so nothing runs (and collects) in between
+        lval.index_expr.accept(self)
+        index = self.current_value
         assign_stmt.rhs.accept(self)
-        rhs_value = self.current_value
-        assign_stmt.lhs.accept(self)
-        lhs_value = self.current_value
-        self.sym_table.set_info(lhs_value, rhs_value)
+        the_array = self.__get_var(lval.address)
+        if len(lval.path) > 1:
+            record, slot = self.__walk(the_array, lval.path, lval.field_slots)
+            the_array = record[slot]
+        if the_array is None or index is None:
+            self.__error('nil value error', lval.path[-1])
+        if not 0 <= index < len(the_array):
+            self.__error('index out of range error', lval.path[-1])
+        try:
+            the_array[index] = self.current_value
+        except (TypeError, OverflowError):  # an array buffer only holds ints or floats
+            self.__error(arrays.store_error(self.current_value), lval.path[-1])
 
     def visit_struct_decl_stmt(self, struct_decl):
-        struct_lexeme = struct_decl.struct_id.lexeme
-        env_id = self.sym_table.get_env_id()
-        self.sym_table.add_id(struct_lexeme)
-        self.sym_table.set_info(struct_lexeme, [env_id, struct_decl])
+        pass    # allocations are linked to their declaration by the resolver
 
     def visit_fun_decl_stmt(self, fun_decl):
-        # record AST node and store current environment id
-        params = []
-        for i, param in enumerate(fun_decl.params):
-            param.accept(self)
-            params.append(self.current_value)
-        fun_decl.params = params
-        cur_env = self.sym_table.get_env_id()
-        self.sym_table.add_id(fun_decl.fun_name.lexeme)
-        self.sym_table.set_info(fun_decl.fun_name.lexeme, [cur_env, fun_decl])
-        # fun_decl.stmt_list.accept(self)
+        pass    # calls are linked to their declaration by the resolver
 
     def visit_return_stmt(self, return_stmt):
         # set current_value to return expression
         if return_stmt.return_expr is not None:
             return_stmt.return_expr.accept(self)
-        raise ReturnException()
+        else:
+            self.current_value = None
+        self.completion = RETURN
 
     def visit_while_stmt(self, while_stmt):
         while_stmt.bool_expr.accept(self)
-        self.sym_table.push_environment()
         cond_bool = self.current_value
         while cond_bool:   # loop while condition is true
             while_stmt.stmt_list.accept(self)
+            if self.completion:
+                return
             while_stmt.bool_expr.accept(self)   # check if boolean expression of parameter is still true
             cond_bool = self.current_value
-        self.sym_table.pop_environment()
 
     def visit_if_stmt(self, if_stmt):
         condition_met = False   # keeps track if the boolean condition is met in one of the if statements
         if_stmt.if_part.bool_expr.accept(self)
         conditional = self.current_value    # keeps track if statement boolean is true or false
         if conditional:
-            self.sym_table.push_environment()
             if_stmt.if_part.stmt_list.accept(self)
-            self.sym_table.pop_environment()
         else:
             for elseif in if_stmt.elseifs:
                 elseif.bool_expr.accept(self)
                 conditional = self.current_value
                 if conditional and not condition_met:
                     condition_met = True
-                    self.sym_table.push_environment()
                     elseif.stmt_list.accept(self)
-                    self.sym_table.pop_environment()
+                    break
             if if_stmt.has_else and not condition_met:
-                self.sym_table.push_environment()
                 if_stmt.else_stmts.accept(self)
-                self.sym_table.pop_environment()
 
     def visit_simple_expr(self, simple_expr):
         simple_expr.term.accept(self)
@@ -171,7 +229,10 @@ class Interpreter(ast.Visitor):
         complex_expr.rest.accept(self)
         second_expr = self.current_value
         if mathrel == token.PLUS:
-            self.current_value = first_expr + second_expr
+            if first_expr.__class__ is str or first_expr.__class__ is rope.Rope:
+                self.current_value = rope.concat(first_expr, second_expr)
+            else:
+                self.current_value = first_expr + second_expr
         elif mathrel == token.MINUS:
             self.current_value = first_expr - second_expr
         elif mathrel == token.MULTIPLY:
@@ -184,158 +245,126 @@ class Interpreter(ast.Visitor):
         else:
             self.current_value = first_expr % second_expr
 
-    def visit_bool_expr(self, bool_expr):
-        is_negated = False  # expression is negated
-        if bool_expr.negated:
-            is_negated = True
-        bool_expr.first_expr.accept(self)
-        first_expr = self.current_value
-        if self.sym_table.id_exists(first_expr):    # set first_expr to its value if ID
-            first_expr = self.sym_table.get_info(first_expr)
-        if bool_expr.bool_rel is not None:  # comparisons for booleans
-            bool_expr.second_expr.accept(self)
-            second_expr = self.current_value
-            if bool_expr.bool_rel.tokentype == token.EQUAL:
-                if first_expr == second_expr:
-                    self.current_value = True
-                else:
-                    self.current_value = False
-            elif bool_expr.bool_rel.tokentype == token.NOT_EQUAL:
-                if first_expr == second_expr:
-                    self.current_value = False
-                else:
-                    self.current_value = True
-            elif bool_expr.bool_rel.tokentype == token.LESS_THAN:
-                if first_expr < second_expr:
-                    self.current_value = True
-                else:
-                    self.current_value = False
-            elif bool_expr.bool_rel.tokentype == token.LESS_THAN_EQUAL:
-                if first_expr <= second_expr:
-                    self.current_value = True
-                else:
-                    self.current_value = False
-            elif bool_expr.bool_rel.tokentype == token.GREATER_THAN:
-                if first_expr > second_expr:
-                    self.current_value = True
-                else:
-                    self.current_value = False
-            elif bool_expr.bool_rel.tokentype == token.GREATER_THAN_EQUAL:
-                if first_expr >= second_expr:
-                    self.current_value = True
-                else:
-                    self.current_value = False
-
-        if bool_expr.bool_connector is not None:    # AND, OR connectors
-            first_rest_val = self.current_value
-            bool_expr.rest.accept(self)
-            second_rest_val = self.current_value
-            if bool_expr.bool_connector.tokentype == token.AND:
-                if first_rest_val == second_rest_val:
-                    self.current_value = True
-                else:
-                    self.current_value = False
-            elif bool_expr.bool_connector.tokentype == token.OR:
-                if first_rest_val is True or second_rest_val is True:
-                    self.current_value = True
-                else:
-                    self.current_value = False
-        if is_negated:  # expression is negated
-            if self.current_value is True:
-                self.current_value = False
-            else:
-                self.current_value = True
+    def visit_compare_expr(self, compare_expr):
+        compare_expr.first_expr.accept(self)
+        first_value = self.current_value
+        compare_expr.second_expr.accept(self)
+        self.current_value = COMPARISONS[compare_expr.bool_rel.tokentype](first_value, self.current_value)
+
+    def visit_logic_expr(self, logic_expr):
+        # only True counts as true, and the operands after the one deciding the result are not evaluated
+        deciding = logic_expr.connector.tokentype == token.OR
+        for operand in logic_expr.operands:
+            operand.accept(self)
+            if (self.current_value is True) == deciding:
+                self.current_value = deciding
+                return
+        self.current_value = not deciding
+
+    def visit_not_expr(self, not_expr):
+        not_expr.operand.accept(self)
+        self.current_value = self.current_value is not True
 
     def visit_lvalue(self, lval):
-        identifier = lval.path[0].lexeme
         if len(lval.path) == 1:
-            self.sym_table.set_info(identifier, self.current_value)
-        else:
-            struct_obj = {}  # helper variable for the heap
-            for path_id in lval.path[0:]:   # handle path expressions
-                identifier = path_id.lexeme
-                if path_id == lval.path[0]:
-                    struct_obj = self.heap[self.sym_table.get_info(identifier)]
-                elif path_id == lval.path[-1]:
-                    oid = self.current_value
-                    struct_obj[identifier] = oid
-                else:
-                    struct_obj = self.heap[struct_obj[identifier]]
+            self.__set_var(lval.address, self.current_value)
+        else:   # handle path expressions
+            record, slot = self.__walk(self.__get_var(lval.address), lval.path, lval.field_slots)
+            record[slot] = self.current_value
 
     def visit_fun_param(self, fun_param):
         self.current_value = fun_param.param_name.lexeme
 
     def visit_simple_rvalue(self, simple_rvalue):
-        if simple_rvalue.val.tokentype == token.INTVAL:
-            self.current_value = int(simple_rvalue.val.lexeme)
-        elif simple_rvalue.val.tokentype == token.FLOATVAL:
-            self.current_value = float(simple_rvalue.val.lexeme)
-        elif simple_rvalue.val.tokentype == token.BOOLVAL:
-            self.current_value = True
-            if simple_rvalue.val.lexeme == 'false':
-                self.current_value = False
-        elif simple_rvalue.val.tokentype == token.STRINGVAL:
-            self.current_value = simple_rvalue.val.lexeme
-        elif simple_rvalue.val.tokentype == token.NIL:
-            self.current_value = None
+        self.current_value = simple_rvalue.value    # converted once by the optimizer
 
     def visit_new_rvalue(self, new_rvalue):
-        struct_info = self.sym_table.get_info(new_rvalue.struct_type.lexeme)
-        for var_decl in struct_info[1].var_decls:
+        struct_decl = new_rvalue.struct_decl
+        # save current frame, initialize the vars in a frame of their own
+        curr_frame = self.frame
+        self.frame = [None] * struct_decl.frame_size
+        self.call_stack.append(self.frame)
+        for var_decl in struct_decl.var_decls:  # initialize the frame w/ vars in struct_decl
             var_decl.accept(self)
-        # save current environment, go to struct def's environment
-        curr_env = self.sym_table.get_env_id()
-        self.sym_table.set_env_id(struct_info[0])
-        # create empty struct, initialize vars, reset environment
-        struct_obj = {}
-        self.sym_table.push_environment()
-        for var_decl in struct_info[1].var_decls:  # initialize struct_obj w/ vars in struct_info[1]
-            struct_obj[var_decl.var_id.lexeme] = self.current_value
-        self.sym_table.pop_environment()
-        self.sym_table.set_env_id(curr_env)     # return to starting environment
-        oid = id(struct_obj)    # create oid, add struct_obj to the heap, assign current value
-        self.heap[oid] = struct_obj
-        self.current_value = oid
+        # the frame holds the fields in layout order: it becomes the record, added to the heap under a new oid
+        self.current_value = self.heap.allocate(heap.Record(self.frame, struct_decl.field_index))
+        self.call_stack.pop()
+        self.frame = curr_frame     # return to starting frame
+
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        new_array_rvalue.size_expr.accept(self)
+        size = self.current_value
+        if size is None:
+            self.__error('nil value error', ast.first_token(new_array_rvalue))
+        if size < 0:
+            self.__error('negative array size error', ast.first_token(new_array_rvalue))
+        self.current_value = arrays.allocate(new_array_rvalue.elem_type.tokentype, size)
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        self.current_value = maps.Map(new_map_rvalue.map_type.key_type.tokentype)
+
+    def visit_index_rvalue(self, index_rvalue):
+        # the index first, so nothing runs between reading the array and the element
+        index_rvalue.index_expr.accept(self)
+        index = self.current_value
+        index_rvalue.array.accept(self)
+        the_array = self.current_value
+        if the_array is None or index is None:
+            self.__error('nil value error', index_rvalue.array.path[-1])
+        if not 0 <= index < len(the_array):
+            self.__error('index out of range error', index_rvalue.array.path[-1])
+        self.current_value = the_array[index]
 
     def visit_call_rvalue(self, call_rvalue):
         # handle built in functions first
-        built_ins = ['print', 'length', 'get', 'readi', 'reads', 'readf', 'itof', 'itos', 'ftos', 'stoi', 'stof']
-        if call_rvalue.fun.lexeme in built_ins:
+        fun_decl = call_rvalue.fun_decl
+        if fun_decl is None:
             self.__built_in_fun_helper(call_rvalue)
         else:
-            fun_info = self.sym_table.get_info(call_rvalue.fun.lexeme)     # get function information
-            cur_env = self.sym_table.get_env_id()   # store current environment
-            arg_values = []
-            for i, arg in enumerate(call_rvalue.args):  # compute and store arg values
+            new_frame = [None] * fun_decl.frame_size
+            self.call_stack.append(new_frame)
+            cache = None if self.memo is None else self.memo.caches.get(fun_decl)
+            arg_vals = []
+            for i, arg in enumerate(call_rvalue.args):  # compute arg values, initialise parameters with them
                 arg.accept(self)
-                arg_values.append(self.current_value)
-            self.sym_table.set_env_id(fun_info[0])  # go to function decl environment id
-            self.sym_table.push_environment()   # add new environment
-            i = 0
-            while i < len(arg_values):     # initialise parameters with arg values
-                if not self.sym_table.id_exists(fun_info[1].params[i]):
-                    self.sym_table.add_id(fun_info[1].params[i])
-                self.sym_table.set_info(fun_info[1].params[i], arg_values[i])
-                i = i + 1
-            # visit function's statement list
-            try:
-                fun_info[1].stmt_list.accept(self)
-            except ReturnException:
-                pass
-            self.sym_table.pop_environment()    # remove new environment
-            self.sym_table.set_env_id(cur_env)  # return to caller's environment
+                if i < len(fun_decl.params):
+                    new_frame[i] = self.current_value
+                if cache is not None:
+                    arg_vals.append(self.current_value)
+            if call_rvalue.tail_call:   # the caller returns, and the call runs in its place (see below)
+                self.call_stack.pop()
+                self.tail_call = (fun_decl, new_frame)
+                self.completion = RETURN
+                return
+            if cache is not None:   # a pure function: reuse its result for the same arguments
+                key = memo.key(arg_vals)
+                found, result = cache.get(key)
+                if found:
+                    self.call_stack.pop()
+                    self.current_value = result
+                    return
+            cur_frame = self.frame   # store current frame
+            self.frame = new_frame
+            # visit function's statement list, then those of the tail calls it ends with, each in the place of the last
+            while True:
+                fun_decl.stmt_list.accept(self)
+                if self.completion != RETURN:   # ran off the end of the body: returns nil, as on the other engines
+                    self.current_value = None
+                self.completion = NORMAL
+                if self.tail_call is None:
+                    break
+                fun_decl, new_frame = self.tail_call
+                self.tail_call = None
+                self.call_stack[-1] = new_frame
+                self.frame = new_frame
+            self.call_stack.pop()
+            self.frame = cur_frame  # return to caller's frame
+            if cache is not None:
+                cache.put(key, self.current_value)
 
     def visit_id_rvalue(self, id_rvalue):
-        var_name = id_rvalue.path[0].lexeme
-        var_val = self.sym_table.get_info(var_name)
-        struct_obj = {}  # helper variable to manage heaps
+        var_val = self.__get_var(id_rvalue.address)
+        if len(id_rvalue.path) > 1:    # handle path expressions
+            record, slot = self.__walk(var_val, id_rvalue.path, id_rvalue.field_slots)
+            var_val = record[slot]
         self.current_value = var_val
-        for path_id in id_rvalue.path[0:]:  # handle path expressions
-            if len(id_rvalue.path) > 1:
-                identifier = path_id.lexeme
-                if path_id == id_rvalue.path[0]:  # first variable in path
-                    struct_obj = self.heap[self.sym_table.get_info(identifier)]
-                elif path_id == id_rvalue.path[-1]:  # last variable in path
-                    self.current_value = struct_obj[identifier]
-                else:  # path between first and last element
-                    struct_obj = self.heap[struct_obj[identifier]]
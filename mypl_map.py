@@ -0,0 +1,24 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Storage for MyPL maps. A map is a Python dict from string or int keys to values, so put, lookup, has and remove
+#   take constant time instead of the O(depth) interpreted calls of a hand written search tree. It remembers the type
+#   of its keys, so that keys() can give the keys of an int map as an int array (see mypl_array) even when it is
+#   empty, and keys of the wrong type are refused instead of never being found.
+#   Every engine stores maps this way, so the built ins in mypl_builtins work for all of them.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+
+KEY_CLASSES = {token.STRINGTYPE: str, token.INTTYPE: int}  # {key type: Python class of its keys}
+
+
+class Map(dict):
+    """A MyPL map, in the order its keys were first put"""
+    __slots__ = ('key_type',)
+
+    def __init__(self, key_type):
+        dict.__init__(self)
+        self.key_type = key_type  # token type of the keys (STRINGTYPE or INTTYPE)
+
@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Automatic memoization of pure MyPL functions. A purity analysis finds the functions whose result depends only on
+#   their primitive arguments: they take and return no structs, never touch a struct or a global variable, do no I/O,
+#   and only call functions that are pure themselves. The interpreter keeps a bounded LRU cache of results for each
+#   of them, keyed by the argument values.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_ast as ast
+import mypl_rope as rope
+import mypl_builtins as builtins
+import collections
+
+PRIMITIVE_TYPES = [token.INTTYPE, token.FLOATTYPE, token.BOOLTYPE, token.STRINGTYPE, token.NIL]
+
+
+class Purity(ast.Visitor):
+    """Finds the pure functions of a resolved program"""
+
+    def __init__(self):
+        self.impure = False  # the function being analyzed has an effect or input besides its arguments
+        self.callees = set()  # FunDeclStmts called by the function being analyzed
+
+    def analyze(self, stmt_list):
+        """returns the set of pure FunDeclStmts"""
+        callees = {}  # {FunDeclStmt: FunDeclStmts it calls}, for the functions that are pure on their own
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.FunDeclStmt) and self.__primitive(stmt):
+                self.impure = False
+                self.callees = set()
+                stmt.stmt_list.accept(self)
+                if not self.impure:
+                    callees[stmt] = self.callees
+        changed = True
+        while changed:  # a function calling an impure one is impure too
+            changed = False
+            for fun_decl in list(callees):
+                if not callees[fun_decl] <= callees.keys():
+                    del callees[fun_decl]
+                    changed = True
+        return set(callees)
+
+    def __primitive(self, fun_decl):
+        # only primitive values go in and out
+        for param in fun_decl.params:
+            if param.param_type.tokentype not in PRIMITIVE_TYPES:
+                return False
+        return fun_decl.return_type.tokentype in PRIMITIVE_TYPES
+
+    def visit_stmt_list(self, stmt_list):
+        for stmt in stmt_list.stmts:
+            stmt.accept(self)
+
+    def visit_expr_stmt(self, expr_stmt):
+        expr_stmt.expr.accept(self)
+
+    def visit_var_decl_stmt(self, var_decl):
+        var_decl.var_expr.accept(self)
+
+    def visit_assign_stmt(self, assign_stmt):
+        assign_stmt.rhs.accept(self)
+        assign_stmt.lhs.accept(self)
+
+    def visit_return_stmt(self, return_stmt):
+        if return_stmt.return_expr is not None:
+            return_stmt.return_expr.accept(self)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.bool_expr.accept(self)
+        while_stmt.stmt_list.accept(self)
+
+    def visit_if_stmt(self, if_stmt):
+        for basic_if in [if_stmt.if_part] + if_stmt.elseifs:
+            basic_if.bool_expr.accept(self)
+            basic_if.stmt_list.accept(self)
+        if if_stmt.has_else:
+            if_stmt.else_stmts.accept(self)
+
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term.accept(self)
+
+    def visit_complex_expr(self, complex_expr):
+        complex_expr.first_operand.accept(self)
+        complex_expr.rest.accept(self)
+
+    def visit_compare_expr(self, compare_expr):
+        compare_expr.first_expr.accept(self)
+        compare_expr.second_expr.accept(self)
+
+    def visit_logic_expr(self, logic_expr):
+        for operand in logic_expr.operands:
+            operand.accept(self)
+
+    def visit_not_expr(self, not_expr):
+        not_expr.operand.accept(self)
+
+    def visit_lvalue(self, lval):
+        if lval.address[0] != 0 or len(lval.path) > 1:     # global or struct write
+            self.impure = True
+        if lval.index_expr is not None:     # an element of a local array
+            lval.index_expr.accept(self)
+
+    def visit_new_rvalue(self, new_rvalue):
+        self.impure = True
+
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        new_array_rvalue.size_expr.accept(self)     # a local array, it can't outlive the call
+
+    def visit_index_rvalue(self, index_rvalue):
+        index_rvalue.array.accept(self)
+        index_rvalue.index_expr.accept(self)
+
+    def visit_call_rvalue(self, call_rvalue):
+        for arg in call_rvalue.args:
+            arg.accept(self)
+        if call_rvalue.fun_decl is not None:
+            self.callees.add(call_rvalue.fun_decl)
+        else:
+            built_in = builtins.BUILT_INS.get(call_rvalue.fun.lexeme)
+            if built_in is None or not built_in.pure:   # I/O
+                self.impure = True
+
+    def visit_id_rvalue(self, id_rvalue):
+        if id_rvalue.address[0] != 0 or len(id_rvalue.path) > 1:    # global or struct read
+            self.impure = True
+
+
+def key(args):
+    """cache key for a list of argument values. Ints and strings stand for
+    themselves, other values are tagged with their type and repr so that
+    e.g. 1, 1.0 and true, or 0.0 and -0.0, get different entries.
+    """
+    args = map(rope.flatten, args)  # a rope stands for its string
+    return tuple(arg if type(arg) is int or type(arg) is str else (type(arg), repr(arg)) for arg in args)
+
+
+class LRUCache(object):
+    """The results of one function, keeping the most recently used ones"""
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.results = collections.OrderedDict()  # {key: result}, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """returns (True, result) if key is cached, (False, None) otherwise"""
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return True, self.results[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key, result):
+        self.results[key] = result
+        if len(self.results) > self.capacity:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+
+class Memo(object):
+    """Result caches of the pure functions of a program"""
+
+    def __init__(self, stmt_list, capacity=1000):
+        self.caches = {}  # {FunDeclStmt: LRUCache}
+        for fun_decl in Purity().analyze(stmt_list):
+            self.caches[fun_decl] = LRUCache(fun_decl.fun_name.lexeme, capacity)
+
+    def __str__(self):
+        if not self.caches:
+            return 'memo: no pure functions\n'
+        s = ''
+        for cache in sorted(self.caches.values(), key=lambda cache: cache.name):
+            s += 'memo: %s: %i hits, %i misses, %i evictions, %i cached\n' % \
+                 (cache.name, cache.hits, cache.misses, cache.evictions, len(cache.results))
+        return s
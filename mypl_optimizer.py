@@ -0,0 +1,266 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Constant folding pass for a type-checked MyPL program. Every literal is converted to its Python value once,
+#   math and Boolean expressions whose operands are all literals are replaced by the literal they evaluate to, and
+#   if/elif branches (and while loops) whose conditions are constant are pruned. Literal operands of and/or chains
+#   are dropped, or end the chain early when they decide its value. Values are computed exactly as the
+#   interpreter would, and anything that would fail at run time (e.g., division by zero) is left alone so the error
+#   still happens when the program runs.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_ast as ast
+
+
+class Optimizer(ast.Visitor):
+    """A MyPL constant folding visitor implementation"""
+
+    def __init__(self):
+        self.current_expr = None  # the last visited expression, or the literal replacing it
+        self.current_stmts = None  # statements replacing the last visited statement, None to keep it
+        self.folded = 0  # number of expressions replaced by literals
+        self.pruned = 0  # number of branches and loops removed
+
+    def optimize(self, stmt_list):
+        """folds the program in place"""
+        stmt_list.accept(self)
+
+    def __str__(self):
+        return 'opt: %i expressions folded, %i branches pruned\n' % (self.folded, self.pruned)
+
+    def __expr(self, expr):
+        # visits an expression and returns the node that should replace it
+        expr.accept(self)
+        return self.current_expr
+
+    def __constant(self, expr):
+        # returns (True, value) if expr is a literal, (False, None) otherwise
+        if isinstance(expr, ast.SimpleExpr) and isinstance(expr.term, ast.SimpleRValue):
+            return True, expr.term.value
+        return False, None
+
+    def __literal(self, value, the_token):
+        # a SimpleExpr holding value, located at the_token
+        if type(value) == bool:
+            val = token.Token(token.BOOLVAL, 'true' if value else 'false', the_token.line, the_token.column)
+        elif type(value) == int:
+            val = token.Token(token.INTVAL, str(value), the_token.line, the_token.column)
+        elif type(value) == float:
+            val = token.Token(token.FLOATVAL, repr(value), the_token.line, the_token.column)
+        else:
+            val = token.Token(token.STRINGVAL, value, the_token.line, the_token.column)
+        simple_rvalue = ast.SimpleRValue()
+        simple_rvalue.val = val
+        simple_rvalue.value = value
+        simple_expr = ast.SimpleExpr()
+        simple_expr.term = simple_rvalue
+        return simple_expr
+
+    def __math(self, mathrel, first_value, second_value):
+        if mathrel == token.PLUS:
+            return first_value + second_value
+        elif mathrel == token.MINUS:
+            return first_value - second_value
+        elif mathrel == token.MULTIPLY:
+            return first_value * second_value
+        elif mathrel == token.DIVIDE:
+            if type(first_value) == int and type(second_value) == int:    # both values are int, result is an int
+                return int(first_value / second_value)
+            return first_value / second_value
+        return first_value % second_value
+
+    def __compare(self, boolrel, first_value, second_value):
+        if boolrel == token.EQUAL:
+            return first_value == second_value
+        elif boolrel == token.NOT_EQUAL:
+            return first_value != second_value
+        elif boolrel == token.LESS_THAN:
+            return first_value < second_value
+        elif boolrel == token.LESS_THAN_EQUAL:
+            return first_value <= second_value
+        elif boolrel == token.GREATER_THAN:
+            return first_value > second_value
+        return first_value >= second_value
+
+    def __block_body(self, stmt_list, the_token):
+        # statements that run stmt_list unconditionally in place of an if statement
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.VarDeclStmt):   # keep the block so its variables stay in their own scope
+                if_stmt = ast.IfStmt()
+                if_stmt.if_part.bool_expr = self.__literal(True, the_token)
+                if_stmt.if_part.stmt_list = stmt_list
+                return [if_stmt]
+        return stmt_list.stmts
+
+    def visit_stmt_list(self, stmt_list):
+        stmts = []
+        for stmt in stmt_list.stmts:
+            stmt.accept(self)
+            if self.current_stmts is None:
+                stmts.append(stmt)
+            else:
+                stmts.extend(self.current_stmts)
+                self.current_stmts = None
+        stmt_list.stmts = stmts
+
+    def visit_expr_stmt(self, expr_stmt):
+        expr_stmt.expr = self.__expr(expr_stmt.expr)
+
+    def visit_var_decl_stmt(self, var_decl):
+        var_decl.var_expr = self.__expr(var_decl.var_expr)
+
+    def visit_assign_stmt(self, assign_stmt):
+        assign_stmt.rhs = self.__expr(assign_stmt.rhs)
+        if assign_stmt.lhs.index_expr is not None:
+            assign_stmt.lhs.index_expr = self.__expr(assign_stmt.lhs.index_expr)
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        for var_decl in struct_decl.var_decls:
+            var_decl.accept(self)
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        fun_decl.stmt_list.accept(self)
+
+    def visit_return_stmt(self, return_stmt):
+        if return_stmt.return_expr is not None:
+            return_stmt.return_expr = self.__expr(return_stmt.return_expr)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.bool_expr = self.__expr(while_stmt.bool_expr)
+        while_stmt.stmt_list.accept(self)
+        is_constant, value = self.__constant(while_stmt.bool_expr)
+        if is_constant and not value:   # the body never runs
+            self.pruned += 1
+            self.current_stmts = []
+
+    def visit_if_stmt(self, if_stmt):
+        branches = []  # BasicIfs whose conditions are not known statically
+        else_stmts = if_stmt.else_stmts if if_stmt.has_else else None
+        basic_ifs = [if_stmt.if_part] + if_stmt.elseifs
+        for i, basic_if in enumerate(basic_ifs):
+            basic_if.bool_expr = self.__expr(basic_if.bool_expr)
+            basic_if.stmt_list.accept(self)
+            is_constant, value = self.__constant(basic_if.bool_expr)
+            if not is_constant:
+                branches.append(basic_if)
+            elif not value:     # never taken
+                self.pruned += 1
+            else:   # always taken when reached, so it becomes the else and everything after it is dead
+                self.pruned += len(basic_ifs) - i - 1 + (0 if else_stmts is None else 1)
+                else_stmts = basic_if.stmt_list
+                break
+        else:
+            if if_stmt.has_else:
+                if_stmt.else_stmts.accept(self)
+        if not branches:
+            location = ast.first_token(if_stmt.if_part.bool_expr)
+            self.current_stmts = [] if else_stmts is None else self.__block_body(else_stmts, location)
+            return
+        if_stmt.if_part = branches[0]
+        if_stmt.elseifs = branches[1:]
+        if_stmt.has_else = else_stmts is not None
+        if_stmt.else_stmts = else_stmts
+
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term = self.__expr(simple_expr.term)
+        if isinstance(simple_expr.term, ast.Expr):  # parenthesized expression, drop the wrapper
+            return
+        self.current_expr = simple_expr
+
+    def visit_complex_expr(self, complex_expr):
+        complex_expr.first_operand = self.__expr(complex_expr.first_operand)
+        complex_expr.rest = self.__expr(complex_expr.rest)
+        self.current_expr = complex_expr
+        first_constant, first_value = self.__constant(complex_expr.first_operand)
+        rest_constant, rest_value = self.__constant(complex_expr.rest)
+        if first_constant and rest_constant:
+            try:
+                value = self.__math(complex_expr.math_rel.tokentype, first_value, rest_value)
+            except (TypeError, ZeroDivisionError, OverflowError):   # leave the error for run time
+                return
+            self.folded += 1
+            self.current_expr = self.__literal(value, complex_expr.math_rel)
+
+    def visit_compare_expr(self, compare_expr):
+        compare_expr.first_expr = self.__expr(compare_expr.first_expr)
+        compare_expr.second_expr = self.__expr(compare_expr.second_expr)
+        self.current_expr = compare_expr
+        first_constant, first_value = self.__constant(compare_expr.first_expr)
+        second_constant, second_value = self.__constant(compare_expr.second_expr)
+        if first_constant and second_constant:
+            try:
+                value = self.__compare(compare_expr.bool_rel.tokentype, first_value, second_value)
+            except TypeError:   # leave the error for run time
+                return
+            self.folded += 1
+            self.current_expr = self.__literal(value, ast.first_token(compare_expr))
+
+    def visit_logic_expr(self, logic_expr):
+        deciding = logic_expr.connector.tokentype == token.OR   # whether being True ends the evaluation
+        operands = []
+        for operand in logic_expr.operands:
+            operand = self.__expr(operand)
+            is_constant, value = self.__constant(operand)
+            if not is_constant:
+                operands.append(operand)
+            elif (value is True) == deciding:   # the operands after it never run
+                if not operands:
+                    self.folded += 1
+                    self.current_expr = self.__literal(deciding, ast.first_token(logic_expr))
+                    return
+                operands.append(operand)
+                break
+            # a constant that doesn't decide the result is dropped
+        if not operands:
+            self.folded += 1
+            self.current_expr = self.__literal(not deciding, ast.first_token(logic_expr))
+            return
+        logic_expr.operands = operands
+        self.current_expr = logic_expr
+        if len(operands) == 1 and isinstance(operands[0], (ast.CompareExpr, ast.LogicExpr, ast.NotExpr)):
+            self.current_expr = operands[0]     # already True or False
+
+    def visit_not_expr(self, not_expr):
+        not_expr.operand = self.__expr(not_expr.operand)
+        self.current_expr = not_expr
+        is_constant, value = self.__constant(not_expr.operand)
+        if is_constant:
+            self.folded += 1
+            self.current_expr = self.__literal(value is not True, ast.first_token(not_expr))
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        val = simple_rvalue.val
+        if val.tokentype == token.INTVAL:
+            simple_rvalue.value = int(val.lexeme)
+        elif val.tokentype == token.FLOATVAL:
+            simple_rvalue.value = float(val.lexeme)
+        elif val.tokentype == token.BOOLVAL:
+            simple_rvalue.value = val.lexeme != 'false'
+        elif val.tokentype == token.STRINGVAL:
+            simple_rvalue.value = val.lexeme
+        else:
+            simple_rvalue.value = None
+        self.current_expr = simple_rvalue
+
+    def visit_new_rvalue(self, new_rvalue):
+        self.current_expr = new_rvalue
+
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        new_array_rvalue.size_expr = self.__expr(new_array_rvalue.size_expr)
+        self.current_expr = new_array_rvalue
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        self.current_expr = new_map_rvalue
+
+    def visit_index_rvalue(self, index_rvalue):
+        index_rvalue.index_expr = self.__expr(index_rvalue.index_expr)
+        self.current_expr = index_rvalue
+
+    def visit_call_rvalue(self, call_rvalue):
+        call_rvalue.args = [self.__expr(arg) for arg in call_rvalue.args]
+        self.current_expr = call_rvalue
+
+    def visit_id_rvalue(self, id_rvalue):
+        self.current_expr = id_rvalue
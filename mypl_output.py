@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Buffered program output for the MyPL engines. The print built in hands its strings to a Writer, which collects
+#   them and writes them to the underlying stream in large blocks. Engines flush it when the program ends (normally
+#   or with an error) and before reading input, so prompts always appear before the program waits. A buffer size
+#   of 0 writes and flushes every print straight away, for interactive use.
+# ----------------------------------------------------------------------
+
+import sys
+
+BUFFER_SIZE = 65536     # characters
+
+
+class Writer(object):
+    """Collects printed strings and writes them out in blocks"""
+
+    def __init__(self, stream=None, size=BUFFER_SIZE):
+        self.stream = stream  # None for whatever sys.stdout is when the buffer is flushed
+        self.size = size  # characters held before they are written, 0 for unbuffered
+        self.pieces = []
+        self.pending = 0  # characters in pieces
+
+    def write(self, s):
+        self.pieces.append(s)
+        self.pending += len(s)
+        if self.pending >= self.size:
+            self.flush()
+
+    def flush(self):
+        """writes out everything printed so far"""
+        stream = sys.stdout if self.stream is None else self.stream
+        if self.pieces:
+            stream.write(''.join(self.pieces))
+            self.pieces = []
+            self.pending = 0
+        stream.flush()
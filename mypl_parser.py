@@ -9,6 +9,21 @@ import mypl_error as error
 import mypl_lexer as lexer
 import mypl_token as token
 import mypl_ast as ast
+import sys
+
+RECURSION_LIMIT = 100000    # Python frames the front end may use, as many as the engines (see mypl_interpreter)
+FRAMES_PER_LEVEL = 20   # most frames a pass spends on one level of the syntax tree
+MAX_NESTING = RECURSION_LIMIT // FRAMES_PER_LEVEL // 2  # deepest syntax tree, leaving half for running it
+
+# token types that can start an expression (and so an argument) and a statement in a block
+EXPR_TOKENS = frozenset([token.ID, token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, token.NEW,
+                         token.LPAREN])
+BSTMT_TOKENS = EXPR_TOKENS | frozenset([token.WHILE, token.RETURN, token.IF, token.SET, token.VAR])
+# value tokens, Boolean relations and math operators
+VALUE_TOKENS = frozenset([token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL])
+BOOL_RELS = frozenset([token.EQUAL, token.LESS_THAN, token.GREATER_THAN, token.LESS_THAN_EQUAL,
+                       token.GREATER_THAN_EQUAL, token.NOT_EQUAL])
+MATH_RELS = frozenset([token.PLUS, token.MINUS, token.DIVIDE, token.MULTIPLY, token.MODULO])
 
 class Parser(object):
 
@@ -16,9 +31,11 @@ class Parser(object):
     def __init__(self, lexer):
         self.lexer = lexer
         self.current_token = None
+        self.nesting = 0    # depth of the syntax tree at the current token
 
     def parse(self):
         """succeeds if program is syntactically well-formed"""
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), RECURSION_LIMIT))   # for the passes after this one
         stmts_node = ast.StmtList()
         self.__advance()
         self.__stmts(stmts_node)
@@ -40,12 +57,20 @@ class Parser(object):
         c = self.current_token.column
         raise error.MyPLError(error_msg, l, c)
 
+    def __nest(self, levels=1):
+        # every later pass walks the syntax tree recursively, so bound its depth here
+        self.nesting += levels
+        if self.nesting > MAX_NESTING:
+            self.__error('maximum nesting depth of %i exceeded' % MAX_NESTING)
+
+    def __unnest(self, levels=1):
+        self.nesting -= levels
+
     # Beginning of recursive descent functions
     def __stmts(self, stmts_node):
         """"<stmts> ::= <stmt> <stmts> | e"""
-        if self.current_token.tokentype != token.EOS:
+        while self.current_token.tokentype != token.EOS:
             self.__stmt(stmts_node)
-            self.__stmts(stmts_node)
 
     # statement checker
     def __stmt(self, stmts_node):
@@ -75,8 +100,7 @@ class Parser(object):
             fun_decl_stmt_node.return_type = self.current_token
             self.__advance()
         else:
-            fun_decl_stmt_node.return_type = self.current_token
-            self.__type()
+            fun_decl_stmt_node.return_type = self.__type()
         fun_decl_stmt_node.fun_name = self.current_token
         self.__eat(token.ID, "Missing function ID name")
         self.__eat(token.LPAREN, "Missing left parenthesis")
@@ -93,8 +117,7 @@ class Parser(object):
             fun_param_node.param_name = self.current_token
             self.__eat(token.ID, "Missing variable name")
             self.__eat(token.COLON, "Missing colon after ID")
-            fun_param_node.param_type = self.current_token
-            self.__type()
+            fun_param_node.param_type = self.__type()
             fun_decl_stmt_node.params.append(fun_param_node)
             while self.current_token.tokentype == token.COMMA:
                 self.__advance()
@@ -102,14 +125,11 @@ class Parser(object):
                 fun_param_node.param_name = self.current_token
                 self.__eat(token.ID, "Missing ID after comma")
                 self.__eat(token.COLON, "Missing colon after ID")
-                fun_param_node.param_type = self.current_token
-                self.__type()
+                fun_param_node.param_type = self.__type()
                 fun_decl_stmt_node.params.append(fun_param_node)
 
     # boolean statement
     def __bstmt(self):
-        expr_tokens = [token.ID, token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, token.NEW,
-                  token.LPAREN]
         if self.current_token.tokentype == token.VAR:
             return self.__vdecl()
         elif self.current_token.tokentype == token.SET:
@@ -118,7 +138,7 @@ class Parser(object):
             return self.__cond()
         elif self.current_token.tokentype == token.WHILE:
             return self.__while()
-        elif self.current_token.tokentype in expr_tokens:
+        elif self.current_token.tokentype in EXPR_TOKENS:
             expr_stmt_node = ast.ExprStmt()
             expr_stmt_node.expr = self.__expr()
             self.__eat(token.SEMICOLON, "Missing semicolon")
@@ -131,11 +151,9 @@ class Parser(object):
     # grammar for return statements
     def __exit(self):
         return_stmt_node = ast.ReturnStmt()
-        expr_tokens = [token.ID, token.STRINGVAL, token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, token.NEW,
-                       token.LPAREN]
         return_stmt_node.return_token = self.current_token
         self.__eat(token.RETURN, "Missing 'return' statement")
-        if self.current_token.tokentype in expr_tokens:
+        if self.current_token.tokentype in EXPR_TOKENS:
             return_stmt_node.return_expr = self.__expr()
         self.__eat(token.SEMICOLON, "Missing semicolon after 'return' statement")
         return return_stmt_node
@@ -163,74 +181,86 @@ class Parser(object):
 
     # grammar for conditional tail
     def __condt(self, if_stmt_node):
-        basic_if_node = ast.BasicIf()
-        if self.current_token.tokentype == token.ELIF:
+        while self.current_token.tokentype == token.ELIF:
+            basic_if_node = ast.BasicIf()
             self.__advance()
             basic_if_node.bool_expr = self.__bexpr()
             self.__eat(token.THEN, "Missing 'then' statement")
             self.__bstmts(basic_if_node.stmt_list)
             if_stmt_node.elseifs.append(basic_if_node)
-            self.__condt(if_stmt_node)
-        elif self.current_token.tokentype == token.ELSE:
+        if self.current_token.tokentype == token.ELSE:
             if_stmt_node.has_else = True
             self.__advance()
+            if_stmt_node.else_stmts = ast.StmtList()
             self.__bstmts(if_stmt_node.else_stmts)
 
     def __bstmts(self, stmts_node):
-        bstmt_tokens = [token.WHILE, token.RETURN, token.IF, token.SET, token.VAR, token.ID, token.STRINGVAL,
-                        token.INTVAL, token.BOOLVAL, token.FLOATVAL, token.NIL, token.NEW, token.LPAREN]
-        if self.current_token.tokentype in bstmt_tokens:
+        self.__nest()
+        while self.current_token.tokentype in BSTMT_TOKENS:
             stmts_node.stmts.append(self.__bstmt())
-            self.__bstmts(stmts_node)
+        self.__unnest()
 
-    # grammar for boolean expressions
+    # grammar for boolean expressions, built as flat comparison, and/or and not nodes
     def __bexpr(self):
-        bool_expr_node = ast.BoolExpr()
-        if self.current_token.tokentype == token.NOT:
-            bool_expr_node.negated = True
+        return self.__bconnct(self.__bterm())
+
+    # an operand of and/or
+    def __bterm(self):
+        if self.current_token.tokentype == token.NOT:   # negates everything after it
+            self.__nest()
             self.__advance()
-            bool_expr_node.rest = self.__bexpr()
-            if bool_expr_node.rest.first_expr is not None:
-                bool_expr_node.first_expr = bool_expr_node.rest
-            self.__bexprt(bool_expr_node)
+            bool_expr_node = ast.NotExpr()
+            bool_expr_node.operand = self.__bexprt(self.__bexpr())
+            self.__unnest()
         elif self.current_token.tokentype == token.LPAREN:
+            self.__nest()
             self.__advance()
-            bool_expr_node.rest = self.__bexpr()
-            if bool_expr_node.rest.first_expr is not None:
-                bool_expr_node.first_expr = bool_expr_node.rest
+            bool_expr_node = self.__bexpr()
             self.__eat(token.RPAREN, "Missing right paren")
-            self.__bconnct(bool_expr_node)
+            self.__unnest()
         else:
-            if bool_expr_node.first_expr is None:
-                bool_expr_node.first_expr = self.__expr()
-            else:
-                bool_expr_node.second_expr = self.__expr()
-            self.__bexprt(bool_expr_node)
+            bool_expr_node = self.__compare(self.__expr())
         return bool_expr_node
 
-    # tail for bexpr()
-    def __bexprt(self, bool_expr_node):
-        boolrel = [token.EQUAL, token.LESS_THAN, token.GREATER_THAN, token.LESS_THAN_EQUAL, token.GREATER_THAN_EQUAL,
-                   token.NOT_EQUAL]
-        if self.current_token.tokentype in boolrel:
-            bool_expr_node.bool_rel = self.current_token
-            self.__advance()
-            if bool_expr_node.first_expr is None:
-                bool_expr_node.first_expr = self.__expr()
-            else:
-                bool_expr_node.second_expr = self.__expr()
-        self.__bconnct(bool_expr_node)
+    # tail for bexpr(), first is the expression parsed so far
+    def __bexprt(self, first):
+        return self.__bconnct(self.__compare(first))
 
-    # grammar on how boolean variables connect
-    def __bconnct(self, bool_expr_node):
-        if self.current_token.tokentype == token.AND:
-            bool_expr_node.bool_connector = self.current_token
+    def __compare(self, first):
+        if self.current_token.tokentype in BOOL_RELS:
+            compare_node = ast.CompareExpr()
+            compare_node.first_expr = first
+            compare_node.bool_rel = self.current_token
             self.__advance()
-            bool_expr_node.rest = self.__bexpr()
-        elif self.current_token.tokentype == token.OR:
-            bool_expr_node.bool_connector = self.current_token
+            compare_node.second_expr = self.__expr()
+            first = compare_node
+        return first
+
+    # grammar on how boolean variables connect, everything after a connector is its right operand. The chain is
+    # parsed in a loop, and then nested from the right: a and b or c is a and (b or c).
+    def __bconnct(self, first):
+        operands = [first]
+        connectors = []
+        levels = 0  # nesting of the and/or nodes, a level each time the connector changes
+        while self.current_token.tokentype == token.AND or self.current_token.tokentype == token.OR:
+            if not connectors or connectors[-1].tokentype != self.current_token.tokentype:
+                levels += 1
+                self.__nest()
+            connectors.append(self.current_token)
             self.__advance()
-            bool_expr_node.rest = self.__bexpr()
+            operands.append(self.__bterm())
+        self.__unnest(levels)
+        bool_expr_node = operands.pop()
+        while connectors:
+            logic_node = ast.LogicExpr()
+            logic_node.connector = connectors.pop()
+            for operand in (operands.pop(), bool_expr_node):
+                if isinstance(operand, ast.LogicExpr) and operand.connector.tokentype == logic_node.connector.tokentype:
+                    logic_node.operands.extend(operand.operands)    # a and (b and c) is a and b and c
+                else:
+                    logic_node.operands.append(operand)
+            bool_expr_node = logic_node
+        return bool_expr_node
 
     # function that defines the grammar to assign values to variables
     def __assign(self):
@@ -245,19 +275,21 @@ class Parser(object):
     # left value grammar
     def __lvalue(self, assign_stmt_node):
         lvalue_node = ast.LValue()
-        lvalue_node.path.append(self.current_token)
+        path = [self.current_token]
         self.__eat(token.ID, "Missing 'ID' variable")
         while self.current_token.tokentype == token.DOT:
             self.__advance()
-            lvalue_node.path.append(self.current_token)
+            path.append(self.current_token)
             self.__eat(token.ID, "Missing 'ID' variable")
+        lvalue_node.path = tuple(path)
+        if self.current_token.tokentype == token.LBRACKET:  # an element of the array
+            lvalue_node.index_expr = self.__index()
         assign_stmt_node.lhs = lvalue_node
 
     # value declaration statement
     def __vdecls(self, struct_decl_stmt_node):
-        if self.current_token.tokentype == token.VAR:
+        while self.current_token.tokentype == token.VAR:
             struct_decl_stmt_node.var_decls.append(self.__vdecl())
-            self.__vdecls(struct_decl_stmt_node)
 
     # value declaration
     def __vdecl(self):
@@ -275,11 +307,11 @@ class Parser(object):
     def __tdecl(self, var_decl_stmt_node):
         if self.current_token.tokentype == token.COLON:
             self.__advance()
-            var_decl_stmt_node.var_type = self.current_token
-            self.__type()
+            var_decl_stmt_node.var_type = self.__type()
 
-    # function that defines variable type grammar
+    # function that defines variable type grammar, returns the type token (an ArrayType or MapType for those)
     def __type(self):
+        type_token = self.current_token
         if self.current_token.tokentype == token.ID:
             self.__advance()
         elif self.current_token.tokentype == token.INTTYPE:
@@ -290,101 +322,122 @@ class Parser(object):
             self.__advance()
         elif self.current_token.tokentype == token.STRINGTYPE:
             self.__advance()
+        elif self.current_token.tokentype == token.ARRAYTYPE:
+            self.__advance()
+            array_type_node = ast.ArrayType()
+            array_type_node.array_token = type_token
+            array_type_node.elem_type = self.__type()
+            return array_type_node
+        elif self.current_token.tokentype == token.MAPTYPE:
+            self.__advance()
+            map_type_node = ast.MapType()
+            map_type_node.map_token = type_token
+            map_type_node.key_type = self.__type()
+            map_type_node.value_type = self.__type()
+            return map_type_node
         else:
             self.__error("Variable type not valid")
-
-    # function for defining expressions
+        return type_token
+
+    # index of an array element, in brackets
+    def __index(self):
+        self.__nest()
+        self.__eat(token.LBRACKET, "Missing left bracket")
+        index_expr = self.__expr()
+        self.__eat(token.RBRACKET, "Missing right bracket")
+        self.__unnest()
+        return index_expr
+
+    # function for defining expressions. A chain of math operators is parsed in a loop, and then nested from the
+    # right: a - b - c is a - (b - c).
     def __expr(self):
-        simple_expr_node = ast.SimpleExpr()
-        complex_expr_node = ast.ComplexExpr()
+        terms = [self.__term()]
+        math_rels = []
+        while self.current_token.tokentype in MATH_RELS:
+            self.__nest()
+            math_rels.append(self.current_token)
+            self.__advance()
+            terms.append(self.__term())
+        self.__unnest(len(math_rels))
+        expr_node = ast.SimpleExpr()
+        expr_node.term = terms.pop()
+        while math_rels:
+            complex_expr_node = ast.ComplexExpr()
+            complex_expr_node.first_operand = terms.pop()
+            complex_expr_node.math_rel = math_rels.pop()
+            complex_expr_node.rest = expr_node
+            expr_node = complex_expr_node
+        return expr_node
+
+    # an operand of a math operator
+    def __term(self):
         if self.current_token.tokentype == token.LPAREN:
+            self.__nest()
             self.__advance()
-            if complex_expr_node.first_operand is None:
-                simple_expr_node.term = self.__expr()
-                complex_expr_node.first_operand = simple_expr_node.term
-            else:
-                simple_expr_node.term = self.__expr()
-                complex_expr_node.rest = simple_expr_node.term
+            term = self.__expr()
             self.__eat(token.RPAREN, "Missing right parenthesis")
-        else:   # simple expression
-            self.__rvalue(simple_expr_node, complex_expr_node)
-        mathrels = [token.PLUS, token.MINUS, token.DIVIDE, token.MULTIPLY, token.MODULO]
-        if self.current_token.tokentype in mathrels:
-            complex_expr_node.math_rel = self.current_token
-            self.__advance()
-            complex_expr_node.rest = self.__expr()
-            return complex_expr_node
-        return simple_expr_node
+            self.__unnest()
+            return term
+        return self.__rvalue()   # simple expression
 
     # defines right values for expressions
-    def __rvalue(self, simple_expr_node, complex_expr_node):
-        if self.current_token.tokentype == token.STRINGVAL:
-            simple_rvalue_node = ast.SimpleRValue()
-            simple_rvalue_node.val = self.current_token
-            simple_expr_node.term = simple_rvalue_node
-            self.__advance()
-        elif self.current_token.tokentype == token.INTVAL:
-            simple_rvalue_node = ast.SimpleRValue()
-            simple_rvalue_node.val = self.current_token
-            simple_expr_node.term = simple_rvalue_node
-            self.__advance()
-        elif self.current_token.tokentype == token.BOOLVAL:
-            simple_rvalue_node = ast.SimpleRValue()
-            simple_rvalue_node.val = self.current_token
-            simple_expr_node.term = simple_rvalue_node
-            self.__advance()
-        elif self.current_token.tokentype == token.FLOATVAL:
-            simple_rvalue_node = ast.SimpleRValue()
-            simple_rvalue_node.val = self.current_token
-            simple_expr_node.term = simple_rvalue_node
-            self.__advance()
-        elif self.current_token.tokentype == token.NIL:
-            simple_rvalue_node = ast.SimpleRValue()
-            simple_rvalue_node.val = self.current_token
-            simple_expr_node.term = simple_rvalue_node
+    def __rvalue(self):
+        if self.current_token.tokentype in VALUE_TOKENS:
+            rvalue_node = ast.SimpleRValue()
+            rvalue_node.val = self.current_token
             self.__advance()
         elif self.current_token.tokentype == token.NEW:
             self.__advance()
-            new_rvalue_node = ast.NewRValue()
-            new_rvalue_node.struct_type = self.current_token
-            self.__eat(token.ID, "Missing 'ID'")
-            simple_expr_node.term = new_rvalue_node
+            elem_type = self.__type()
+            if self.current_token.tokentype == token.LBRACKET:  # new array, of the given size
+                rvalue_node = ast.NewArrayRValue()
+                rvalue_node.elem_type = elem_type
+                rvalue_node.size_expr = self.__index()
+            elif elem_type.tokentype == token.MAPTYPE:  # new empty map
+                rvalue_node = ast.NewMapRValue()
+                rvalue_node.map_type = elem_type
+            elif elem_type.tokentype == token.ID:   # new struct
+                rvalue_node = ast.NewRValue()
+                rvalue_node.struct_type = elem_type
+            else:
+                self.__error("Missing left bracket")
         elif self.current_token.tokentype == token.ID:
-            self.__idrval(simple_expr_node)
+            rvalue_node = self.__idrval()
         else:
             self.__error("Missing variable declaration")
-        if complex_expr_node.first_operand is None:
-            complex_expr_node.first_operand = simple_expr_node.term
-        else:
-            complex_expr_node.rest = simple_expr_node.term
+        return rvalue_node
 
-    # defines values for ID
-    def __idrval(self, simple_expr_node):
-        if self.current_token.tokentype == token.ID:
+    # defines values for ID, a function call or a (path of) variable(s)
+    def __idrval(self):
+        id_token = self.current_token
+        self.__advance()
+        if self.current_token.tokentype == token.LPAREN:
             call_rvalue_node = ast.CallRValue()
-            call_rvalue_node.fun = self.current_token
-
-            id_rvalue_node = ast.IDRvalue()
-            id_rvalue_node.path.append(self.current_token)
-            simple_expr_node.term = id_rvalue_node
+            call_rvalue_node.fun = id_token
+            self.__nest()
+            self.__eat(token.LPAREN, "Missing left parenthesis")
+            self.__exprlist(call_rvalue_node)
+            self.__eat(token.RPAREN, "Missing right parenthesis")
+            self.__unnest()
+            return call_rvalue_node
+        path = [id_token]
+        while self.current_token.tokentype == token.DOT:
             self.__advance()
-            if self.current_token.tokentype == token.DOT:
-                while self.current_token.tokentype == token.DOT:
-                    self.__advance()
-                    id_rvalue_node.path.append(self.current_token)
-                    self.__eat(token.ID, "Missing 'ID'")
-                simple_expr_node.term = id_rvalue_node
-            elif self.current_token.tokentype == token.LPAREN:
-                self.__eat(token.LPAREN, "Missing left parenthesis")
-                self.__exprlist(call_rvalue_node)
-                self.__eat(token.RPAREN, "Missing right parenthesis")
-                simple_expr_node.term = call_rvalue_node
+            path.append(self.current_token)
+            self.__eat(token.ID, "Missing 'ID'")
+        id_rvalue_node = ast.IDRvalue()
+        id_rvalue_node.path = tuple(path)
+        if self.current_token.tokentype == token.LBRACKET:  # an element of the array
+            index_rvalue_node = ast.IndexRValue()
+            index_rvalue_node.array = id_rvalue_node
+            index_rvalue_node.index_expr = self.__index()
+            return index_rvalue_node
+        return id_rvalue_node
 
                 # function contains grammar for expressions
     def __exprlist(self, call_rvalue_node):
         # tokens that can start an expression
-        types = [token.STRINGVAL, token.INTVAL, token.FLOATVAL, token.BOOLVAL, token.ID, token.LPAREN, token.NIL]
-        if self.current_token.tokentype in types:
+        if self.current_token.tokentype in EXPR_TOKENS:
             call_rvalue_node.args.append(self.__expr())
             while self.current_token.tokentype == token.COMMA:
                 self.__advance()
@@ -120,28 +120,34 @@ class PrintVisitor(ast.Visitor):
         complex_expr.rest.accept(self)
         self.__write(')')
 
-    def visit_bool_expr(self, bool_expr):
-        if bool_expr.negated:
-            self.__write('not ')
-        if bool_expr.bool_connector:
-            self.__write('(')
-        if bool_expr.bool_rel:
-            self.__write('(')
-        bool_expr.first_expr.accept(self)
-        if bool_expr.bool_rel is not None:
-            self.__write(' ' + bool_expr.bool_rel.lexeme + ' ')
-            bool_expr.second_expr.accept(self)
-            self.__write(')')
-        if bool_expr.bool_connector is not None:
-            self.__write(' ' + bool_expr.bool_connector.lexeme + ' ')
-            bool_expr.rest.accept(self)
-            self.__write(')')
+    def visit_compare_expr(self, compare_expr):
+        self.__write('(')
+        compare_expr.first_expr.accept(self)
+        self.__write(' ' + compare_expr.bool_rel.lexeme + ' ')
+        compare_expr.second_expr.accept(self)
+        self.__write(')')
+
+    def visit_logic_expr(self, logic_expr):
+        self.__write('(')
+        for i, operand in enumerate(logic_expr.operands):
+            if i > 0:
+                self.__write(' ' + logic_expr.connector.lexeme + ' ')
+            operand.accept(self)
+        self.__write(')')
+
+    def visit_not_expr(self, not_expr):
+        self.__write('not ')
+        not_expr.operand.accept(self)
 
     def visit_lvalue(self, lval):
         for i, path_id in enumerate(lval.path):
             self.__write(path_id.lexeme)
             if i != len(lval.path) - 1:
                 self.__write('.')
+        if lval.index_expr is not None:
+            self.__write('[')
+            lval.index_expr.accept(self)
+            self.__write(']')
 
     def visit_fun_param(self, fun_param):
         self.__write(fun_param.param_name.lexeme)
@@ -150,7 +156,7 @@ class PrintVisitor(ast.Visitor):
 
     def visit_simple_rvalue(self, simple_rvalue):
         if simple_rvalue.val.tokentype == token.STRINGVAL:
-            self.__write('"' + simple_rvalue.val.lexeme + '"')
+            self.__write('"' + simple_rvalue.val.lexeme.replace('\n', r'\n') + '"')
         else:
             self.__write(simple_rvalue.val.lexeme)
 
@@ -158,6 +164,23 @@ class PrintVisitor(ast.Visitor):
         self.__write('new ')
         self.__write(new_rvalue.struct_type.lexeme)
 
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        self.__write('new ')
+        self.__write(new_array_rvalue.elem_type.lexeme)
+        self.__write('[')
+        new_array_rvalue.size_expr.accept(self)
+        self.__write(']')
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        self.__write('new ')
+        self.__write(new_map_rvalue.map_type.lexeme)
+
+    def visit_index_rvalue(self, index_rvalue):
+        index_rvalue.array.accept(self)
+        self.__write('[')
+        index_rvalue.index_expr.accept(self)
+        self.__write(']')
+
     def visit_call_rvalue(self, call_rvalue):
         self.__write(call_rvalue.fun.lexeme)
         self.__write('(')
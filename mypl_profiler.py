@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Instrumenting profiler for MyPL programs. ProfilingInterpreter runs a program like the interpreter does while
+#   recording call counts and cumulative/self time for every MyPL function and how often each source line runs.
+#   Results can be printed as a report or exported as collapsed stacks for flame graph tools. The plain Interpreter
+#   is untouched, so programs run without profiling pay nothing for it.
+# ----------------------------------------------------------------------
+
+import mypl_ast as ast
+import mypl_interpreter as interpreter
+import time
+
+
+class FunctionStats(object):
+    """Profile of a single MyPL function"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total_time = 0.0  # time inside the function, including callees (outermost activations only)
+        self.self_time = 0.0  # time inside the function, excluding callees
+
+
+class Activation(object):
+    """A running call of a profiled function"""
+
+    def __init__(self, stats, stack, start):
+        self.stats = stats
+        self.stack = stack  # collapsed call stack, e.g. '<main>;fib;fib'
+        self.start = start
+        self.callee_time = 0.0
+
+
+class TimedBody(ast.StmtList):
+    """Stands in for the body of a function while it is profiled, timing
+    every execution of the body. Arguments are evaluated before the body
+    runs, so their cost stays with the caller.
+    """
+    __slots__ = ('name', 'profiler')
+
+    def __init__(self, stmt_list, name, profiler):
+        self.stmts = stmt_list.stmts
+        self.frame_size = stmt_list.frame_size
+        self.name = name
+        self.profiler = profiler
+
+    def accept(self, visitor):
+        self.profiler.enter(self.name)
+        try:
+            visitor.visit_stmt_list(self)
+        finally:    # also on errors
+            self.profiler.leave()
+
+
+class ProfilingInterpreter(interpreter.Interpreter):
+    """A MyPL interpreter that profiles the program it runs"""
+
+    def __init__(self, gc_threshold=10000, gc_growth=2.0, the_memo=None, the_output=None, the_input=None):
+        interpreter.Interpreter.__init__(self, gc_threshold, gc_growth, the_memo, the_output, the_input)
+        self.functions = {}  # {fun_name: FunctionStats}
+        self.line_counts = {}  # {line: number of statements executed on it}
+        self.stack_times = {}  # {collapsed stack: self time}
+        self.activations = []  # Activations of the running calls, innermost last
+        self.active = {}  # {fun_name: number of running activations}
+        self.stmt_lines = {}  # {statement: its line}, filled in as statements first run
+
+    def run(self, stmt_list):
+        bodies = []     # (fun_decl, its real body), restored once the program ends
+        for stmt in stmt_list.stmts:
+            if isinstance(stmt, ast.FunDeclStmt):
+                bodies.append((stmt, stmt.stmt_list))
+                stmt.stmt_list = TimedBody(stmt.stmt_list, stmt.fun_name.lexeme, self)
+        self.enter('<main>')
+        try:
+            interpreter.Interpreter.run(self, stmt_list)
+        finally:
+            self.leave()
+            for fun_decl, body in bodies:
+                fun_decl.stmt_list = body
+
+    def enter(self, name):
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = FunctionStats(name)
+        stats.calls += 1
+        stack = self.activations[-1].stack + ';' + name if self.activations else name
+        self.activations.append(Activation(stats, stack, time.perf_counter()))
+        self.active[name] = self.active.get(name, 0) + 1
+
+    def leave(self):
+        activation = self.activations.pop()
+        elapsed = time.perf_counter() - activation.start
+        stats = activation.stats
+        self.active[stats.name] -= 1
+        if self.active[stats.name] == 0:    # recursive calls are already inside this time
+            stats.total_time += elapsed
+        self_time = elapsed - activation.callee_time
+        stats.self_time += self_time
+        self.stack_times[activation.stack] = self.stack_times.get(activation.stack, 0.0) + self_time
+        if self.activations:
+            self.activations[-1].callee_time += elapsed
+
+    def visit_stmt_list(self, stmt_list):
+        for stmt in stmt_list.stmts:
+            line = self.stmt_lines.get(stmt)
+            if line is None:
+                line = self.stmt_lines[stmt] = ast.first_token(stmt).line
+            self.line_counts[line] = self.line_counts.get(line, 0) + 1
+            stmt.accept(self)
+            if self.completion:
+                return
+
+    def report(self, source_lines=None, max_lines=20):
+        """the profile as text, functions sorted by self time and the most
+        executed lines first
+        """
+        s = 'profile: functions by self time\n'
+        s += '%10s %12s %12s %12s  %s\n' % ('calls', 'total s', 'self s', 'self/call', 'function')
+        for stats in sorted(self.functions.values(), key=lambda stats: stats.self_time, reverse=True):
+            s += '%10i %12.6f %12.6f %12.9f  %s\n' % \
+                 (stats.calls, stats.total_time, stats.self_time, stats.self_time / stats.calls, stats.name)
+        s += 'profile: most executed lines\n'
+        s += '%10s %6s\n' % ('count', 'line')
+        lines = sorted(self.line_counts.items(), key=lambda item: (-item[1], item[0]))
+        for line, count in lines[:max_lines]:
+            text = ''
+            if source_lines is not None and 0 < line <= len(source_lines):
+                text = '  ' + source_lines[line - 1].strip()
+            s += '%10i %6i%s\n' % (count, line, text)
+        return s
+
+    def collapsed_stacks(self):
+        """self time per call stack in the collapsed format read by flame
+        graph tools ('<main>;f;g microseconds' per line)
+        """
+        s = ''
+        for stack, seconds in sorted(self.stack_times.items()):
+            s += '%s %i\n' % (stack, round(seconds * 1000000))
+        return s
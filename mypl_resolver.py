@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Resolves every variable use in a type-checked MyPL program to a (depth, slot) address so the interpreter can
+#   read and write array-backed frames by index instead of searching a chain of environments by name. Depth 0 is
+#   the frame of the running function (or struct initializer, or the main program) and depth 1 is the global frame.
+#   Calls and struct allocations are also linked directly to their declarations, each struct gets a field layout,
+#   and the fields along a path expression are resolved to slots in those layouts. Calls in tail position are
+#   flagged so the interpreter can run them without nesting.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_ast as ast
+import mypl_error as error
+import mypl_builtins as builtins
+
+ARRAY = 'array '    # array types are this followed by the type of their elements, '' for primitive ones
+
+class Resolver(ast.Visitor):
+    """A MyPL lexical addressing visitor implementation"""
+
+    def __init__(self):
+        self.global_scope = {}  # {var_name: (slot, struct_type)} of the top level block
+        self.scopes = []  # stack of {var_name: (slot, struct_type)} for the frame being resolved
+        self.frame_size = 0  # number of slots used so far in the frame being resolved
+        self.in_global_frame = True  # resolving the main program (depth 0 is the global frame)
+        self.functions = {}  # {fun_name: FunDeclStmt}
+        self.structs = {}  # {struct_name: StructDeclStmt}
+        self.current_type = None  # struct name of the last expression, None if not a struct
+
+    def resolve(self, stmt_list):
+        """annotates the program, sizing the global frame on stmt_list"""
+        self.scopes = [self.global_scope]
+        for stmt in stmt_list.stmts:
+            stmt.accept(self)
+        stmt_list.frame_size = self.frame_size
+
+    def __error(self, msg, the_token):
+        raise error.MyPLError(msg, the_token.line, the_token.column)
+
+    def __declare(self, name, struct_type):
+        self.scopes[-1][name] = (self.frame_size, struct_type)
+        self.frame_size += 1
+        return (0, self.frame_size - 1)
+
+    def __lookup(self, the_token):
+        # returns the address and struct type of a variable
+        for scope in reversed(self.scopes):
+            if the_token.lexeme in scope:
+                slot, struct_type = scope[the_token.lexeme]
+                return (0, slot), struct_type
+        if not self.in_global_frame and the_token.lexeme in self.global_scope:
+            slot, struct_type = self.global_scope[the_token.lexeme]
+            return (1, slot), struct_type
+        self.__error('value has not been declared', the_token)
+
+    def __declared_type(self, type_token):
+        # struct name for a type annotation, None for primitive types, ARRAY and the element's for arrays
+        if type_token is not None and type_token.tokentype == token.ID:
+            return type_token.lexeme
+        if type_token is not None and type_token.tokentype == token.ARRAYTYPE:
+            return ARRAY + (self.__declared_type(type_token.elem_type) or '')
+        return None
+
+    def __element_type(self, array_type):
+        # struct name (or array type) of the elements of an array type, None if not known
+        if array_type is not None and array_type.startswith(ARRAY):
+            return array_type[len(ARRAY):] or None
+        return None
+
+    def __field_slots(self, struct_type, path):
+        # slots of the fields named along path[1:], None if some struct type is not known statically
+        field_slots = []
+        for path_id in path[1:]:
+            struct_decl = self.structs.get(struct_type)
+            if struct_decl is None or path_id.lexeme not in struct_decl.field_index:
+                self.current_type = None
+                return None
+            field_slots.append(struct_decl.field_index[path_id.lexeme])
+            struct_type = struct_decl.field_types[path_id.lexeme]
+        self.current_type = struct_type
+        return field_slots
+
+    def __new_frame(self):
+        # starts a fresh frame nested directly in the global frame
+        saved = (self.scopes, self.frame_size, self.in_global_frame)
+        self.scopes = [{}]
+        self.frame_size = 0
+        self.in_global_frame = False
+        return saved
+
+    def __end_frame(self, saved):
+        self.scopes, self.frame_size, self.in_global_frame = saved
+
+    def __block(self, stmt_list):
+        self.scopes.append({})
+        stmt_list.accept(self)
+        self.scopes.pop()
+
+    def visit_stmt_list(self, stmt_list):
+        for stmt in stmt_list.stmts:
+            stmt.accept(self)
+
+    def visit_expr_stmt(self, expr_stmt):
+        expr_stmt.expr.accept(self)
+
+    def visit_var_decl_stmt(self, var_decl):
+        var_decl.var_expr.accept(self)  # the initial value cannot see the new variable
+        struct_type = self.current_type
+        if var_decl.var_type is not None:
+            struct_type = self.__declared_type(var_decl.var_type)
+        var_decl.address = self.__declare(var_decl.var_id.lexeme, struct_type)
+        self.current_type = struct_type
+
+    def visit_assign_stmt(self, assign_stmt):
+        assign_stmt.rhs.accept(self)
+        assign_stmt.lhs.accept(self)
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        self.structs[struct_decl.struct_id.lexeme] = struct_decl
+        saved = self.__new_frame()
+        for var_decl in struct_decl.var_decls:  # field i lives in slot i of the initializer frame and the record
+            var_decl.accept(self)
+            struct_decl.field_index[var_decl.var_id.lexeme] = var_decl.address[1]
+            struct_decl.field_types[var_decl.var_id.lexeme] = self.current_type
+        struct_decl.frame_size = self.frame_size
+        self.__end_frame(saved)
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        self.functions[fun_decl.fun_name.lexeme] = fun_decl
+        saved = self.__new_frame()
+        for param in fun_decl.params:
+            param.accept(self)
+        self.__block(fun_decl.stmt_list)
+        fun_decl.frame_size = self.frame_size
+        self.__end_frame(saved)
+        self.__tail_calls(fun_decl.stmt_list, True)
+
+    def __tail_calls(self, stmt_list, is_tail):
+        # flags the calls whose result is the result of the function: returned calls, and calls in statements the
+        # function ends with (is_tail: stmt_list is the last thing the function runs)
+        for i, stmt in enumerate(stmt_list.stmts):
+            last = is_tail and i == len(stmt_list.stmts) - 1
+            if isinstance(stmt, ast.ReturnStmt):
+                self.__tail_call(stmt.return_expr, False)
+            elif isinstance(stmt, ast.ExprStmt) and last:
+                self.__tail_call(stmt.expr, True)
+            elif isinstance(stmt, ast.IfStmt):
+                for basic_if in [stmt.if_part] + stmt.elseifs:
+                    self.__tail_calls(basic_if.stmt_list, last)
+                if stmt.has_else:
+                    self.__tail_calls(stmt.else_stmts, last)
+            elif isinstance(stmt, ast.WhileStmt):
+                self.__tail_calls(stmt.stmt_list, False)
+
+    def __tail_call(self, expr, nil_only):
+        # nil_only: the function falls off its end after the call, so its result must be nil too
+        if expr is None:
+            return
+        while isinstance(expr, ast.SimpleExpr):     # also (f(x))
+            expr = expr.term
+        if isinstance(expr, ast.CallRValue) and expr.fun_decl is not None:
+            if not nil_only or expr.fun_decl.return_type.tokentype == token.NIL:
+                expr.tail_call = True
+
+    def visit_return_stmt(self, return_stmt):
+        if return_stmt.return_expr is not None:
+            return_stmt.return_expr.accept(self)
+
+    def visit_while_stmt(self, while_stmt):
+        while_stmt.bool_expr.accept(self)
+        self.__block(while_stmt.stmt_list)
+
+    def visit_if_stmt(self, if_stmt):
+        if_stmt.if_part.bool_expr.accept(self)
+        self.__block(if_stmt.if_part.stmt_list)
+        for elseif in if_stmt.elseifs:
+            elseif.bool_expr.accept(self)
+            self.__block(elseif.stmt_list)
+        if if_stmt.has_else:
+            self.__block(if_stmt.else_stmts)
+
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term.accept(self)
+
+    def visit_complex_expr(self, complex_expr):
+        complex_expr.first_operand.accept(self)
+        complex_expr.rest.accept(self)
+        self.current_type = None
+
+    def visit_compare_expr(self, compare_expr):
+        compare_expr.first_expr.accept(self)
+        compare_expr.second_expr.accept(self)
+        self.current_type = None
+
+    def visit_logic_expr(self, logic_expr):
+        for operand in logic_expr.operands:
+            operand.accept(self)
+        self.current_type = None
+
+    def visit_not_expr(self, not_expr):
+        not_expr.operand.accept(self)
+        self.current_type = None
+
+    def visit_lvalue(self, lval):
+        lval.address, struct_type = self.__lookup(lval.path[0])
+        lval.field_slots = self.__field_slots(struct_type, lval.path)
+        if lval.index_expr is not None:
+            lval.index_expr.accept(self)
+
+    def visit_fun_param(self, fun_param):
+        fun_param.address = self.__declare(fun_param.param_name.lexeme, self.__declared_type(fun_param.param_type))
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        self.current_type = None
+
+    def visit_new_rvalue(self, new_rvalue):
+        if new_rvalue.struct_type.lexeme not in self.structs:
+            self.__error('value has not been declared', new_rvalue.struct_type)
+        new_rvalue.struct_decl = self.structs[new_rvalue.struct_type.lexeme]
+        self.current_type = new_rvalue.struct_type.lexeme
+
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        new_array_rvalue.size_expr.accept(self)
+        self.current_type = ARRAY + (self.__declared_type(new_array_rvalue.elem_type) or '')
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        self.current_type = None    # values read from maps are looked up by field name
+
+    def visit_index_rvalue(self, index_rvalue):
+        index_rvalue.array.accept(self)
+        array_type = self.current_type
+        index_rvalue.index_expr.accept(self)
+        self.current_type = self.__element_type(array_type)
+
+    def visit_call_rvalue(self, call_rvalue):
+        for arg in call_rvalue.args:
+            arg.accept(self)
+        self.current_type = None
+        fun_name = call_rvalue.fun.lexeme
+        if fun_name in builtins.BUILT_INS and fun_name not in self.functions:   # declared functions come first
+            return
+        if fun_name not in self.functions:
+            self.__error('function has not been declared', call_rvalue.fun)
+        call_rvalue.fun_decl = self.functions[fun_name]
+        self.current_type = self.__declared_type(call_rvalue.fun_decl.return_type)
+
+    def visit_id_rvalue(self, id_rvalue):
+        id_rvalue.address, struct_type = self.__lookup(id_rvalue.path[0])
+        id_rvalue.field_slots = self.__field_slots(struct_type, id_rvalue.path)
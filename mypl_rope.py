@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Deferred string concatenation for the MyPL engines. Appending to a long string makes a Rope, a list of the
+#   pieces that are joined only when the whole value is needed (printing, indexing, comparing, converting). Ropes
+#   extending one another share a single list of pieces, so building a string one piece at a time in a loop takes
+#   linear time instead of copying the string on every step. Ropes behave like the strings they stand for
+#   everywhere else, so the engines only need concat() where they add strings.
+# ----------------------------------------------------------------------
+
+MIN_LENGTH = 256    # shorter results are plain strings, copying them is cheaper than tracking pieces
+
+
+class Rope(object):
+    """A string made of pieces, joined the first time its value is needed"""
+    __slots__ = ('pieces', 'count', 'length', 'flat')
+
+    def __init__(self, pieces, length):
+        self.pieces = pieces  # list of strs, shared with the ropes that extend this one
+        self.count = len(pieces)  # this rope is pieces[:count], later pieces belong to ropes extending it
+        self.length = length
+        self.flat = None  # the joined string, once needed
+
+    def value(self):
+        """the string this rope stands for"""
+        if self.flat is None:
+            pieces = self.pieces
+            self.flat = ''.join(pieces if self.count == len(pieces) else pieces[:self.count])
+        return self.flat
+
+    def append(self, s):
+        """a rope for this string followed by s (a str)"""
+        if self.count == len(self.pieces):  # nothing extends this rope yet, so the new one can share its pieces
+            pieces = self.pieces
+        else:
+            pieces = self.pieces[:self.count]
+        pieces.append(s)
+        return Rope(pieces, self.length + len(s))
+
+    def __str__(self):
+        return self.value()
+
+    def __repr__(self):
+        return repr(self.value())
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return self.value()[index]
+
+    def __int__(self):
+        return int(self.value())
+
+    def __float__(self):
+        return float(self.value())
+
+    def __hash__(self):
+        return hash(self.value())
+
+    def __eq__(self, other):
+        return self.value() == flatten(other)
+
+    def __ne__(self, other):
+        return self.value() != flatten(other)
+
+    def __lt__(self, other):
+        return self.value() < flatten(other)
+
+    def __le__(self, other):
+        return self.value() <= flatten(other)
+
+    def __gt__(self, other):
+        return self.value() > flatten(other)
+
+    def __ge__(self, other):
+        return self.value() >= flatten(other)
+
+    def __add__(self, other):
+        if other.__class__ is str or other.__class__ is Rope:
+            return concat(self, other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if other.__class__ is str:
+            return concat(other, self)
+        return NotImplemented
+
+
+def flatten(value):
+    """value, with a Rope replaced by its string"""
+    if value.__class__ is Rope:
+        return value.value()
+    return value
+
+
+def concat(left, right):
+    """left + right for strings, either of which may be a Rope"""
+    if right.__class__ is Rope:
+        right = right.value()
+    if left.__class__ is Rope:
+        return left.append(right)
+    if len(left) + len(right) < MIN_LENGTH:
+        return left + right
+    return Rope([left, right], len(left) + len(right))
@@ -26,6 +26,8 @@ RETURN = 'RETURN'
 INTVAL = 'INTVAL'
 GREATER_THAN_EQUAL = 'GREATER_THAN_EQUAL'
 STRUCTTYPE = 'STRUCTTYPE'
+ARRAYTYPE = 'ARRAYTYPE'
+MAPTYPE = 'MAPTYPE'
 DO = 'DO'
 END = 'END'
 NEW = 'NEW'
@@ -51,11 +53,14 @@ DOT = 'DOT'
 SEMICOLON = 'SEMICOLON'
 LPAREN = 'LPAREN'
 RPAREN = 'RPAREN'
+LBRACKET = 'LBRACKET'
+RBRACKET = 'RBRACKET'
 EOS = 'EOS'
 # token types
 
 
 class Token(object):
+    __slots__ = ('tokentype', 'lexeme', 'line', 'column')
 
     def __init__(self, tokentype, lexeme, line, column):
         self.tokentype = tokentype
@@ -0,0 +1,581 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Translates a resolved MyPL program into Python source, which is compiled with compile() and run by CPython
+#   itself. Structs become __slots__ classes, functions become defs, and while/if statements map directly onto their
+#   Python counterparts, as do short-circuit and/or/not (with an 'is True' test on operands that may not be bools).
+#   Tail calls (see the resolver) take constant stack space: a function's calls to itself outside of while
+#   statements reassign its parameters and go round a loop, and a function making other tail calls returns them as
+#   TailCall objects from a def of its own, which a wrapper under the function's name runs one after the other.
+#   Whatever else Python would do differently (truncating int division, the print escape, nil values) goes through
+#   the run time support functions at the end of this module, so programs behave exactly as they do on the
+#   interpreter.
+# ----------------------------------------------------------------------
+
+import mypl_token as token
+import mypl_ast as ast
+import mypl_error as error
+import mypl_interpreter as interpreter
+import mypl_rope as rope
+import mypl_array as arrays
+import mypl_map as maps
+import mypl_output as output
+import mypl_input as reader
+import mypl_builtins as builtins
+import keyword
+import math
+import sys
+
+INDENT = '    '
+
+MATH_OPS = {
+    token.PLUS: '+',
+    token.MINUS: '-',
+    token.MULTIPLY: '*',
+    token.MODULO: '%',
+}
+
+BOOL_OPS = {
+    token.EQUAL: '==',
+    token.NOT_EQUAL: '!=',
+    token.LESS_THAN: '<',
+    token.LESS_THAN_EQUAL: '<=',
+    token.GREATER_THAN: '>',
+    token.GREATER_THAN_EQUAL: '>=',
+}
+
+# built in functions with a run time support function of their own, the others are called through rt_built_in
+TRANSLATED = ['print', 'length', 'get', 'reads', 'readi', 'readf', 'itof', 'itos', 'ftos', 'stoi', 'stof', 'eof',
+              'nfields', 'field']
+
+RUN_TIME = ['rt_nil', 'rt_deref', 'rt_div', 'rt_concat', 'rt_drop', 'rt_built_in', 'rt_new_array', 'rt_index',
+            'rt_store', 'rt_map', 'rt_tail_call', 'rt_trampoline'] + \
+           ['rt_' + name for name in TRANSLATED]
+
+
+class Transpiler(ast.Visitor):
+    """A MyPL to Python source translating visitor implementation"""
+
+    def __init__(self):
+        self.defs = []  # lines of the struct classes and functions
+        self.main = []  # lines of the main program's body
+        self.lines = self.main  # where statements are written
+        self.indent = 1
+        self.in_main = True  # translating the main program, so depth 0 variables are globals
+        self.shared_globals = set()  # names of the globals used outside of the main program
+        self.assigned_globals = set()  # globals assigned in the function being translated
+        self.fun_decl = None  # the function being translated
+        self.tail_calls = False  # it makes tail calls to other functions
+        self.loops = False  # it makes tail calls to itself
+        self.whiles = 0  # while statements around the statement being translated, in the function
+        self.trampolined = set()  # names of the functions translated to a tc_ def and a trampoline
+        self.tail_called = set()  # names of the functions called by other functions' tail calls
+        self.current_expr = None  # Python source of the last visited expression
+
+    def transpile(self, stmt_list):
+        """returns the Python source of a resolved program"""
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), interpreter.RECURSION_LIMIT))  # as deep as the parser allows
+        stmt_list.accept(self)
+        source = ['# generated from MyPL', 'from mypl_transpiler import ' + ', '.join(RUN_TIME)]
+        source += self.defs
+        for name in sorted(self.tail_called - self.trampolined):    # functions without tail calls run as they are
+            source += ['', '', 'tc_%s = fun_%s' % (name, name)]
+        source += ['', '', 'def main():']
+        if self.shared_globals:
+            source.append(INDENT + 'global ' + ', '.join(sorted(self.shared_globals)))
+        source += self.main if self.main else [INDENT + 'pass']
+        source += ['', '', "if __name__ == '__main__':", INDENT + 'main()', '']
+        return '\n'.join(source)
+
+    def __error(self, msg, the_token):
+        raise error.MyPLError(msg, the_token.line, the_token.column)
+
+    def __emit(self, line):
+        self.lines.append(INDENT * self.indent + line if line else line)
+
+    def __expr(self, expr):
+        expr.accept(self)
+        return self.current_expr
+
+    def __block(self, stmt_list):
+        self.indent += 1
+        size = len(self.lines)
+        stmt_list.accept(self)
+        if len(self.lines) == size:
+            self.__emit('pass')
+        self.indent -= 1
+
+    def __var(self, the_token, address):
+        # Python name of a variable, from its name and slot so that shadowed variables get names of their own
+        name = '%s_%i' % (the_token.lexeme, address[1])
+        if address[0] == 1:
+            self.shared_globals.add('g_' + name)
+            return 'g_' + name
+        return ('g_' if self.in_main else 'v_') + name
+
+    def __field(self, the_token):
+        # Python attribute of a struct field, escaping names Python reserves (and names that look escaped)
+        name = the_token.lexeme
+        if keyword.iskeyword(name) or name.startswith('__') or name.startswith('m_'):
+            return 'm_' + name
+        return name
+
+    def __path(self, path, address):
+        # source of the struct holding the last field in path, checking every struct along the way for nil
+        var = self.__var(path[0], address)
+        source = '(%s if %s is not None else rt_nil(%i, %i))' % (var, var, path[0].line, path[0].column)
+        for i in range(1, len(path) - 1):
+            source = 'rt_deref(%s.%s, %i, %i)' % (source, self.__field(path[i]), path[i].line, path[i].column)
+        return source
+
+    def __literal(self, value):
+        if type(value) == float and not math.isfinite(value):
+            return "float('%r')" % value
+        if type(value) in (int, float) and value < 0:
+            return '(%r)' % value
+        return repr(value)
+
+    def visit_stmt_list(self, stmt_list):
+        for stmt in stmt_list.stmts:
+            stmt.accept(self)
+
+    def visit_expr_stmt(self, expr_stmt):
+        call = self.__tail_call(expr_stmt.expr)
+        if call is not None and call.fun_decl is self.fun_decl and not self.whiles:
+            self.__loop(call)
+        elif call is not None:  # the function ends with it, so return its result
+            self.__emit('return ' + self.__expr(expr_stmt.expr))
+        else:
+            self.__emit(self.__expr(expr_stmt.expr))
+
+    def __tail_call(self, expr):
+        # the call expr is if the resolver flagged it as a tail call, else None
+        while isinstance(expr, ast.SimpleExpr):
+            expr = expr.term
+        if isinstance(expr, ast.CallRValue) and expr.tail_call:
+            return expr
+        return None
+
+    def __loop(self, call_rvalue):
+        # a tail call of the function to itself: reassigns its parameters and starts its body over
+        self.loops = True
+        args, extra = self.__args(call_rvalue)
+        targets = [self.__var(param.param_name, param.address) for param in self.fun_decl.params]
+        if extra:
+            targets.append('_')
+            args.append('rt_drop(%s)' % ', '.join(extra))
+        if targets:
+            self.__emit('%s = %s' % (', '.join(targets), ', '.join(args)))
+        self.__emit('continue')
+
+    def __args(self, call_rvalue):
+        # the arguments of a call to a declared function, with None for missing ones, and the extra ones
+        args = [self.__expr(arg) for arg in call_rvalue.args]
+        nparams = len(call_rvalue.fun_decl.params)
+        return args[:nparams] + ['None'] * (nparams - len(args)), args[nparams:]
+
+    def visit_var_decl_stmt(self, var_decl):
+        self.__emit('%s = %s' % (self.__var(var_decl.var_id, var_decl.address), self.__expr(var_decl.var_expr)))
+
+    def visit_assign_stmt(self, assign_stmt):
+        lval = assign_stmt.lhs
+        if lval.index_expr is not None:     # an array element: the index, then the value, then the array
+            index = self.__expr(lval.index_expr)
+            rhs = self.__expr(assign_stmt.rhs)
+            the_token = lval.path[-1]
+            self.__emit('rt_store(%s, %s, %s, %i, %i)' % (index, rhs, self.__array(lval.path, lval.address),
+                                                          the_token.line, the_token.column))
+            return
+        rhs = self.__expr(assign_stmt.rhs)
+        lval.accept(self)
+        self.__emit('%s = %s' % (self.current_expr, rhs))
+
+    def __array(self, path, address):
+        # source of the array an lvalue stores an element of
+        if len(path) == 1:
+            return self.__var(path[0], address)
+        return '%s.%s' % (self.__path(path, address), self.__field(path[-1]))
+
+    def visit_struct_decl_stmt(self, struct_decl):
+        fields = [self.__field(var_decl.var_id) for var_decl in struct_decl.var_decls]
+        saved = (self.lines, self.indent, self.in_main)
+        self.lines, self.indent, self.in_main = self.defs, 0, False
+        self.__emit('')
+        self.__emit('')
+        self.__emit('class struct_%s(object):' % struct_decl.struct_id.lexeme)
+        self.indent += 1
+        self.__emit('__slots__ = %r' % (tuple(fields),))
+        self.__emit('')
+        self.__emit('def __init__(self):')
+        self.indent += 1
+        for field, var_decl in zip(fields, struct_decl.var_decls):  # earlier fields are visible to later ones
+            self.__emit('self.%s = %s = %s' % (field, self.__var(var_decl.var_id, var_decl.address),
+                                               self.__expr(var_decl.var_expr)))
+        if not fields:
+            self.__emit('pass')
+        self.lines, self.indent, self.in_main = saved
+
+    def visit_fun_decl_stmt(self, fun_decl):
+        saved = (self.lines, self.indent, self.in_main, self.assigned_globals, self.fun_decl, self.tail_calls,
+                 self.loops, self.whiles)
+        self.lines, self.indent, self.in_main, self.assigned_globals = [], 0, False, set()
+        self.fun_decl, self.tail_calls, self.loops, self.whiles = fun_decl, False, False, 0
+        params = ', '.join(self.__var(param.param_name, param.address) for param in fun_decl.params)
+        name = fun_decl.fun_name.lexeme
+        self.__block(fun_decl.stmt_list)
+        body = self.lines
+        if self.loops:  # tail calls to itself continue the loop
+            if body[-1] != INDENT + 'continue' and not body[-1].startswith(INDENT + 'return'):
+                body.append(INDENT + 'return')     # the body runs off its end
+            body = [INDENT + 'while True:'] + [INDENT + line for line in body]
+        if self.assigned_globals:
+            body.insert(0, INDENT + 'global ' + ', '.join(sorted(self.assigned_globals)))
+        # a body that runs off its end returns None, i.e. nil, as on every engine
+        if self.tail_calls:     # tc_ returns the tail calls, which the function runs in a loop
+            self.trampolined.add(name)
+            self.defs += ['', '', 'def tc_%s(%s):' % (name, params)] + body
+            self.defs += ['', '', 'def fun_%s(%s):' % (name, params), INDENT + 'return rt_trampoline(tc_%s(%s))' %
+                          (name, params)]
+        else:
+            self.defs += ['', '', 'def fun_%s(%s):' % (name, params)] + body
+        (self.lines, self.indent, self.in_main, self.assigned_globals, self.fun_decl, self.tail_calls, self.loops,
+         self.whiles) = saved
+
+    def visit_return_stmt(self, return_stmt):
+        call = self.__tail_call(return_stmt.return_expr)
+        if return_stmt.return_expr is None:
+            self.__emit('return')
+        elif call is not None and call.fun_decl is self.fun_decl and not self.whiles:
+            self.__loop(call)
+        else:   # in a while, continue would only go round that loop, so a call to itself goes to the trampoline too
+            self.__emit('return ' + self.__expr(return_stmt.return_expr))
+
+    def visit_while_stmt(self, while_stmt):
+        self.__emit('while %s:' % self.__expr(while_stmt.bool_expr))
+        self.whiles += 1
+        self.__block(while_stmt.stmt_list)
+        self.whiles -= 1
+
+    def visit_if_stmt(self, if_stmt):
+        self.__emit('if %s:' % self.__expr(if_stmt.if_part.bool_expr))
+        self.__block(if_stmt.if_part.stmt_list)
+        for elseif in if_stmt.elseifs:
+            self.__emit('elif %s:' % self.__expr(elseif.bool_expr))
+            self.__block(elseif.stmt_list)
+        if if_stmt.has_else:
+            self.__emit('else:')
+            self.__block(if_stmt.else_stmts)
+
+    def visit_simple_expr(self, simple_expr):
+        simple_expr.term.accept(self)
+
+    def visit_complex_expr(self, complex_expr):
+        first = self.__expr(complex_expr.first_operand)
+        rest = self.__expr(complex_expr.rest)
+        mathrel = complex_expr.math_rel.tokentype
+        if mathrel == token.DIVIDE:     # int / int truncates
+            self.current_expr = 'rt_div(%s, %s)' % (first, rest)
+        elif mathrel == token.PLUS and complex_expr.expr_type == token.STRINGTYPE:
+            self.current_expr = 'rt_concat(%s, %s)' % (first, rest)   # deferred, see mypl_rope
+        else:
+            self.current_expr = '(%s %s %s)' % (first, MATH_OPS[mathrel], rest)
+
+    def __truth(self, expr):
+        # Python bool of a Boolean operand: only True counts as true
+        value = self.__expr(expr)
+        if isinstance(expr, (ast.CompareExpr, ast.LogicExpr, ast.NotExpr)):    # already a bool
+            return value
+        return '(%s is True)' % value
+
+    def visit_compare_expr(self, compare_expr):
+        first = self.__expr(compare_expr.first_expr)
+        second = self.__expr(compare_expr.second_expr)
+        self.current_expr = '(%s %s %s)' % (first, BOOL_OPS[compare_expr.bool_rel.tokentype], second)
+
+    def visit_logic_expr(self, logic_expr):
+        connector = ' and ' if logic_expr.connector.tokentype == token.AND else ' or '
+        self.current_expr = '(%s)' % connector.join(self.__truth(operand) for operand in logic_expr.operands)
+
+    def visit_not_expr(self, not_expr):
+        self.current_expr = '(not %s)' % self.__truth(not_expr.operand)
+
+    def visit_lvalue(self, lval):
+        if len(lval.path) == 1:
+            var = self.__var(lval.path[0], lval.address)
+            if lval.address[0] == 1:
+                self.assigned_globals.add(var)
+            self.current_expr = var
+        else:
+            self.current_expr = '%s.%s' % (self.__path(lval.path, lval.address), self.__field(lval.path[-1]))
+
+    def visit_simple_rvalue(self, simple_rvalue):
+        self.current_expr = self.__literal(simple_rvalue.value)     # converted once by the optimizer
+
+    def visit_new_rvalue(self, new_rvalue):
+        self.current_expr = 'struct_%s()' % new_rvalue.struct_decl.struct_id.lexeme
+
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        the_token = ast.first_token(new_array_rvalue)
+        self.current_expr = 'rt_new_array(%r, %s, %i, %i)' % (new_array_rvalue.elem_type.tokentype,
+                                                              self.__expr(new_array_rvalue.size_expr),
+                                                              the_token.line, the_token.column)
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        self.current_expr = 'rt_map(%r)' % new_map_rvalue.map_type.key_type.tokentype
+
+    def visit_index_rvalue(self, index_rvalue):
+        index = self.__expr(index_rvalue.index_expr)
+        the_token = index_rvalue.array.path[-1]
+        self.current_expr = 'rt_index(%s, %s, %i, %i)' % (index, self.__expr(index_rvalue.array),
+                                                          the_token.line, the_token.column)
+
+    def visit_call_rvalue(self, call_rvalue):
+        fun = call_rvalue.fun
+        if call_rvalue.fun_decl is None:
+            args = [self.__expr(arg) for arg in call_rvalue.args]
+            built_in = builtins.BUILT_INS.get(fun.lexeme)
+            if built_in is None:
+                self.__error('unknown function call', fun)
+            location = ['%i' % fun.line, '%i' % fun.column]
+            if fun.lexeme in TRANSLATED and len(args) == len(built_in.param_types):
+                self.current_expr = 'rt_%s(%s)' % (fun.lexeme, ', '.join(args + location))
+            else:
+                self.current_expr = "rt_built_in('%s', %s)" % (fun.lexeme, ', '.join(location + args))
+            return
+        args, extra = self.__args(call_rvalue)
+        if extra:   # extra arguments are evaluated, then dropped
+            args.append('*rt_drop(%s)' % ', '.join(extra))
+        if call_rvalue.tail_call:   # handed to the caller's trampoline, which runs it in the function's place
+            self.tail_calls = True
+            self.tail_called.add(fun.lexeme)
+            self.current_expr = 'rt_tail_call(tc_%s%s)' % (fun.lexeme, ''.join(', ' + arg for arg in args))
+        else:
+            self.current_expr = 'fun_%s(%s)' % (fun.lexeme, ', '.join(args))
+
+    def visit_id_rvalue(self, id_rvalue):
+        if len(id_rvalue.path) == 1:
+            self.current_expr = self.__var(id_rvalue.path[0], id_rvalue.address)
+        else:
+            self.current_expr = '%s.%s' % (self.__path(id_rvalue.path, id_rvalue.address),
+                                           self.__field(id_rvalue.path[-1]))
+
+
+def compile_program(stmt_list, filename='<mypl>'):
+    """translates a resolved program and compiles it to a Python code object"""
+    source = Transpiler().transpile(stmt_list)
+    try:
+        return compile(source, filename, 'exec')
+    except (SyntaxError, RecursionError, MemoryError):  # e.g., nested deeper than Python allows
+        raise error.MyPLError('program too deeply nested for the python engine', 0, 0)
+
+
+def run(code, the_output=None, the_input=None):
+    """runs a compiled program, printing to the_output (a mypl_output.Writer)
+    and reading from the_input (a mypl_input.Reader)
+    """
+    global rt_output, rt_input
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), interpreter.RECURSION_LIMIT))
+    rt_output = output.Writer() if the_output is None else the_output
+    rt_input = reader.Reader(None, reader.BLOCK_SIZE, rt_output) if the_input is None else the_input
+    try:
+        exec(code, {'__name__': '__main__'})
+    finally:
+        rt_output.flush()
+
+
+# run time support for the generated code
+
+rt_output = output.Writer()     # where print writes, set by run()
+rt_input = reader.Reader(None, reader.BLOCK_SIZE, rt_output)   # where reads, readi and readf read, set by run()
+
+def rt_nil(line, column):
+    raise error.MyPLError('nil value error', line, column)
+
+
+def rt_deref(value, line, column):
+    if value is None:
+        raise error.MyPLError('nil value error', line, column)
+    return value
+
+
+def rt_div(first_value, second_value):
+    if type(first_value) == int and type(second_value) == int:    # both values are int, result is an int
+        return int(first_value / second_value)
+    return first_value / second_value
+
+
+rt_concat = rope.concat
+rt_map = maps.Map
+
+
+class TailCall(object):
+    """A call a function returns the result of, to be run by its caller"""
+    __slots__ = ('function', 'args')
+
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+
+rt_tail_call = TailCall
+
+
+def rt_trampoline(result):
+    # runs the tail calls a function returned, each in the place of the last, giving the final result
+    while result.__class__ is TailCall:
+        result = result.function(*result.args)
+    return result
+
+
+def rt_drop(*args):
+    return ()
+
+
+def rt_print(value, line, column):
+    if value is None:
+        raise error.MyPLError('nil value error', line, column)
+    rt_output.write(str(value))
+
+
+def rt_length(value, line, column):
+    if value is None:
+        raise error.MyPLError('nil value error', line, column)
+    return len(value)
+
+
+def rt_get(index, string, line, column):
+    if index is None or string is None:
+        raise error.MyPLError('nil value error', line, column)
+    if 0 <= index < len(string):
+        return string[index]
+    raise error.MyPLError('index out of range error', line, column)
+
+
+def rt_readline(line, column):
+    text = rt_input.readline()
+    if text is None:
+        raise error.MyPLError('end of input error', line, column)
+    return text
+
+
+def rt_reads(line, column):
+    return rt_readline(line, column)
+
+
+def rt_readi(line, column):
+    try:
+        return int(rt_readline(line, column))
+    except ValueError:
+        raise error.MyPLError('bad int value', line, column)
+
+
+def rt_readf(line, column):
+    try:
+        return float(rt_readline(line, column))
+    except ValueError:
+        raise error.MyPLError('bad float value', line, column)
+
+
+def rt_eof(line, column):
+    return rt_input.eof()
+
+
+def rt_nfields(value, line, column):
+    if value is None:
+        raise error.MyPLError('nil value error', line, column)
+    return len(reader.fields(str(value)))
+
+
+def rt_field(index, value, line, column):
+    if index is None or value is None:
+        raise error.MyPLError('nil value error', line, column)
+    fields = reader.fields(str(value))
+    if 0 <= index < len(fields):
+        return fields[index]
+    raise error.MyPLError('index out of range error', line, column)
+
+
+def rt_itof(value, line, column):
+    if value is None:
+        raise error.MyPLError('nil value error', line, column)
+    return float(value)
+
+
+def rt_itos(value, line, column):
+    if value is None:
+        raise error.MyPLError('nil value error', line, column)
+    return str(value)
+
+
+rt_stof = rt_itof
+rt_ftos = rt_itos
+
+
+def rt_stoi(value, line, column):
+    if value is None:
+        raise error.MyPLError('nil value error', line, column)
+    return int(value)
+
+
+def rt_new_array(elem_type, size, line, column):
+    if size is None:
+        raise error.MyPLError('nil value error', line, column)
+    if size < 0:
+        raise error.MyPLError('negative array size error', line, column)
+    return arrays.allocate(elem_type, size)
+
+
+def rt_index(index, the_array, line, column):
+    if the_array is None or index is None:
+        raise error.MyPLError('nil value error', line, column)
+    if not 0 <= index < len(the_array):
+        raise error.MyPLError('index out of range error', line, column)
+    return the_array[index]
+
+
+def rt_store(index, value, the_array, line, column):
+    if the_array is None or index is None:
+        raise error.MyPLError('nil value error', line, column)
+    if not 0 <= index < len(the_array):
+        raise error.MyPLError('index out of range error', line, column)
+    try:
+        the_array[index] = value
+    except (TypeError, OverflowError):  # an array buffer only holds ints or floats
+        raise error.MyPLError(arrays.store_error(value), line, column)
+
+
+def rt_built_in(fun_name, line, column, *args):
+    # a built in function without a run time support function of its own (e.g. one registered by the host), or one
+    # called with an unexpected number of arguments, which are used as the interpreter would
+    for arg in args:
+        if arg is None:
+            raise error.MyPLError('nil value error', line, column)
+    built_in = builtins.BUILT_INS.get(fun_name)
+    if built_in is None:
+        raise error.MyPLError('unknown function call', line, column)
+    if len(args) != len(built_in.param_types):
+        args = built_in.arguments(args)
+    try:
+        return built_in.bind(rt_output, rt_input)(*args)
+    except builtins.BuiltInError as e:
+        raise error.MyPLError(str(e), line, column)
+
+
+if __name__ == '__main__':
+    import mypl_lexer as lexer
+    import mypl_parser as parser
+    import mypl_type_checker as type_checker
+    import mypl_optimizer as optimizer
+    import mypl_resolver as resolver
+    if len(sys.argv) != 2:
+        sys.exit('usage: mypl_transpiler.py FILE (prints the Python translation of a MyPL program)')
+    try:
+        with open(sys.argv[1], 'r') as file_stream:
+            program = parser.Parser(lexer.Lexer(file_stream)).parse()
+        program.accept(type_checker.TypeChecker())
+        optimizer.Optimizer().optimize(program)
+        resolver.Resolver().resolve(program)
+        sys.stdout.write(Transpiler().transpile(program))
+    except error.MyPLError as e:
+        sys.exit(e)
@@ -10,6 +10,10 @@ import mypl_token as token
 import mypl_ast as ast
 import mypl_error as error
 import mypl_symbol_table as symbol_table
+import mypl_builtins as builtins
+
+ARRAY = 'array '    # array types are this followed by the type of their elements, e.g. 'array INTTYPE'
+MAP = 'map '    # map types are this followed by the types of their keys and values, e.g. 'map STRINGTYPE INTTYPE'
 
 class TypeChecker(ast.Visitor):
     """A MyPL type checker visitor implementation where struct types
@@ -32,35 +36,58 @@ class TypeChecker(ast.Visitor):
         self.sym_table.add_id('return')
         self.sym_table.set_info('return', [token.INTTYPE])
         # load in built-in function types
-        self.sym_table.add_id('print')  # initialize print function
-        self.sym_table.set_info('print', [[token.STRINGTYPE], token.NIL])
-        self.sym_table.add_id('length')     # initialize length function
-        self.sym_table.set_info('length', [[token.STRINGTYPE], token.INTTYPE])
-        self.sym_table.add_id('get')  # initialize get function
-        self.sym_table.set_info('get', [[token.INTTYPE, token.STRINGTYPE], token.STRINGTYPE])
-        self.sym_table.add_id('reads')  # initialize read string function
-        self.sym_table.set_info('reads', [0, token.STRINGTYPE])
-        self.sym_table.add_id('readi')  # initialize read int function
-        self.sym_table.set_info('readi', [0, token.INTTYPE])
-        self.sym_table.add_id('readf')  # initialize read float function
-        self.sym_table.set_info('readf', [0, token.FLOATTYPE])
-        # conversion functions
-        self.sym_table.add_id('itos')  # initialize int to string function
-        self.sym_table.set_info('itos', [[token.INTTYPE], token.STRINGTYPE])
-        self.sym_table.add_id('ftos')  # initialize float to string function
-        self.sym_table.set_info('ftos', [[token.FLOATTYPE], token.STRINGTYPE])
-        self.sym_table.add_id('itof')  # initialize int to float function
-        self.sym_table.set_info('itof', [[token.INTTYPE], token.FLOATTYPE])
-        self.sym_table.add_id('stoi')  # initialize string to int function
-        self.sym_table.set_info('stoi', [[token.STRINGTYPE], token.INTTYPE])
-        self.sym_table.add_id('stof')  # initialize string to float function
-        self.sym_table.set_info('stof', [[token.STRINGTYPE], token.FLOATTYPE])
+        for name, built_in in builtins.BUILT_INS.items():
+            self.sym_table.add_id(name)
+            self.sym_table.set_info(name, [built_in.param_types or 0, built_in.return_type])
 
     def __error(self, error_msg, name):
         l = name.line
         c = name.column
         raise error.MyPLError(error_msg, l, c)
 
+    # the type a type annotation stands for: a token type, a struct name, ARRAY and the element type, or MAP and the
+    # key and value types
+    def __type_of(self, type_token):
+        if type_token.tokentype == token.ARRAYTYPE:
+            return ARRAY + self.__type_of(type_token.elem_type)
+        elif type_token.tokentype == token.MAPTYPE:
+            if type_token.key_type.tokentype not in [token.STRINGTYPE, token.INTTYPE]:
+                self.__error('map key must be a string or int value', type_token.key_type)
+            return MAP + type_token.key_type.tokentype + ' ' + self.__type_of(type_token.value_type)
+        elif type_token.tokentype == token.ID:
+            return type_token.lexeme
+        return type_token.tokentype
+
+    # checks if a type is an array type
+    def __is_array(self, the_type):
+        return isinstance(the_type, str) and the_type.startswith(ARRAY)
+
+    # checks if a type is a map type
+    def __is_map(self, the_type):
+        return isinstance(the_type, str) and the_type.startswith(MAP)
+
+    # the struct or primitive type at the bottom of an array or map type annotation
+    def __base_type(self, type_token):
+        while type_token.tokentype in [token.ARRAYTYPE, token.MAPTYPE]:
+            if type_token.tokentype == token.ARRAYTYPE:
+                type_token = type_token.elem_type
+            else:
+                type_token = type_token.value_type
+        return type_token
+
+    # the type of the elements of an array type, structs as their {field: type} like new gives them
+    def __element_type(self, array_type):
+        elem_type = array_type[len(ARRAY):]
+        if not self.__is_array(elem_type) and self.sym_table.id_exists(elem_type):
+            return self.sym_table.get_info(elem_type)
+        return elem_type
+
+    # checks an array index expression
+    def __index(self, index_expr):
+        index_expr.accept(self)
+        if self.current_type != token.INTTYPE:
+            self.__error('array index must be an int value', ast.first_token(index_expr))
+
     def visit_stmt_list(self, stmt_list):
         # add new block (scope)
         self.sym_table.push_environment()
@@ -89,7 +116,14 @@ class TypeChecker(ast.Visitor):
         var_decl_expr_type_token = self.current_token
         # print(self.current_lexeme)
         # print(self.current_type)
-        if not is_implicit:     # explicit type declaration
+        if not is_implicit and var_decl_type.tokentype in [token.ARRAYTYPE, token.MAPTYPE]:  # explicit array or map
+            declared_type = self.__type_of(var_decl_type)
+            if var_decl_expr_type != token.NIL and var_decl_expr_type != declared_type:
+                self.__error('mismatch type in assignment', var_decl_type)
+            if not self.sym_table.id_exists(var_decl.var_id.lexeme):
+                self.sym_table.add_id(var_decl.var_id.lexeme)
+            self.sym_table.set_info(var_decl.var_id.lexeme, declared_type)
+        elif not is_implicit:     # explicit type declaration
             is_struct_type = False
             struct_id_type = None
             if var_decl_type.tokentype == token.ID:
@@ -147,6 +181,10 @@ class TypeChecker(ast.Visitor):
         rhs_type = self.current_type
         assign_stmt.lhs.accept(self)
         lhs_type = self.current_type
+        if assign_stmt.lhs.index_expr is not None and isinstance(rhs_type, str) and not self.__is_array(rhs_type):
+            if rhs_type not in [token.STRINGTYPE, token.INTTYPE, token.BOOLTYPE, token.FLOATTYPE, token.NIL] and \
+                    self.sym_table.id_exists(rhs_type):     # a struct variable: compare struct types
+                rhs_type = self.sym_table.get_info(rhs_type)
         if rhs_type != token.NIL and rhs_type != lhs_type:
             msg = 'mismatch type in assignment'
             self.__error(msg, assign_stmt.lhs.path[0])
@@ -163,10 +201,7 @@ class TypeChecker(ast.Visitor):
         self.sym_table.pop_environment()
 
     def visit_fun_decl_stmt(self, fun_decl):
-        if fun_decl.return_type.tokentype == token.ID:
-            return_type = fun_decl.return_type.lexeme
-        else:
-            return_type = fun_decl.return_type.tokentype
+        return_type = self.__type_of(fun_decl.return_type)
         fun_name = fun_decl.fun_name.lexeme
         param_list = []     # list of parameters
         param_token_list = []   # list of token parameters
@@ -255,28 +290,22 @@ class TypeChecker(ast.Visitor):
                 self.__error('mismatch type in assignment', first_expr_token)
         if first_expr_type != second_expr_type:     # output error if types are different
             self.__error('mismatch type in assignment', first_expr_token)
+        complex_expr.expr_type = first_expr_type
 
-    def visit_bool_expr(self, bool_expr):
-        bool_expr.first_expr.accept(self)
+    def visit_compare_expr(self, compare_expr):
+        compare_expr.first_expr.accept(self)
         first_expr_type = self.current_type
         first_expr_lexeme = self.current_lexeme
-        second_expr_type = None
-        second_expr_token = None
-        second_expr_lexeme = None
-        bool_expr_boolrel = None
-        if bool_expr.bool_rel is not None:
-            bool_expr_boolrel = bool_expr.bool_rel.lexeme
-            bool_expr.second_expr.accept(self)
-            second_expr_type = self.current_type
-            second_expr_token = self.current_token
-            second_expr_lexeme = self.current_lexeme
-        if bool_expr.bool_connector is not None:
-            bool_expr.rest.accept(self)
+        bool_expr_boolrel = compare_expr.bool_rel.lexeme
+        compare_expr.second_expr.accept(self)
+        second_expr_type = self.current_type
+        second_expr_token = self.current_token
+        second_expr_lexeme = self.current_lexeme
         expr_types = [token.INTTYPE, token.FLOATTYPE, token.BOOLTYPE, token.STRINGVAL, token.ID]
         boolrel = ['<', '>', '<=', '>=']
         if second_expr_type is not None:   # only a first_expr and second_expr
             if bool_expr_boolrel == '==' or bool_expr_boolrel == '!=':   # check equal and not equal boolrel cases
-                if first_expr_type in expr_types:
+                if first_expr_type in expr_types or self.__is_array(first_expr_type) or self.__is_map(first_expr_type):
                     if not (second_expr_type == token.NIL or second_expr_type == first_expr_type):
                         self.__error('mismatch type in assignment', second_expr_token)
                 else:   # comparison of struct types
@@ -299,6 +328,13 @@ class TypeChecker(ast.Visitor):
                 if not first_expr_type == second_expr_type:
                     self.__error('mismatch type in assignment', second_expr_token)
 
+    def visit_logic_expr(self, logic_expr):
+        for operand in logic_expr.operands:
+            operand.accept(self)
+
+    def visit_not_expr(self, not_expr):
+        not_expr.operand.accept(self)
+
     def visit_lvalue(self, lval):
         lexeme = ''
         is_object = False
@@ -343,12 +379,16 @@ class TypeChecker(ast.Visitor):
                 self.current_lexeme = lexeme
             else:
                 self.__error('value has not been declared', self.current_token)
+        if lval.index_expr is not None:     # an element of the array
+            array_type = self.current_type
+            if not self.__is_array(array_type):
+                self.__error('value is not an array', lval.path[-1])
+            self.__index(lval.index_expr)
+            self.current_type = self.__element_type(array_type)
 
     def visit_fun_param(self, fun_param):
         self.current_lexeme = fun_param.param_name.lexeme
-        self.current_type = fun_param.param_type.tokentype
-        if self.current_type is token.ID:
-            self.current_type = fun_param.param_type.lexeme
+        self.current_type = self.__type_of(fun_param.param_type)
         self.sym_table.add_id(self.current_lexeme)
         self.sym_table.set_info(self.current_lexeme, self.current_type)
 
@@ -381,6 +421,33 @@ class TypeChecker(ast.Visitor):
         else:
             self.__error('value has not been declared', self.current_token)
 
+    def visit_new_array_rvalue(self, new_array_rvalue):
+        elem_type = self.__base_type(new_array_rvalue.elem_type)
+        if elem_type.tokentype == token.ID and not self.sym_table.id_exists(elem_type.lexeme):
+            self.__error('value has not been declared', elem_type)
+        self.__index(new_array_rvalue.size_expr)
+        self.current_type = ARRAY + self.__type_of(new_array_rvalue.elem_type)
+        self.current_lexeme = self.current_type
+        self.current_token = ast.first_token(new_array_rvalue)
+
+    def visit_new_map_rvalue(self, new_map_rvalue):
+        value_type = self.__base_type(new_map_rvalue.map_type)
+        if value_type.tokentype == token.ID and not self.sym_table.id_exists(value_type.lexeme):
+            self.__error('value has not been declared', value_type)
+        self.current_type = self.__type_of(new_map_rvalue.map_type)
+        self.current_lexeme = self.current_type
+        self.current_token = ast.first_token(new_map_rvalue)
+
+    def visit_index_rvalue(self, index_rvalue):
+        index_rvalue.array.accept(self)
+        array_type = self.current_type
+        if not self.__is_array(array_type):
+            self.__error('value is not an array', index_rvalue.array.path[-1])
+        self.__index(index_rvalue.index_expr)
+        self.current_type = self.__element_type(array_type)
+        self.current_lexeme = array_type[len(ARRAY):]
+        self.current_token = ast.first_token(index_rvalue)
+
     def visit_call_rvalue(self, call_rvalue):
         fun_name = call_rvalue.fun.lexeme
         if not self.sym_table.id_exists(fun_name):    # check if function was defined
@@ -409,6 +476,45 @@ class TypeChecker(ast.Visitor):
             # if fun_type_arg_list != arg_list:
             #     if token.NIL not in arg_list:   # if one of the inputs is not nil throw error
             #         self.__error('parameter types do not match up with function', self.current_token)
+            self.__check_args(fun_type_arg_list, call_rvalue.args, arg_list)
+            if self.current_type == builtins.ELEMENT and arg_list and self.__is_array(arg_list[0]):
+                self.current_type = arg_list[0][len(ARRAY):]    # e.g. the sum of an array of ints is an int
+            elif self.current_type == builtins.ELEMENT and arg_list and self.__is_map(arg_list[0]):
+                self.current_type = arg_list[0][len(MAP):].split(' ', 1)[1]     # the type of the map's values
+                self.current_lexeme = self.current_type     # a struct value is of the struct type
+            elif self.current_type == builtins.KEYS and arg_list and self.__is_map(arg_list[0]):
+                self.current_type = ARRAY + arg_list[0][len(MAP):].split(' ', 1)[0]
+        if self.__is_array(self.current_type) or self.__is_map(self.current_type):    # e.g. keys(m)
+            self.current_lexeme = self.current_type
+
+    # checks the arguments of a built in against its ARRAYTYPE and MAPTYPE parameters, which take any array or map,
+    # its ELEMENT parameters, which take an element of the array (a value of the map) it is given first, and its KEY
+    # parameters, which take a key of that map. Nil values are errors when the call runs.
+    def __check_args(self, param_types, args, arg_types):
+        element_type = key_type = None
+        if arg_types and self.__is_array(arg_types[0]):
+            element_type = arg_types[0][len(ARRAY):]
+        elif arg_types and self.__is_map(arg_types[0]):
+            key_type, element_type = arg_types[0][len(MAP):].split(' ', 1)
+        for param_type, arg, arg_type in zip(param_types, args, arg_types):
+            if arg_type == token.NIL:
+                continue
+            if param_type == token.ARRAYTYPE and not self.__is_array(arg_type):
+                self.__error('value is not an array', ast.first_token(arg))
+            elif param_type == token.MAPTYPE and not self.__is_map(arg_type):
+                self.__error('value is not a map', ast.first_token(arg))
+            elif param_type == builtins.ELEMENT and element_type is not None and \
+                    not self.__same_type(element_type, arg_type):
+                self.__error('mismatch type in function argument', ast.first_token(arg))
+            elif param_type == builtins.KEY and key_type is not None and arg_type != key_type:
+                self.__error('mismatch type in map key', ast.first_token(arg))
+
+    # whether a value of the_type can be used where one of expected_type is, structs being typed by their name or
+    # by their fields
+    def __same_type(self, expected_type, the_type):
+        if expected_type == the_type:
+            return True
+        return self.sym_table.id_exists(expected_type) and self.sym_table.get_info(expected_type) is the_type
 
     def visit_id_rvalue(self, id_rvalue):
         lexeme = ''
@@ -449,3 +555,5 @@ class TypeChecker(ast.Visitor):
                 self.current_lexeme = lexeme
             else:
                 self.__error('value has not been declared', self.current_token)
+        if self.__is_array(self.current_type) or self.__is_map(self.current_type):
+            self.current_lexeme = self.current_type
@@ -0,0 +1,230 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   A stack based virtual machine that runs the bytecode produced by mypl_compiler. Calls push explicit frames
+#   instead of recursing in Python, so deep MyPL recursion does not grow the Python stack.
+# ----------------------------------------------------------------------
+
+import mypl_error as error
+import mypl_heap as heap
+import mypl_array as arrays
+import mypl_map as maps
+import mypl_output as output
+import mypl_input as reader
+import mypl_builtins as builtins
+from mypl_rope import Rope, concat
+from mypl_bytecode import LOAD_CONST, LOAD_LOCAL, STORE_LOCAL, LOAD_GLOBAL, STORE_GLOBAL, LOAD_FIELD, STORE_FIELD, \
+    POP, ADD, SUB, MUL, DIV, MOD, EQ, NE, LT, LE, GT, GE, AND_JUMP, OR_JUMP, NOT, JUMP, JUMP_IF_FALSE, CALL, \
+    CALL_BUILTIN, NEW, MAKE_STRUCT, RETURN, IS_TRUE, NEW_ARRAY, LOAD_INDEX, STORE_INDEX, \
+    NEW_MAP
+
+
+class VM(object):
+    """A MyPL bytecode interpreter"""
+
+    def __init__(self, the_output=None, the_input=None):
+        self.globals = []
+        self.output = output.Writer() if the_output is None else the_output  # where print writes
+        # where reads, readi and readf read
+        self.input = reader.Reader(None, reader.BLOCK_SIZE, self.output) if the_input is None else the_input
+        self.built_ins = {}  # {name: (BuiltIn, its function bound to output and input)} of those called so far
+
+    def __error(self, msg, the_token):
+        raise error.MyPLError(msg, the_token.line, the_token.column)
+
+    def __call_built_in(self, fun_name, arg_vals, the_token):
+        for arg in arg_vals:    # check for nil values
+            if arg is None:
+                self.__error('nil value error', the_token)
+        entry = self.built_ins.get(fun_name)
+        if entry is None:   # bound to the program's output and input the first time it's called
+            built_in = builtins.BUILT_INS.get(fun_name)
+            if built_in is None:
+                self.__error('unknown function call', the_token)
+            entry = self.built_ins[fun_name] = (built_in, built_in.bind(self.output, self.input))
+        built_in, function = entry
+        if len(arg_vals) != len(built_in.param_types):
+            arg_vals = built_in.arguments(arg_vals)
+        try:
+            return function(*arg_vals)
+        except builtins.BuiltInError as e:
+            self.__error(str(e), the_token)
+
+    def run(self, main_code):
+        """executes a compiled program"""
+        try:
+            self.__execute(main_code)
+        finally:
+            self.output.flush()
+
+    def __execute(self, main_code):
+        self.globals = [None] * main_code.nglobals
+        globals_ = self.globals
+        frames = []   # suspended callers: (code, pc, locals, stack)
+        code = main_code
+        instrs = code.instrs
+        consts = code.consts
+        locals_ = [None] * code.nlocals
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        while True:
+            op = instrs[pc]
+            arg = instrs[pc + 1]
+            pc += 2
+            if op == LOAD_LOCAL:
+                push(locals_[arg])
+            elif op == LOAD_CONST:
+                push(consts[arg])
+            elif op == STORE_LOCAL:
+                locals_[arg] = pop()
+            elif op == LOAD_GLOBAL:
+                push(globals_[arg])
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == LOAD_FIELD:
+                record = stack[-1]
+                slot, name, the_token = consts[arg]
+                if record is None:
+                    self.__error('nil value error', the_token)
+                if slot is None:    # struct type unknown until run time
+                    slot = record.layout[name]
+                stack[-1] = record[slot]
+            elif op == ADD:
+                right = pop()
+                left = stack[-1]
+                if left.__class__ is str or left.__class__ is Rope:
+                    stack[-1] = concat(left, right)
+                else:
+                    stack[-1] = left + right
+            elif op == SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == DIV:
+                right = pop()
+                left = stack[-1]
+                if type(left) == int and type(right) == int:    # both values are int, result is an int
+                    stack[-1] = int(left / right)
+                else:
+                    stack[-1] = left / right
+            elif op == MOD:
+                right = pop()
+                stack[-1] = stack[-1] % right
+            elif op == LT:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif op == LE:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+            elif op == GT:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif op == GE:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+            elif op == EQ:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif op == NE:
+                right = pop()
+                stack[-1] = stack[-1] != right
+            elif op == JUMP:
+                pc = arg
+            elif op == STORE_GLOBAL:
+                globals_[arg] = pop()
+            elif op == POP:
+                pop()
+            elif op == CALL or op == NEW:
+                if op == CALL:
+                    callee, nargs = consts[arg]
+                    args = stack[len(stack) - nargs:]
+                    del stack[len(stack) - nargs:]
+                    args = args[:callee.nparams]
+                else:
+                    callee = consts[arg]
+                    args = []
+                frames.append((code, pc, locals_, stack))
+                code = callee
+                instrs = code.instrs
+                consts = code.consts
+                locals_ = args + [None] * (code.nlocals - len(args))
+                stack = []
+                push = stack.append
+                pop = stack.pop
+                pc = 0
+            elif op == RETURN:
+                value = pop()
+                if not frames:
+                    return
+                code, pc, locals_, stack = frames.pop()
+                instrs = code.instrs
+                consts = code.consts
+                push = stack.append
+                pop = stack.pop
+                push(value)
+            elif op == CALL_BUILTIN:
+                fun_name, nargs, the_token = consts[arg]
+                args = stack[len(stack) - nargs:]
+                del stack[len(stack) - nargs:]
+                push(self.__call_built_in(fun_name, args, the_token))
+            elif op == STORE_FIELD:
+                record = pop()
+                slot, name, the_token = consts[arg]
+                if record is None:
+                    self.__error('nil value error', the_token)
+                if slot is None:
+                    slot = record.layout[name]
+                record[slot] = pop()
+            elif op == AND_JUMP:
+                if stack[-1] is True:
+                    pop()
+                else:
+                    stack[-1] = False
+                    pc = arg
+            elif op == OR_JUMP:
+                if stack[-1] is True:
+                    pc = arg
+                else:
+                    pop()
+            elif op == NOT:
+                stack[-1] = stack[-1] is not True
+            elif op == IS_TRUE:
+                stack[-1] = stack[-1] is True
+            elif op == MAKE_STRUCT:
+                push(heap.Record(locals_, consts[arg]))
+            elif op == LOAD_INDEX:
+                the_array = pop()
+                index = pop()
+                if the_array is None or index is None:
+                    self.__error('nil value error', consts[arg])
+                if not 0 <= index < len(the_array):
+                    self.__error('index out of range error', consts[arg])
+                push(the_array[index])
+            elif op == STORE_INDEX:
+                the_array = pop()
+                value = pop()
+                index = pop()
+                if the_array is None or index is None:
+                    self.__error('nil value error', consts[arg])
+                if not 0 <= index < len(the_array):
+                    self.__error('index out of range error', consts[arg])
+                try:
+                    the_array[index] = value
+                except (TypeError, OverflowError):  # an array buffer only holds ints or floats
+                    self.__error(arrays.store_error(value), consts[arg])
+            elif op == NEW_ARRAY:
+                size = pop()
+                elem_type, the_token = consts[arg]
+                if size is None:
+                    self.__error('nil value error', the_token)
+                if size < 0:
+                    self.__error('negative array size error', the_token)
+                push(arrays.allocate(elem_type, size))
+            elif op == NEW_MAP:
+                push(maps.Map(consts[arg]))
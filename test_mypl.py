@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+#
+# Author: Joshua Go
+# Description:
+#   Tests for the MyPL front end and engines. Every program runs on each engine, which must print the same output
+#   (or raise the same MyPL error).
+#
+#       python3 -m unittest test_mypl
+# ----------------------------------------------------------------------
+
+import mypl_error as error
+import mypl_batch as batch
+import mypl_transpiler as transpiler
+import mypl_output as output
+import mypl_input as reader
+import main
+import io
+import unittest
+
+
+def run(source, engine):
+    """what the program in source prints on the engine"""
+    sink = io.StringIO()
+    the_output = output.Writer(sink)
+    batch.Program(source, engine).run(the_output, reader.Reader(io.StringIO(), reader.BLOCK_SIZE, the_output))
+    return sink.getvalue()
+
+
+class MyPLTest(unittest.TestCase):
+
+    def assert_prints(self, source, expected):
+        for engine in main.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(source, engine), expected)
+
+    def assert_error(self, source, msg):
+        for engine in main.ENGINES:
+            with self.subTest(engine=engine):
+                with self.assertRaises(error.MyPLError) as raised:
+                    run(source, engine)
+                self.assertIn(msg, str(raised.exception))
+
+
+class ParserTest(MyPLTest):
+
+    def test_long_math_chain(self):
+        # a flat chain is as deep as one expression, however long it is
+        self.assert_prints('print(itos(' + ' + '.join(['1'] * 150) + '));', '150')
+        self.assert_prints('var x = ' + ' - '.join(['1'] * 151) + ';\nprint(itos(x));', '1')
+
+    def test_long_logic_chain(self):
+        self.assert_prints('if ' + ' and '.join(['true'] * 1000) + ' then print("t"); end', 't')
+        self.assert_prints('if ' + ' or '.join(['false'] * 1000) + ' then print("t"); else print("f"); end', 'f')
+
+    def test_nesting_limit(self):
+        self.assert_error('if ' + '(' * 3000 + 'true' + ')' * 3000 + ' then print("t"); end',
+                          'maximum nesting depth')
+
+
+class TypeCheckerTest(MyPLTest):
+
+    def test_array_built_in_arguments(self):
+        self.assert_error('print(itos(sum(5)));', 'value is not an array')
+        self.assert_error('var xs = new string[2];\nfill(xs, 1);', 'mismatch type in function argument')
+        self.assert_error('var xs = new int[2];\nprint(itos(search(xs, "a")));', 'mismatch type in function argument')
+        self.assert_error('struct S\nend\nstruct T\nend\nvar xs = new S[2];\nfill(xs, new T);',
+                          'mismatch type in function argument')
+
+    def test_map_built_in_arguments(self):
+        self.assert_error('var m = new map string int;\nput(m, "x", "hello");', 'mismatch type in function argument')
+        self.assert_error('var m = new map string int;\nput(m, 1, 2);', 'mismatch type in map key')
+        self.assert_error('var m = new map int string;\nprint(lookup(m, "a"));', 'mismatch type in map key')
+        self.assert_error('var xs = new int[2];\nprint(itos(size(xs)));', 'value is not a map')
+
+    def test_struct_arguments(self):
+        self.assert_prints('''
+struct S
+  var v = 1;
+end
+var xs = new S[2];
+fill(xs, new S);
+var s = xs[1];
+fill(xs, s);
+var m = new map string S;
+put(m, "a", xs[0]);
+put(m, "b", new S);
+var t = lookup(m, "b");
+print(itos(t.v));
+''', '1')
+
+
+class TailCallTest(MyPLTest):
+
+    def test_tail_call_in_while(self):
+        # the call starts the function over, not just the while it is in
+        self.assert_prints('''
+fun int f(n: int)
+  print(itos(n) + " ");
+  var i = 0;
+  while i < 1 do
+    if n > 0 then
+      return f(n - 1);
+    end
+    set i = i + 1;
+  end
+  return n;
+end
+print(itos(f(3)));
+''', '3 2 1 0 0')
+
+    def test_deep_tail_calls(self):
+        self.assert_prints('''
+fun int count(n: int, total: int)
+  while n > 0 do
+    return count(n - 1, total + 1);
+  end
+  if n < 0 then
+    return total;
+  end
+  return count(n - 1, total);
+end
+print(itos(count(200000, 0)));
+''', '200000')
+
+
+
+class TranspilerTest(unittest.TestCase):
+
+    def test_string_variables_concatenate(self):
+        # every string + builds a rope, or s = s + t in a loop takes quadratic time
+        source = transpiler.Transpiler().transpile(main.load('var s = "";\nvar t = "a";\nset s = s + t;\n'))
+        self.assertIn('rt_concat(', source)
+        source = transpiler.Transpiler().transpile(main.load('var i = 0;\nvar j = 1;\nset i = i + j;\n'))
+        self.assertNotIn('rt_concat(', source)
+
+
+if __name__ == '__main__':
+    unittest.main()